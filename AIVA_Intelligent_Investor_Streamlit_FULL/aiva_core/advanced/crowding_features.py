@@ -1,7 +1,9 @@
 
 from __future__ import annotations
 from typing import Dict, Any
-import os, requests
+import os
+
+from .. import http_client
 
 def crowding_from_fmp(ticker: str) -> Dict[str, float]:
     key = os.getenv("FMP_KEY")
@@ -10,7 +12,7 @@ def crowding_from_fmp(ticker: str) -> Dict[str, float]:
         return out
     base = "https://financialmodelingprep.com/api/v4/"
     try:
-        r = requests.get(base + "short_interest", params={"symbol": ticker, "apikey": key}, timeout=15)
+        r = http_client.get(base + "short_interest", params={"symbol": ticker, "apikey": key}, timeout=15)
         if r.ok and r.json():
             it = r.json()[0]
             out["short_interest"] = float(it.get("shortInterest", float("nan")))
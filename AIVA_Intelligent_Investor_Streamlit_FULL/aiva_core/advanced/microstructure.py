@@ -2,13 +2,11 @@
 from __future__ import annotations
 import numpy as np
 import pandas as pd
-import yfinance as yf
+
+from .. import intraday
 
 def intraday_features(ticker: str, period: str = "5d", interval: str = "5m") -> dict:
-    try:
-        df = yf.download(ticker, period=period, interval=interval, auto_adjust=True, progress=False)
-    except Exception:
-        return {"range_contraction": float("nan"), "vwap_diff": float("nan"), "spread_proxy": float("nan")}
+    df = intraday.bars(ticker, interval=interval, period=period)
     if not isinstance(df, pd.DataFrame) or df.empty:
         return {"range_contraction": float("nan"), "vwap_diff": float("nan"), "spread_proxy": float("nan")}
     df = df.dropna()
@@ -2,7 +2,8 @@ from typing import Dict
 import yaml
 import pandas as pd
 
-from .data_sources import fetch_prices, latest_close
+from . import quota
+from .data_sources import fetch_prices
 from .signals import generate_signals
 from .forecasting import simple_forecast
 from .portfolio import sector_report
@@ -25,14 +26,20 @@ def run_day(config_path: str = "config.yaml") -> Dict:
     lookback_days = int((cfg.get("data") or {}).get("lookback_days", 365))
     sectors = cfg.get("sectors", {}) or {}
 
-    prices = fetch_prices(tickers, lookback_days=lookback_days)
-    last = latest_close(tickers, lookback_days=lookback_days)
-    sigs = generate_signals(prices, params=params)
+    prices = fetch_prices(tickers, lookback_days=lookback_days, priority=quota.HOLDING)
+    # laatste slot uit dezelfde data i.p.v. een tweede fetch
+    last = {}
+    for t, df in prices.items():
+        c = pd.to_numeric(df["Close"], errors="coerce").dropna()
+        if len(c):
+            last[t] = float(c.iloc[-1])
+    # dagelijkse run: indicator-state bijwerken met alleen de nieuwe bars
+    sigs = generate_signals(prices, params=params, opts={"incremental": True})
     fc = simple_forecast(prices, horizon_days=5)
     sector_df = sector_report(sectors, last)
 
     try:
-        opps = screen_universe(sectors)
+        opps = screen_universe(sectors, prices=prices)
     except Exception:
         opps = {}
 
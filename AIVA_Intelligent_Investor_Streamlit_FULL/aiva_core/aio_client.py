@@ -0,0 +1,136 @@
+from __future__ import annotations
+from typing import Any, Awaitable, Coroutine, Dict, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import asyncio, os, threading, time, weakref
+
+from . import http_client, metrics
+
+# Asyncio-tegenhanger van http_client: één AsyncClient per event loop met een begrensde
+# connection pool, een semafoor per host en retry/backoff op 429/5xx.
+# httpx komt mee met de openai-dependency; zonder httpx vallen calls terug op http_client in threads.
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+T = TypeVar("T")
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def per_host() -> int:
+    """Maximaal aantal gelijktijdige requests per host binnen één event loop."""
+    return max(1, _env_int("ASYNC_PER_HOST", 16))
+
+class _LoopState:
+    def __init__(self):
+        self.client = None
+        self.sems: Dict[str, asyncio.Semaphore] = {}
+
+_STATE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    st = _STATE.get(loop)
+    if st is None:
+        st = _STATE[loop] = _LoopState()
+    return st
+
+def _client(st: _LoopState):
+    if st.client is None:
+        st.client = httpx.AsyncClient(
+            headers={"User-Agent": http_client.USER_AGENT},
+            timeout=http_client.DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=_env_int("ASYNC_MAX_CONNECTIONS", 100),
+                                max_keepalive_connections=_env_int("ASYNC_KEEPALIVE", 20)),
+            follow_redirects=True,
+        )
+    return st.client
+
+def _retry_after(r, attempt: int) -> float:
+    try:
+        return min(30.0, float(r.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return 0.5 * (2 ** attempt)
+
+async def get(url: str, params: Dict[str, Any] | None = None, timeout: float | None = None, **kwargs):
+    """
+    Async GET. Geeft een response met `status_code`, `json()`, `raise_for_status()` en `content`
+    (httpx.Response, of requests.Response in de fallback zonder httpx).
+    """
+    if httpx is None:
+        return await asyncio.to_thread(http_client.get, url, params, timeout, **kwargs)
+    st = _state()
+    host = urlsplit(url).netloc
+    sem = st.sems.get(host)
+    if sem is None:
+        sem = st.sems[host] = asyncio.Semaphore(per_host())
+    retries = max(0, _env_int("HTTP_RETRIES", 2))
+    async with sem:
+        for attempt in range(retries + 1):
+            t0 = time.perf_counter()
+            try:
+                r = await _client(st).get(url, params=params, timeout=timeout or http_client.DEFAULT_TIMEOUT, **kwargs)
+            except httpx.TransportError as e:
+                metrics.observe("aiva_http_seconds", time.perf_counter() - t0, host=host)
+                if attempt < retries:
+                    metrics.inc("aiva_http_retries_total", host=host)
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+                    continue
+                metrics.inc("aiva_http_total", host=host, status="error")
+                metrics.event(f"http {host}: {type(e).__name__}", level="error", source="http")
+                raise
+            metrics.observe("aiva_http_seconds", time.perf_counter() - t0, host=host)
+            if r.status_code in _RETRY_STATUS and attempt < retries:
+                metrics.inc("aiva_http_retries_total", host=host)
+                await asyncio.sleep(_retry_after(r, attempt))
+                continue
+            metrics.inc("aiva_http_total", host=host, status=r.status_code)
+            metrics.inc("aiva_http_bytes_total", len(r.content or b""), host=host)
+            return r
+
+async def aclose() -> None:
+    """Sluit de client van de huidige event loop."""
+    st = _STATE.pop(asyncio.get_running_loop(), None)
+    if st is not None and st.client is not None:
+        await st.client.aclose()
+
+async def _main(aw: Awaitable[T]) -> T:
+    try:
+        return await aw
+    finally:
+        await aclose()
+
+# proces-brede achtergrond-loop voor synchrone callers: één I/O-thread, keep-alive blijft bewaard
+_LOOP: asyncio.AbstractEventLoop | None = None
+_LOOP_THREAD: threading.Thread | None = None
+_LOOP_PID = 0
+_LOOP_LOCK = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP, _LOOP_THREAD, _LOOP_PID
+    with _LOOP_LOCK:
+        # na een fork bestaat de thread in het kind niet meer
+        if _LOOP is None or _LOOP_PID != os.getpid():
+            loop = asyncio.new_event_loop()
+            th = threading.Thread(target=loop.run_forever, name="aiva-aio", daemon=True)
+            th.start()
+            _LOOP, _LOOP_THREAD, _LOOP_PID = loop, th, os.getpid()
+        return _LOOP
+
+def run(aw: Coroutine[Any, Any, T]) -> T:
+    """
+    Synchrone wrapper voor de async API: draait `aw` op de achtergrond-loop en wacht op het resultaat.
+    Vanuit die loop zelf (sync code binnen een coroutine) krijgt `aw` een eigen loop in een thread.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _LOOP_THREAD:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiva-aio-nested") as ex:
+            return ex.submit(asyncio.run, _main(aw)).result()
+    return asyncio.run_coroutine_threadsafe(aw, loop).result()
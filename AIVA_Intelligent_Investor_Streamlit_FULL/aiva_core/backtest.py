@@ -1,49 +1,48 @@
 from typing import Dict, Any
 import numpy as np
 import pandas as pd
-from .signals import indicators, signal_from_row
+from . import backtest_engine
+from .panel import PricePanel
+from .trading_calendar import AlignedPanel, align
 
-def _metrics(returns: pd.Series) -> Dict[str, float]:
-    mean = returns.mean()
-    vol = returns.std()
-    sharpe = float(np.sqrt(252) * mean / vol) if vol and vol != 0 else float("nan")
-    equity = (1 + returns).cumprod()
-    rollmax = equity.cummax()
-    dd = equity / rollmax - 1.0
-    max_dd = float(dd.min()) if len(dd) else float("nan")
-    years = len(returns) / 252 if len(returns) else float("nan")
-    cagr = float(equity.iloc[-1] ** (1/years) - 1) if len(equity) and years and years > 0 else float("nan")
-    hit_ratio = float((returns > 0).mean()) if len(returns) else float("nan")
-    return {"cagr": cagr, "sharpe": sharpe, "max_drawdown": max_dd, "hit_ratio": hit_ratio}
+def _empty() -> Dict[str, Any]:
+    return {"metrics": {}, "returns": pd.Series(dtype=float), "positions": pd.Series(dtype=float), "equity": pd.Series(dtype=float)}
 
 def backtest_ticker(df: pd.DataFrame, params: Dict[str, Any], cost_bps: int = 5) -> Dict[str, Any]:
-    ind = indicators(df, params["ma_short"], params["ma_long"], params["rsi_period"]).dropna()
-    if ind.empty:
-        return {"metrics": {}, "returns": pd.Series(dtype=float), "positions": pd.Series(dtype=float), "equity": pd.Series(dtype=float)}
-    signals = ind.apply(lambda r: signal_from_row(r, params["rsi_buy"], params["rsi_sell"]), axis=1)
-    pos = signals.replace({"BUY":1.0,"SELL":-1.0,"HOLD":0.0}).shift(1).fillna(0.0)
-    ret = df["Close"].reindex(ind.index).pct_change().fillna(0.0)
-    strat = pos * ret
-    trades = pos.diff().abs().fillna(0.0)
-    tc = trades * (cost_bps/10000.0)
-    strat_net = strat - tc
-    return {"metrics": _metrics(strat_net), "returns": strat_net, "positions": pos, "equity": (1+strat_net).cumprod()}
+    """Signaalregels van `signal_from_row` als strategie; gevectoriseerd via `backtest_engine`."""
+    if df is None or df.empty or "Close" not in df.columns:
+        return _empty()
+    close = pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=np.float64)
+    res = backtest_engine.simulate(close[:, None], params, cost_bps)
+    k = int(res["bars"][0])
+    if not k:
+        return _empty()
+    index = df.index[res["rows"][0, -k:]]
+    strat_net = pd.Series(res["returns"][0, -k:], index=index)
+    pos = pd.Series(res["positions"][0, -k:], index=index)
+    m = {n: float(res[n][0]) for n in ("cagr", "sharpe", "max_drawdown", "hit_ratio")}
+    return {"metrics": m, "returns": strat_net, "positions": pos, "equity": (1 + strat_net).cumprod()}
 
-def backtest_portfolio(prices: Dict[str, pd.DataFrame], params: Dict[str, Any], weights: Dict[str, float] = None, cost_bps: int = 5) -> Dict[str, Any]:
-    tickers = list(prices.keys())
+def backtest_portfolio(prices: Dict[str, pd.DataFrame] | PricePanel, params: Dict[str, Any], weights: Dict[str, float] = None, cost_bps: int = 5) -> Dict[str, Any]:
+    tickers = list(prices.tickers if isinstance(prices, PricePanel) else prices.keys())
     if not tickers:
         return {"metrics": {}, "equity": pd.Series(dtype=float), "returns": pd.Series(dtype=float)}
     if not weights:
         weights = {t: 1/len(tickers) for t in tickers}
-    rets = []
-    for t in tickers:
-        res = backtest_ticker(prices[t], params, cost_bps)
-        rets.append(res["returns"].rename(t))
-    if not rets:
+    # één keer uitlijnen op de handelskalenders; alle tickers in één pass, elk op de eigen sessies.
+    # float64 zoals `backtest_ticker`, anders wijkt de equity per ticker af (~1e-7) van de losse backtest
+    aligned = prices if isinstance(prices, AlignedPanel) else align(prices, dtype=np.float64)
+    res = backtest_engine.simulate(np.asarray(aligned.field("Close"), dtype=np.float64), params, cost_bps)
+    valid = res["valid"]
+    j, _ = np.nonzero(valid)
+    R = np.zeros(aligned.shape)
+    R[res["rows"][valid], j] = res["returns"][valid]
+    covered = np.zeros(len(aligned.index), dtype=bool)
+    covered[res["rows"][valid]] = True
+    if not covered.any():
         return {"metrics": {}, "equity": pd.Series(dtype=float), "returns": pd.Series(dtype=float)}
-    df = pd.concat(rets, axis=1).fillna(0.0)
-    w = pd.Series(weights).reindex(df.columns).fillna(0.0)
-    port_ret = (df * w).sum(axis=1)
+    w = np.array([float(weights.get(t, 0.0) or 0.0) for t in aligned.tickers])
+    port_ret = pd.Series(R[covered] @ w, index=aligned.index[covered])
     equity = (1 + port_ret).cumprod()
     mean, vol = port_ret.mean(), port_ret.std()
     sharpe = float(np.sqrt(252) * mean / vol) if vol and vol != 0 else float("nan")
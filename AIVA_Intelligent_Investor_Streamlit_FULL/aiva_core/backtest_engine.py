@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import Any, Dict
+import numpy as np
+
+from . import indicator_engine
+
+# Gevectoriseerde backtest van de signaalregels (`signal_from_row`) voor een hele
+# (bars, tickers)-array tegelijk: indicatoren, signalen, posities, kosten en equity als
+# NumPy-maskers, zonder Python-call per bar. Semantiek per ticker zoals `backtest_ticker`:
+# - alleen bars waarop alle indicatoren bestaan (`dropna`)
+# - positie = signaal van de vorige bar (BUY 1, SELL -1, HOLD 0)
+# - kosten `cost_bps` per eenheid omzet
+# Arrays zijn (tickers, bars) met de tijd als laatste as; geldige bars staan per ticker achteraan.
+
+def metrics(net: np.ndarray, valid: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    CAGR, Sharpe (x√252), max drawdown en hit ratio over de laatste as (252 bars per jaar).
+    `net` mag extra voorloopassen hebben (bv. drempelcombinaties); buiten `valid` moet `net` 0 zijn.
+    """
+    k = valid.sum(axis=-1).astype(np.float64)
+    with np.errstate(all="ignore"):
+        mean = net.sum(axis=-1) / k
+        dev = np.where(valid, net - mean[..., None], 0.0)
+        vol = np.sqrt((dev * dev).sum(axis=-1) / (k - 1))
+        sharpe = np.where(vol > 0, np.sqrt(252) * mean / vol, np.nan)
+        log_eq = np.cumsum(np.log1p(net), axis=-1)
+        peak = np.maximum(np.maximum.accumulate(log_eq, axis=-1), 0.0)  # equity start op 1
+        max_dd = np.expm1((log_eq - peak).min(axis=-1))
+        cagr = np.expm1(log_eq[..., -1] * 252.0 / k)
+        hit = np.count_nonzero(net > 0, axis=-1) / k
+    return {"cagr": cagr, "sharpe": sharpe, "max_drawdown": max_dd, "hit_ratio": hit}
+
+def returns(close: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Rendement t.o.v. de vorige geldige bar; 0 op de eerste (zoals `pct_change().fillna(0)`)."""
+    ret = np.zeros(close.shape)
+    with np.errstate(all="ignore"):
+        ret[..., 1:] = np.where(valid[..., 1:] & valid[..., :-1], close[..., 1:] / close[..., :-1] - 1.0, 0.0)
+    return ret
+
+def simulate(close: np.ndarray, params: Dict[str, Any], cost_bps: float = 5) -> Dict[str, np.ndarray]:
+    """
+    Backtest voor een (bars, tickers) float-array closes (NaN = geen bar). Geeft (tickers, bars)-arrays
+    `valid`, `positions`, `returns` (netto strategierendement) en `rows` (rij in `close` per cel),
+    plus `bars` (geldige bars per ticker) en de metrics per ticker.
+    """
+    c, order, _ = indicator_engine.right_align(np.asarray(close, dtype=np.float64))
+    ind = indicator_engine.arrays(c, params)
+    valid = np.ones(c.shape, dtype=bool)
+    for a in ind.values():
+        valid &= np.isfinite(a)
+    s, l, rsi = ind["SMA_S"], ind["SMA_L"], ind["RSI"]
+    with np.errstate(invalid="ignore"):
+        buy = valid & (rsi <= float(params.get("rsi_buy", 35))) & (s > l)
+        sell = valid & (rsi >= float(params.get("rsi_sell", 65))) & (s < l)
+    sig = buy.astype(np.int8) - sell.astype(np.int8)
+    # geldige bars per ticker achteraan (volgorde behouden), tijd als laatste as
+    keep = np.argsort(valid, axis=0, kind="stable")
+    valid, c, sig, rows = (np.ascontiguousarray(np.take_along_axis(a, keep, axis=0).T) for a in (valid, c, sig, order))
+    pos = np.zeros(c.shape)
+    pos[:, 1:] = sig[:, :-1]
+    turn = np.zeros(c.shape)
+    turn[:, 1:] = np.abs(np.diff(pos, axis=1))
+    net = pos * returns(c, valid) - turn * (cost_bps / 10000.0)
+    return {"valid": valid, "positions": pos, "returns": net, "rows": rows,
+            "bars": valid.sum(axis=1), **metrics(net, valid)}
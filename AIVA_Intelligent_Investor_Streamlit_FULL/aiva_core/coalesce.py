@@ -0,0 +1,141 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+from collections import OrderedDict
+import asyncio, threading, time
+
+_MISS = object()
+
+class TTLCache:
+    """Begrensde LRU met TTL per entry; thread-safe en proces-breed te delen."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        exp = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._data[key] = (exp, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class _Flight:
+    __slots__ = ("event", "value", "error", "futures")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+class SingleFlight:
+    """
+    Identieke gelijktijdige aanvragen delen één upstream-call.
+    De eerste aanvrager van een key wordt leider en voert uit; de rest wacht op zijn resultaat.
+    """
+
+    def __init__(self, timeout: float = 300.0):
+        self.timeout = timeout
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, _Flight]]:
+        """Verdeel keys in (zelf uitvoeren, al onderweg bij een ander)."""
+        mine: List[Hashable] = []
+        theirs: Dict[Hashable, _Flight] = {}
+        with self._lock:
+            for k in keys:
+                fl = self._flights.get(k)
+                if fl is None:
+                    self._flights[k] = _Flight()
+                    mine.append(k)
+                else:
+                    theirs[k] = fl
+                    self.shared += 1
+        return mine, theirs
+
+    def resolve(self, key: Hashable, value: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            fl = self._flights.pop(key, None)
+            if fl is not None:
+                fl.value, fl.error = value, error
+                fl.event.set()
+                futures, fl.futures = fl.futures, []
+        if fl is not None:
+            for loop, fut in futures:
+                try:
+                    loop.call_soon_threadsafe(_wake, fut)
+                except RuntimeError:
+                    pass  # loop al gesloten
+
+    def wait(self, flight: _Flight, default: Any = None) -> Any:
+        if not flight.event.wait(self.timeout):
+            return default
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    async def wait_async(self, flight: _Flight, default: Any = None) -> Any:
+        """`wait` voor coroutines: wacht op de event loop, zonder een (executor-)thread te bezetten."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if flight.event.is_set():
+                fut.set_result(None)
+            else:
+                flight.futures.append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            return default
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def do(self, key: Hashable, fn: Callable[[], Any], cache: TTLCache | None = None) -> Any:
+        """Eén key: serveer uit `cache`, sluit aan bij een lopende call of voer `fn` zelf uit."""
+        if cache is not None:
+            v = cache.get(key, _MISS)
+            if v is not _MISS:
+                return v
+        mine, theirs = self.claim([key])
+        if theirs:
+            return self.wait(theirs[key])
+        try:
+            v = fn()
+        except BaseException as e:
+            self.resolve(key, error=e)
+            raise
+        if cache is not None:
+            cache.set(key, v)
+        self.resolve(key, v)
+        return v
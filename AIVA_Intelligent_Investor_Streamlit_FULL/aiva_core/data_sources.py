@@ -1,22 +1,32 @@
 from __future__ import annotations
-from typing import Dict, List
+from typing import Callable, Dict, List
 from datetime import datetime, timedelta, date
-import time, os, math, random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio, time, os, math
 import pandas as pd
-import numpy as np
 import requests
 import yfinance as yf
 
-_LAST_ERRORS: list[str] = []
+from . import aio_client, http_client, metrics, offline_store, price_store, provider_health, quality, quota, rate_limit, synthetic
+from .coalesce import SingleFlight, TTLCache
+from .panel import OHLCV, PricePanel
 
-def _log(msg: str):
-    global _LAST_ERRORS
-    _LAST_ERRORS.append(msg)
-    if len(_LAST_ERRORS) > 50:
-        _LAST_ERRORS = _LAST_ERRORS[-50:]
+# Basis-URLs zijn te overschrijven (bv. naar een lokale stub-server in tests)
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+ALPHAVANTAGE_URL = os.getenv("ALPHAVANTAGE_URL", "https://www.alphavantage.co/query")
+
+def _log(msg: str, level: str = "info"):
+    metrics.event(msg, level=level, source="data")
 
 def get_data_errors() -> list[str]:
-    return list(_LAST_ERRORS)
+    """Laatste 50 meldingen van de datalaag (zie `metrics` voor counters en latency)."""
+    return [e["msg"] for e in metrics.REGISTRY.events() if e.get("source") == "data"][-50:]
+
+def get_data_metrics() -> dict:
+    return metrics.snapshot()
+
+def get_provider_health() -> list[dict]:
+    return provider_health.snapshot()
 
 def _sanitize(tickers: List[str]) -> List[str]:
     out = []
@@ -26,198 +36,545 @@ def _sanitize(tickers: List[str]) -> List[str]:
             out.append(t)
     return list(dict.fromkeys(out))
 
-def _normalize_close(df: pd.DataFrame) -> pd.DataFrame:
+def _normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """Open/High/Low/Close/Volume (voor zover aanwezig) met numerieke waarden; Close is verplicht."""
     if df is None or df.empty:
         return pd.DataFrame()
     if isinstance(df.columns, pd.MultiIndex):
-        close_cols = [c for c in df.columns if isinstance(c, tuple) and c[0] == "Close"]
-        if close_cols:
-            df = df.rename(columns={close_cols[0]: "Close"})
+        # yf.download(group_by="column") met één ticker: (veld, ticker)
+        df = df.copy()
+        df.columns = [c[0] if isinstance(c, tuple) else c for c in df.columns]
+        df = df.loc[:, ~pd.Index(df.columns).duplicated()]
     if "Close" not in df.columns and "Adj Close" in df.columns:
         df = df.rename(columns={"Adj Close": "Close"})
-    if "Close" in df.columns:
-        close = pd.to_numeric(df["Close"], errors="coerce").dropna()
-        if not close.empty:
-            return pd.DataFrame({"Close": close})
-    return pd.DataFrame()
+    if "Close" not in df.columns:
+        return pd.DataFrame()
+    out = pd.DataFrame({c: pd.to_numeric(df[c], errors="coerce") for c in OHLCV if c in df.columns})
+    out = out[out["Close"].notna()]
+    if out.empty:
+        return pd.DataFrame()
+    # dagbars: lokale datum zonder tijdzone, gelijk aan batch/Finnhub/AV
+    if getattr(out.index, "tz", None) is not None:
+        out.index = out.index.tz_localize(None)
+    return out
+
+def _gate(provider: str) -> bool:
+    if provider_health.allow(provider):
+        return True
+    metrics.inc("aiva_fetch_total", provider=provider, outcome="skipped")
+    return False
+
+def _failed(provider: str, t0: float) -> None:
+    provider_health.record(provider, False, time.perf_counter() - t0)
+    metrics.inc("aiva_fetch_total", provider=provider, outcome="error")
+
+def _done(provider: str, it, r, t0: float, weight: Callable, expect: Callable) -> None:
+    elapsed = time.perf_counter() - t0
+    ok = r is not None and len(r) > 0
+    metrics.observe("aiva_fetch_seconds", elapsed, provider=provider, site="batch" if weight(it) > 1 else "fetch")
+    metrics.inc("aiva_fetch_total", provider=provider, outcome="ok" if ok else "empty")
+    if ok or expect(it):
+        provider_health.record(provider, ok, elapsed / max(1, weight(it)))
+    else:
+        provider_health.release(provider)
+
+def _pool_map(provider: str, items: list, fn: Callable, weight: Callable = lambda it: 1,
+              expect: Callable = lambda it: True) -> list:
+    """
+    Roep `fn` per item aan in een begrensde thread pool (rate_limit.workers) en geef
+    (item, resultaat)-paren terug in invoervolgorde; mislukte items worden gelogd en overgeslagen.
+    Het tempo zelf wordt bewaakt door de token bucket van de provider in de fetch-functies.
+    Elke call telt mee in `provider_health` (latency per ticker via `weight`); staat de
+    circuit breaker open, dan wordt het item overgeslagen (resultaat None).
+    Een leeg resultaat telt als fout, behalve waar `expect` False is (delta's in weekend/feestdag).
+    """
+    def guarded(it):
+        if not _gate(provider):
+            return None
+        t0 = time.perf_counter()
+        try:
+            r = fn(it)
+        except Exception:
+            _failed(provider, t0)
+            raise
+        except BaseException:
+            provider_health.release(provider)
+            raise
+        _done(provider, it, r, t0, weight, expect)
+        return r
+
+    n = min(rate_limit.workers(provider), len(items))
+    if n <= 1:
+        return [(it, guarded(it)) for it in items]
+    res: dict = {}
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"aiva-{provider}") as ex:
+        futs = {ex.submit(guarded, it): i for i, it in enumerate(items)}
+        for fut in as_completed(futs):
+            i = futs[fut]
+            try:
+                res[i] = fut.result()
+            except Exception as e:
+                _log(f"{provider} {items[i]}: {e}", level="error")
+    return [(items[i], res[i]) for i in sorted(res)]
 
-def _sleep_smol():
-    time.sleep(0.1)
+def _answered(res: list, deltas: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    """
+    Frames per ticker; lege frames vallen weg, behalve bij een delta: leeg = de provider antwoordde
+    zonder nieuwe bars. None (fout, throttling, breaker of quotum) valt altijd weg.
+    """
+    return {t: df for t, df in res if df is not None and (not df.empty or t in deltas)}
+
+def _fetch_concurrent(provider: str, tickers: List[str], fetch_one: Callable[[str], pd.DataFrame | None],
+                      deltas: Dict[str, str] | None = None) -> Dict[str, pd.DataFrame]:
+    """`fetch_one` per ticker via `_pool_map`; zie `_answered`."""
+    deltas = deltas or {}
+    return _answered(_pool_map(provider, tickers, fetch_one, expect=lambda t: t not in deltas), deltas)
+
+def _async_workers(provider: str) -> int:
+    # coroutines zijn goedkoop: standaard ASYNC_PER_HOST tegelijk, het tempo bewaakt de token bucket;
+    # FETCH_WORKERS blijft een harde bovengrens (1 = sequentieel)
+    return rate_limit.workers(provider) if os.getenv("FETCH_WORKERS") else aio_client.per_host()
+
+async def _amap(provider: str, items: list, afn: Callable, weight: Callable = lambda it: 1,
+                expect: Callable = lambda it: True, priority: Callable = lambda it: quota.NORMAL) -> list:
+    """
+    Async `_pool_map`: `await afn(item)` met begrensde gelijktijdigheid, zelfde health/metrics-boekhouding.
+    Items starten op `priority` (laag = eerst); zonder dagbudget voor die prioriteit wordt een item
+    overgeslagen zonder de provider als ongezond te tellen.
+    """
+    sem = asyncio.Semaphore(_async_workers(provider))
+    failed = object()
+
+    async def guarded(it):
+        async with sem:
+            if not await quota.available_async(provider, priority(it)):
+                metrics.inc("aiva_fetch_total", provider=provider, outcome="quota")
+                return None
+            if not _gate(provider):
+                return None
+            t0 = time.perf_counter()
+            try:
+                r = await afn(it)
+            except quota.QuotaExceeded:
+                provider_health.release(provider)
+                metrics.inc("aiva_fetch_total", provider=provider, outcome="quota")
+                return None
+            except Exception as e:
+                _failed(provider, t0)
+                _log(f"{provider} {it}: {e}", level="error")
+                return failed
+            except BaseException:
+                provider_health.release(provider)  # geannuleerd
+                raise
+            _done(provider, it, r, t0, weight, expect)
+            return r
+
+    order = sorted(range(len(items)), key=lambda i: priority(items[i]))
+    res = dict(zip(order, await asyncio.gather(*(guarded(items[i]) for i in order))))
+    return [(it, res[i]) for i, it in enumerate(items) if res[i] is not failed]
+
+async def _afetch_concurrent(provider: str, tickers: List[str], afetch_one: Callable,
+                             deltas: Dict[str, str] | None = None, prio: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
+    deltas = deltas or {}
+    prio = prio or {}
+    res = await _amap(provider, tickers, afetch_one, expect=lambda t: t not in deltas,
+                      priority=lambda t: prio.get(t, quota.NORMAL))
+    return _answered(res, deltas)
 
 # ---------- OFFLINE provider ----------
 def _offline_dir() -> str:
     return os.getenv("OFFLINE_DATA_DIR", "beleggings_ai_agent_ultra_news/data/quotes")
 
-def _gen_walk(n=300, start_price=100.0, vol=0.02) -> pd.Series:
-    rng = np.random.default_rng(42)
-    rets = rng.normal(loc=0.0005, scale=vol, size=n)  # lichte opwaartse drift
-    prices = [start_price]
-    for r in rets:
-        prices.append(max(0.5, prices[-1] * (1.0 + r)))
-    return pd.Series(prices[1:])
-
 def _fetch_offline_one(ticker: str, days: int) -> pd.DataFrame:
+    return _fetch_offline([ticker], days).get(ticker, pd.DataFrame())
+
+def _fetch_offline(tickers: List[str], lookback_days: int) -> Dict[str, pd.DataFrame]:
     folder = _offline_dir()
     os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, f"{ticker}.csv")
-    if os.path.exists(path):
+    out = {t: df for t, df in offline_store.load(folder, tickers, tail=lookback_days+10).items() if not df.empty}
+    missing = [t for t in tickers if t not in out]
+    if missing:
+        # alle ontbrekende tickers in één keer: gedeelde factoren -> realistische correlaties
+        panel = synthetic.generate_panel(missing, n_days=max(260, lookback_days))
         try:
-            df = pd.read_csv(path, parse_dates=["Date"]).set_index("Date").sort_index()
-            df = df.tail(days+10)
-            if not df.empty:
-                return pd.DataFrame({"Close": pd.to_numeric(df["Close"], errors="coerce")}).dropna()
+            offline_store.save_panel(folder, panel)
         except Exception as e:
-            _log(f"offline read fail {ticker}: {e}")
-    # generate synthetic and save
-    s = _gen_walk(n=max(260, days), start_price=100.0 + random.random()*20, vol=0.02)
-    idx = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(s))
-    df = pd.DataFrame({"Close": s.values}, index=idx)
-    try:
-        df.reset_index().rename(columns={"index":"Date"}).to_csv(path, index=False)
-    except Exception as e:
-        _log(f"offline save fail {ticker}: {e}")
-    return df
-
-def _fetch_offline(tickers: List[str], lookback_days: int) -> Dict[str, pd.DataFrame]:
-    out: Dict[str, pd.DataFrame] = {}
-    for t in tickers:
-        out[t] = _fetch_offline_one(t, lookback_days)
-    return out
+            _log(f"offline save fail: {e}", level="error")
+        out.update(panel.to_dict())
+    return {t: out[t] for t in tickers if t in out}
 
 # ---------- yfinance ----------
-def _fetch_yf_one(ticker: str, start: str, session: requests.Session | None) -> pd.DataFrame:
+def _fetch_yf_one(ticker: str, start: str, session: requests.Session | None) -> pd.DataFrame | None:
+    """Leeg frame = yfinance gaf geen bars; None = de download zelf mislukte."""
     try:
+        rate_limit.acquire("yfinance")
         tk = yf.Ticker(ticker, session=session)
         df1 = tk.history(start=start, interval="1d", auto_adjust=False, actions=False, repair=True)
-        df = _normalize_close(df1)
+        df = _normalize_ohlcv(df1)
         if not df.empty:
             return df
     except Exception as e:
-        _log(f"yf history {ticker}: {e}")
+        _log(f"yf history {ticker}: {e}", level="error")
     try:
+        rate_limit.acquire("yfinance")
         df2 = yf.download(
             ticker, start=start, interval="1d",
             progress=False, auto_adjust=False, group_by="column", threads=False
         )
-        return _normalize_close(df2)
+        return _normalize_ohlcv(df2)
     except Exception as e:
-        _log(f"yf download {ticker}: {e}")
-        return pd.DataFrame()
+        _log(f"yf download {ticker}: {e}", level="error")
+        return None
 
-def _fetch_yfinance(tickers: List[str], start: str) -> Dict[str, pd.DataFrame]:
-    sess = requests.Session()
-    sess.headers.update({"User-Agent": "Mozilla/5.0 (AIVA-Intelligent-Investor; +local)"})
+def _yf_batch_size() -> int:
+    try:
+        return max(1, int(os.getenv("YF_BATCH_SIZE", "50")))
+    except ValueError:
+        return 50
+
+def _fetch_yf_batch(chunk: List[str], start: str, deltas: Dict[str, str] | None = None) -> Dict[str, pd.DataFrame]:
+    """
+    Een blok tickers in één yf.download; de MultiIndex (ticker, veld) wordt per ticker gesplitst.
+    Lukt de download, dan krijgen delta-tickers zonder bars een leeg frame (geen nieuwe bars, bv. in
+    het weekend); alleen tickers die yfinance als fout meldt ontbreken en gaan per ticker opnieuw.
+    """
+    deltas = deltas or {}
+    try:
+        rate_limit.acquire("yfinance")
+        raw = yf.download(
+            chunk, start=start, interval="1d",
+            progress=False, auto_adjust=False, group_by="ticker", threads=False
+        )
+    except Exception as e:
+        _log(f"yf batch ({len(chunk)}): {e}", level="error")
+        return {}
+    # yf.download vangt fouten per ticker zelf af en noteert ze hier (threads=False: alleen deze call)
+    errors = set(getattr(getattr(yf, "shared", None), "_ERRORS", None) or ())
     out: Dict[str, pd.DataFrame] = {}
-    for t in tickers:
-        df = _fetch_yf_one(t, start, sess)
+    empty = raw is None or raw.empty
+    multi = not empty and isinstance(raw.columns, pd.MultiIndex)
+    level0 = set(raw.columns.get_level_values(0)) if multi else set()
+    for t in chunk:
+        if empty or (multi and t not in level0) or (not multi and len(chunk) > 1):
+            df = pd.DataFrame()
+        else:
+            df = _normalize_ohlcv(raw[t] if multi else raw)
         if not df.empty:
             out[t] = df
-        else:
-            _log(f"yf empty {t}")
-        _sleep_smol()
+        elif t in deltas and t not in errors:
+            out[t] = df
     return out
 
+def _fetch_yfinance(tickers: List[str], start: str, starts: Dict[str, str] | None = None) -> Dict[str, pd.DataFrame]:
+    starts = starts or {}
+    out: Dict[str, pd.DataFrame] = {}
+
+    # 1) batches per gedeelde startdatum (delta-tickers delen meestal dezelfde)
+    size = _yf_batch_size()
+    if size > 1 and len(tickers) > 1:
+        groups: Dict[str, List[str]] = {}
+        for t in tickers:
+            groups.setdefault(starts.get(t, start), []).append(t)
+        chunks = [(s, ts[i:i + size]) for s, ts in groups.items() for i in range(0, len(ts), size)]
+        res = _pool_map("yfinance", chunks, lambda c: _fetch_yf_batch(c[1], c[0], starts),
+                        weight=lambda c: len(c[1]), expect=lambda c: c[0] == start)
+        for _, got in res:
+            out.update(got or {})
+        # alleen tickers waarvoor de batch mislukte of die yfinance als fout meldde
+        rest = [t for t in tickers if t not in out]
+        if rest:
+            _log(f"yf batch misses={len(rest)}")
+    else:
+        rest = list(tickers)
+
+    # 2) alleen de missers per ticker
+    sess = requests.Session()
+    sess.headers.update({"User-Agent": http_client.USER_AGENT})
+
+    def one(t: str) -> pd.DataFrame | None:
+        df = _fetch_yf_one(t, starts.get(t, start), sess)
+        if df is not None and df.empty and t not in starts:
+            _log(f"yf empty {t}", level="warning")
+        return df
+
+    if rest:
+        out.update(_fetch_concurrent("yfinance", rest, one, starts))
+    return {t: out[t] for t in tickers if t in out}
+
 # ---------- Finnhub ----------
-def _fetch_finnhub_one(ticker: str, start_ts: int, end_ts: int, key: str) -> pd.DataFrame:
+def _finnhub_frame(j: dict) -> pd.DataFrame:
+    idx = pd.to_datetime(j["t"], unit="s", utc=True).tz_convert(None)
+    cols = {"Open": "o", "High": "h", "Low": "l", "Close": "c", "Volume": "v"}
+    return pd.DataFrame({k: j[v] for k, v in cols.items() if len(j.get(v) or []) == len(j["c"])}, index=idx).sort_index()
+
+async def _fetch_finnhub_one(ticker: str, start_ts: int, end_ts: int, key: str,
+                             priority: int = quota.NORMAL) -> pd.DataFrame | None:
+    """Leeg frame = Finnhub antwoordde zonder bars ("no_data"); None = alleen fouten."""
+    answered = False
     for sym in (ticker, ticker.split(".")[0]):
-        url = "https://finnhub.io/api/v1/stock/candle"
+        url = f"{FINNHUB_BASE_URL}/stock/candle"
         params = {"symbol": sym, "resolution": "D", "from": start_ts, "to": end_ts, "token": key}
+        if not await quota.admit("finnhub", priority):
+            raise quota.QuotaExceeded("finnhub")
         try:
-            r = requests.get(url, params=params, timeout=12)
+            r = await aio_client.get(url, params=params, timeout=12)
             r.raise_for_status()
             j = r.json()
+            answered = answered or j.get("s") in ("ok", "no_data")
             if j.get("s") == "ok" and j.get("t") and j.get("c"):
-                idx = pd.to_datetime(j["t"], unit="s", utc=True).tz_convert(None)
-                df = pd.DataFrame({"Close": j["c"]}, index=idx).sort_index()
+                df = _finnhub_frame(j)
                 if not df.empty:
                     return df
             else:
-                _log(f"finnhub {ticker} status={j.get('s')}")
+                _log(f"finnhub {ticker} status={j.get('s')}", level="warning")
         except Exception as e:
-            _log(f"finnhub {ticker}: {e}")
-    return pd.DataFrame()
+            _log(f"finnhub {ticker}: {e}", level="error")
+    return pd.DataFrame() if answered else None
 
-def _fetch_finnhub(tickers: List[str], lookback_days: int, now_ts: int) -> Dict[str, pd.DataFrame]:
+async def _fetch_finnhub(tickers: List[str], lookback_days: int, now_ts: int, starts: Dict[str, str] | None = None,
+                         prio: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
     key = os.getenv("FINNHUB_KEY")
     if not key:
         _log("FINNHUB_KEY ontbreekt")
         return {}
     start_ts = now_ts - int((lookback_days + 10) * 86400)
-    out: Dict[str, pd.DataFrame] = {}
-    for t in tickers:
-        df = _fetch_finnhub_one(t, start_ts, now_ts, key)
-        if not df.empty:
-            out[t] = df
-        _sleep_smol()
-    return out
+    starts = starts or {}
+
+    async def one(t: str) -> pd.DataFrame:
+        t_start = int(pd.Timestamp(starts[t]).timestamp()) if t in starts else start_ts
+        return await _fetch_finnhub_one(t, t_start, now_ts, key, (prio or {}).get(t, quota.NORMAL))
+
+    return await _afetch_concurrent("finnhub", tickers, one, starts, prio)
 
 # ---------- Alpha Vantage ----------
-def _fetch_av_one(ticker: str, key: str) -> pd.DataFrame:
-    url = "https://www.alphavantage.co/query"
+def _av_frame(data: dict) -> pd.DataFrame:
+    cols = {"1. open": "Open", "2. high": "High", "3. low": "Low", "4. close": "Close", "6. volume": "Volume"}
+    df = pd.DataFrame.from_dict(data, orient="index").rename(columns=cols)
+    df.index = pd.to_datetime(df.index)
+    return _normalize_ohlcv(df.sort_index())
+
+async def _fetch_av_one(ticker: str, key: str, priority: int = quota.NORMAL) -> pd.DataFrame | None:
+    """Leeg frame = geen bars voor dit symbool; None = fout of throttling (geen tijdreeks in het antwoord)."""
     params = {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": ticker, "outputsize": "compact", "apikey": key}
+    if not await quota.admit("alpha_vantage", priority):
+        raise quota.QuotaExceeded("alpha_vantage")
     try:
-        r = requests.get(url, params=params, timeout=15)
+        r = await aio_client.get(ALPHAVANTAGE_URL, params=params, timeout=15)
         r.raise_for_status()
         j = r.json()
         data = j.get("Time Series (Daily)") or {}
         if not data:
-            _log(f"av empty {ticker}")
-            return pd.DataFrame()
-        df = pd.DataFrame({k: float(v.get("4. close")) for k, v in data.items()}, index=["Close"]).T
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
-        return pd.DataFrame({"Close": pd.to_numeric(df["Close"], errors="coerce").dropna()})
+            _log(f"av empty {ticker}", level="warning")
+            # "Note"/"Information" = throttling; alleen "Error Message" is een echt antwoord
+            return pd.DataFrame() if "Error Message" in j else None
+        return _av_frame(data)
     except Exception as e:
-        _log(f"alpha {ticker}: {e}")
-        return pd.DataFrame()
+        _log(f"alpha {ticker}: {e}", level="error")
+        return None
 
-def _fetch_alpha_vantage(tickers: List[str]) -> Dict[str, pd.DataFrame]:
+async def _fetch_alpha_vantage(tickers: List[str], starts: Dict[str, str] | None = None,
+                               prio: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
     key = os.getenv("ALPHAVANTAGE_KEY")
     if not key:
         _log("ALPHAVANTAGE_KEY ontbreekt")
         return {}
-    out: Dict[str, pd.DataFrame] = {}
-    for t in tickers:
+    starts = starts or {}
+
+    async def one(t: str) -> pd.DataFrame | None:
+        answered = False
         for sym in (t, t.split(".")[0]):
-            df = _fetch_av_one(sym, key)
+            df = await _fetch_av_one(sym, key, (prio or {}).get(t, quota.NORMAL))
+            if df is None:
+                continue
+            answered = True
             if not df.empty:
-                out[t] = df
-                break
-        _sleep_smol()
-    return out
+                # compact levert ~100 bars; bij een delta alleen de nieuwe bewaren
+                return price_store.since(df, starts[t]) if t in starts else df
+        return pd.DataFrame() if answered else None
+
+    return await _afetch_concurrent("alpha_vantage", tickers, one, starts, prio)
 
 # ---------- Public API ----------
-def fetch_prices(tickers: List[str], lookback_days: int = 365) -> Dict[str, pd.DataFrame]:
+_AUTO_CHAIN = ["yfinance", "finnhub", "alpha_vantage"]
+
+def _configured(name: str) -> bool:
+    if name == "finnhub":
+        return bool(os.getenv("FINNHUB_KEY"))
+    if name == "alpha_vantage":
+        return bool(os.getenv("ALPHAVANTAGE_KEY"))
+    return True
+
+def _provider_chain(provider: str) -> List[str]:
+    if provider == "yfinance":
+        return ["yfinance"]
+    if provider == "finnhub":
+        return ["finnhub"]
+    if provider in ("alpha_vantage", "alphavantage"):
+        return ["alpha_vantage"]
+    return list(_AUTO_CHAIN)
+
+async def _run_provider(name: str, tickers: List[str], start: str, lookback_days: int, now_ts: int,
+                        starts: Dict[str, str] | None = None, prio: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
+    if name == "yfinance":
+        # yfinance is een blokkerende library: eigen thread pool (zie _pool_map) buiten de event loop
+        return await asyncio.to_thread(_fetch_yfinance, tickers, start, starts)
+    if name == "finnhub":
+        return await _fetch_finnhub(tickers, lookback_days, now_ts, starts, prio)
+    if name == "alpha_vantage":
+        return await _fetch_alpha_vantage(tickers, starts, prio)
+    return {}
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+# proces-breed (gedeeld door alle Streamlit-sessies): in-memory LRU + single-flight
+_PRICE_MEMO = TTLCache(maxsize=_env_int("PRICE_MEMO_SIZE", 2048), ttl=float(_env_int("PRICE_MEMO_TTL_S", 300)))
+_PRICE_FLIGHTS = SingleFlight()
+
+async def fetch_prices_async(tickers: List[str], lookback_days: int = 365, max_age_hours: float | None = None,
+                             priority: int | Dict[str, int] = quota.NORMAL) -> Dict[str, pd.DataFrame]:
+    """
+    Dagkoersen per ticker (OHLCV voor zover de provider die levert, altijd Close). Leest eerst uit de lokale price store (zie `price_store`);
+    alleen tickers die ontbreken of verouderd zijn gaan naar de provider(s).
+    Verouderde tickers met opgeslagen historie halen alleen de bars vanaf de laatste
+    opgeslagen datum op (delta, die bar zelf opnieuw) en worden aangevuld.
+    `max_age_hours` overschrijft PRICE_STORE_MAX_AGE_H (0 = altijd opnieuw ophalen).
+
+    Gelijktijdige aanvragen voor dezelfde (ticker, provider, startdatum) delen één
+    upstream-call; resultaten blijven PRICE_MEMO_TTL_S seconden in het geheugen.
+    HTTP-providers draaien als coroutines (zie `aio_client`), yfinance en de opslag in threads.
+    `priority` (per ticker of voor alles, zie `quota`) bepaalt de volgorde en het deel van het
+    dagquotum van key-providers dat gebruikt mag worden: holdings vóór screen-kandidaten.
+    Nieuw opgehaalde bars gaan vóór het opslaan door `quality.check_frames` (rapport in
+    `df.attrs["quality"]`, ook in de opslag; bij PRICE_QUALITY=repair wordt de herstelde versie bewaard).
+    """
     tickers = _sanitize(tickers)
     if not tickers:
         return {}
     start = (datetime.utcnow() - timedelta(days=max(lookback_days, 30))).strftime("%Y-%m-%d")
-    now_ts = int(time.time())
     provider = (os.getenv("DATA_PROVIDER") or "auto").lower().strip()
+    keys = {t: (t, provider, start) for t in tickers}
+
+    out: Dict[str, pd.DataFrame] = {}
+    if max_age_hours is None or max_age_hours > 0:
+        for t in tickers:
+            df = _PRICE_MEMO.get(keys[t])
+            if df is not None:
+                out[t] = df
+    rest = [t for t in tickers if t not in out]
+    metrics.inc("aiva_cache_total", len(out), cache="memo", result="hit")
+    metrics.inc("aiva_cache_total", len(rest), cache="memo", result="miss")
+    if rest:
+        mine, theirs = _PRICE_FLIGHTS.claim([keys[t] for t in rest])
+        lead = [k[0] for k in mine]
+        got: Dict[str, pd.DataFrame] = {}
+        try:
+            if lead:
+                got = await _fetch_prices_uncached(lead, lookback_days, max_age_hours, provider, start,
+                                                   quota.priorities(lead, priority))
+        finally:
+            for t in lead:
+                df = got.get(t)
+                if df is not None:
+                    _PRICE_MEMO.set(keys[t], df)
+                _PRICE_FLIGHTS.resolve(keys[t], df)
+        out.update(got)
+        if theirs:
+            metrics.inc("aiva_coalesced_total", len(theirs))
+            _log(f"coalesced tickers={len(theirs)}")
+        for k, fl in theirs.items():
+            df = await _PRICE_FLIGHTS.wait_async(fl)
+            if df is not None:
+                out[k[0]] = df
+    # kopie: gedeelde frames mogen niet door één sessie gemuteerd worden
+    return {t: out[t].copy() for t in tickers if t in out}
+
+def fetch_prices(tickers: List[str], lookback_days: int = 365, max_age_hours: float | None = None,
+                 priority: int | Dict[str, int] = quota.NORMAL) -> Dict[str, pd.DataFrame]:
+    """Synchrone wrapper om `fetch_prices_async` (zelfde gedrag en caching)."""
+    return aio_client.run(fetch_prices_async(tickers, lookback_days, max_age_hours, priority))
+
+async def _checked(frames: Dict[str, pd.DataFrame], new_bars: Dict[str, int] | None,
+                   copy: bool) -> Dict[str, pd.DataFrame]:
+    """`quality.check_frames` buiten de event loop (no-op bij PRICE_QUALITY=off)."""
+    if not frames or quality.mode() == "off":
+        return frames
+    return await asyncio.to_thread(quality.check_frames, frames, None, new_bars, copy)
+
+async def _fetch_prices_uncached(tickers: List[str], lookback_days: int, max_age_hours: float | None,
+                                 provider: str, start: str, prio: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
+    """Zie `fetch_prices_async`."""
+    now_ts = int(time.time())
     _log(f"provider={provider} tickers={len(tickers)}")
 
-    def run_auto() -> Dict[str, pd.DataFrame]:
-        out = _fetch_yfinance(tickers, start)
-        missing = [t for t in tickers if t not in out]
-        if not missing:
-            return out
-        out2 = _fetch_finnhub(missing, lookback_days, now_ts)
-        out.update(out2); missing = [t for t in tickers if t not in out]
+    if provider == "offline":
+        out = await asyncio.to_thread(_fetch_offline, tickers, lookback_days)
+        # frames kunnen uit de segmentcache van offline_store komen: rapport op een kopie
+        return await _checked(out, None, True)
+
+    chain = _provider_chain(provider)
+    out = await asyncio.to_thread(price_store.load_fresh, tickers, chain, start, max_age_hours)
+    missing = [t for t in tickers if t not in out]
+    metrics.inc("aiva_cache_total", len(out), cache="store", result="hit")
+    metrics.inc("aiva_cache_total", len(missing), cache="store", result="miss")
+    if out:
+        _log(f"store hits={len(out)} misses={len(missing)}")
+    if provider == "auto":
+        # alleen providers met key, gezondste eerst; zie provider_health
+        skipped = [p for p in chain if not _configured(p)]
+        if skipped:
+            _log(f"auto: geen key voor {','.join(skipped)}")
+        chain = provider_health.ranked([p for p in chain if _configured(p)])
+    stale: Dict[str, pd.DataFrame] = {}
+    for name in chain:
         if not missing:
-            return out
-        out3 = _fetch_alpha_vantage(missing)
-        out.update(out3)
-        return out
+            break
+        if not provider_health.available(name):
+            _log(f"{name} circuit open, overgeslagen")
+            continue
+        stored = await asyncio.to_thread(price_store.load_stale, missing, name, start)
+        deltas = {t: price_store.next_start(df) for t, df in stored.items()}
+        for t, df in stored.items():
+            stale.setdefault(t, df)
+        if deltas:
+            metrics.inc("aiva_delta_total", len(deltas), provider=name)
+            _log(f"{name} delta tickers={len(deltas)}")
+        got = await _run_provider(name, missing, start, lookback_days, now_ts, deltas, prio)
+        merged: Dict[str, pd.DataFrame] = {}
+        new_bars: Dict[str, int] = {}
+        for t, df in got.items():
+            if t in stored and df.empty:
+                # provider antwoordde zonder nieuwe bars: opslag is actueel
+                price_store.touch(name, t)
+                out[t] = price_store.since(stored[t], start)
+            else:
+                merged[t] = price_store.merge(stored.get(t), df)
+                new_bars[t] = len(df)
+        # controleren (en bij repair herstellen) vóór het opslaan, zodat opslaghits het rapport en
+        # de herstelde bars meekrijgen; de samengevoegde frames zijn van niemand anders
+        merged = await _checked(merged, new_bars, False)
+        await asyncio.to_thread(lambda: [price_store.write(name, t, df, start=start) for t, df in merged.items()])
+        for t, df in merged.items():
+            out[t] = price_store.since(df, start)
+        missing = [t for t in tickers if t not in out]
+        if missing:
+            # deze tickers vallen door naar de volgende provider in de keten
+            metrics.inc("aiva_fallback_total", len(missing), provider=name)
+    # geen provider antwoordde: verouderde historie serveren, zonder die als vers te markeren
+    old = [t for t in missing if t in stale]
+    if old:
+        _log(f"stale served tickers={len(old)}", level="warning")
+        for t in old:
+            out[t] = price_store.since(stale[t], start)
+    return {t: out[t] for t in tickers if t in out}
 
-    if provider == "yfinance":
-        return _fetch_yfinance(tickers, start)
-    if provider == "finnhub":
-        return _fetch_finnhub(tickers, lookback_days, now_ts)
-    if provider in ("alpha_vantage", "alphavantage"):
-        return _fetch_alpha_vantage(tickers)
-    if provider == "offline":
-        return _fetch_offline(tickers, lookback_days)
-    return run_auto()
+def fetch_panel(tickers: List[str], lookback_days: int = 365, fields: List[str] | None = None,
+                max_age_hours: float | None = None) -> PricePanel:
+    """Zelfde data als `fetch_prices`, als uitgelijnd float32 OHLCV-panel (zie `panel.PricePanel`)."""
+    return PricePanel.from_frames(fetch_prices(tickers, lookback_days, max_age_hours), fields or OHLCV)
 
 def latest_close(tickers: List[str], lookback_days: int = 10) -> Dict[str, float]:
     px = fetch_prices(tickers, lookback_days=lookback_days)
@@ -226,5 +583,5 @@ def latest_close(tickers: List[str], lookback_days: int = 10) -> Dict[str, float
         try:
             res[t] = float(pd.to_numeric(df["Close"], errors="coerce").dropna().iloc[-1])
         except Exception as e:
-            _log(f"latest_close {t}: {e}")
+            _log(f"latest_close {t}: {e}", level="error")
     return res
@@ -4,45 +4,32 @@ import math
 import pandas as pd
 import numpy as np
 
-from .signals import indicators, signal_from_row
+from . import indicator_engine
 try:
     from ta.volatility import AverageTrueRange
 except Exception:
     AverageTrueRange = None
 
-def _sma(s: pd.Series, n: int) -> pd.Series:
-    return pd.to_numeric(s, errors="coerce").rolling(n, min_periods=max(5, n//3)).mean()
-
 def _atr(prices: pd.DataFrame, n: int = 14) -> float:
     if prices is None or prices.empty:
         return float("nan")
-    if {"High","Low","Close"}.issubset(prices.columns):
+    if {"High","Low","Close"}.issubset(prices.columns) and prices["High"].notna().any():
         if AverageTrueRange:
             atr = AverageTrueRange(
                 high=prices["High"], low=prices["Low"], close=prices["Close"], window=n
             ).average_true_range().dropna()
             return float(atr.iloc[-1]) if len(atr) else float("nan")
+        # zonder `ta`: true range met Wilder-smoothing
+        h = pd.to_numeric(prices["High"], errors="coerce")
+        l = pd.to_numeric(prices["Low"], errors="coerce")
+        pc = pd.to_numeric(prices["Close"], errors="coerce").shift(1)
+        tr = pd.concat([h - l, (h - pc).abs(), (l - pc).abs()], axis=1).max(axis=1, skipna=False).dropna()
+        if len(tr) >= n:
+            return float(tr.ewm(alpha=1.0 / n, adjust=False).mean().iloc[-1])
     c = pd.to_numeric(prices["Close"], errors="coerce").dropna()
     rets = c.pct_change().dropna()
     return float(c.iloc[-1] * rets.std()) if len(rets) else float("nan")
 
-def _regime_ok(close: pd.Series) -> bool:
-    sma200 = _sma(close, 200)
-    return bool(len(close) and len(sma200) and close.iloc[-1] > sma200.iloc[-1])
-
-def _hysteresis_ok(df: pd.DataFrame, days: int, kind: str) -> bool:
-    if days <= 1: 
-        return True
-    cols = {"SMA_S","SMA_L"}
-    if not cols.issubset(df.columns): 
-        return True
-    last = df.tail(days)
-    if kind == "BUY":
-        return bool((last["SMA_S"] > last["SMA_L"]).all())
-    if kind == "SELL":
-        return bool((last["SMA_S"] < last["SMA_L"]).all())
-    return True
-
 def system_actions(prices: Dict[str, pd.DataFrame], params: Dict[str, Any], system_cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
     actions: List[Dict[str, Any]] = []
     if not prices:
@@ -59,44 +46,30 @@ def system_actions(prices: Dict[str, pd.DataFrame], params: Dict[str, Any], syst
     atr_n = int(system_cfg.get("atr_window", 14))
     capital = float(system_cfg.get("capital_eur", 25000))
 
-    ind_map: Dict[str, pd.DataFrame] = {}
-    for t, df in prices.items():
-        ind_map[t] = indicators(df, params)
-
-    scored = []
-    for t, ind in ind_map.items():
-        if ind.empty: 
-            continue
-        row = ind.iloc[-1]
-        score = float(row.get("SMA_S", np.nan) - row.get("SMA_L", np.nan))
-        scored.append((t, score))
-    scored.sort(key=lambda x: (x[1] if math.isfinite(x[1]) else -1e9), reverse=True)
-    tickers = [t for t, _ in scored]
-
-    for t in tickers:
-        ind = ind_map[t]
-        if ind.empty: 
-            continue
-        row = ind.iloc[-1]
-        close = float(row.get("Close", np.nan))
+    # indicatoren voor alle tickers in één keer; hieronder alleen nog per-ticker sizing
+    eng = indicator_engine.compute(prices, params, tail=indicator_engine.warmup(params, hyst))
+    last = {n: eng.last(n) for n in indicator_engine.NAMES}
+    score = last["SMA_S"] - last["SMA_L"]
+    with np.errstate(invalid="ignore"):
+        buy = (last["RSI"] <= float(params.get("rsi_buy", 35))) & (last["SMA_S"] > last["SMA_L"])
+        sell = (last["RSI"] >= float(params.get("rsi_sell", 65))) & (last["SMA_S"] < last["SMA_L"])
+        kind = np.where(buy, "BUY", np.where(sell, "SELL", "HOLD"))
+        if regime:
+            kind = np.where((kind == "BUY") & ~(last["Close"] > last["SMA_200"]), "HOLD", kind)
+        if hyst > 1:
+            kind = np.where(eng.hysteresis_ok(hyst, kind), kind, "HOLD")
+        if macd_ok:
+            macd, sig = last["MACD"], last["MACD_SIG"]
+            kind = np.where(((kind == "BUY") & ~(macd > sig)) | ((kind == "SELL") & ~(macd < sig)), "HOLD", kind)
+
+    ranked = sorted((j for j in range(len(eng.tickers)) if eng.bars[j] > 0),
+                    key=lambda j: score[j] if math.isfinite(score[j]) else -1e9, reverse=True)
+    for j in ranked:
+        t = eng.tickers[j]
+        close = float(last["Close"][j])
         if not math.isfinite(close):
             continue
-
-        base = signal_from_row(row, params.get("rsi_buy", 35), params.get("rsi_sell", 65))
-
-        if base == "BUY" and regime:
-            if not _regime_ok(ind["Close"]):
-                base = "HOLD"
-        if base in ("BUY","SELL") and hyst > 1:
-            if not _hysteresis_ok(ind, hyst, base):
-                base = "HOLD"
-        if base == "BUY" and macd_ok and ("MACD" in row and "MACD_SIG" in row):
-            if not (row["MACD"] > row["MACD_SIG"]):
-                base = "HOLD"
-        if base == "SELL" and macd_ok and ("MACD" in row and "MACD_SIG" in row):
-            if not (row["MACD"] < row["MACD_SIG"]):
-                base = "HOLD"
-
+        base = str(kind[j])
         if base == "HOLD":
             continue
 
@@ -105,9 +78,9 @@ def system_actions(prices: Dict[str, pd.DataFrame], params: Dict[str, Any], syst
         atr_val = float("nan")
         if use_atr:
             try:
-                from ta.volatility import AverageTrueRange as _ATR
-                if {"High","Low","Close"}.issubset(ind.columns):
-                    atr_val = _ATR(high=ind["High"], low=ind["Low"], close=ind["Close"], window=atr_n).average_true_range().dropna().iloc[-1]
+                # OHLCV uit fetch_prices: echte true range, geen extra download
+                if {"High","Low","Close"}.issubset(prices[t].columns):
+                    atr_val = _atr(prices[t], atr_n)
             except Exception:
                 atr_val = float("nan")
         if not math.isfinite(atr_val):
@@ -129,7 +102,7 @@ def system_actions(prices: Dict[str, pd.DataFrame], params: Dict[str, Any], syst
             "size": int(size),
             "stop": round(stop, 4),
             "take_profit": round(take, 4),
-            "rsi": float(row.get("RSI", float("nan"))),
+            "rsi": float(last["RSI"][j]),
             "note": f"{base} • regime={'on' if regime else 'off'}, macd={'on' if macd_ok else 'off'}, hyst={hyst}",
         })
         if len(actions) >= max_pos:
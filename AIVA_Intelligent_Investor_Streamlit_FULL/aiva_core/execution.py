@@ -4,7 +4,8 @@ from typing import Dict, List
 import math, datetime as dt
 import numpy as np
 import pandas as pd
-import yfinance as yf
+
+from . import intraday
 
 def _estimate_intraday_profile(df: pd.DataFrame) -> pd.Series:
     """
@@ -17,7 +18,7 @@ def _estimate_intraday_profile(df: pd.DataFrame) -> pd.Series:
     ddf = df[df.index.date == day]
     if len(ddf) < 10:
         return pd.Series([1.0], index=[df.index[-1]])
-    v = ddf["Volume"].replace(0, np.nan).fillna(method="ffill").fillna(1.0)
+    v = ddf["Volume"].replace(0, np.nan).ffill().fillna(1.0)
     w = v / (v.sum() + 1e-9)
     return w
 
@@ -57,10 +58,7 @@ def generate_execution_plan(ticker: str, side: str, target_qty: float, max_parti
     """
     Simpel uitvoeringsplan: haal intraday bars, bouw POV schema, throttle op spread.
     """
-    try:
-        df = yf.download(ticker, period="5d", interval="5m", auto_adjust=True, progress=False)
-    except Exception:
-        df = pd.DataFrame()
+    df = intraday.bars(ticker, interval="5m", period="5d")
     profile = _estimate_intraday_profile(df if isinstance(df, pd.DataFrame) else pd.DataFrame())
     plan = pov_schedule(abs(float(target_qty)), float(max_participation), profile)
     # spread proxy uit laatste bar (High-Low)/Close
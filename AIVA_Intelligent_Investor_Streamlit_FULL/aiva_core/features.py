@@ -0,0 +1,134 @@
+from __future__ import annotations
+from typing import Any, Callable, Hashable, Tuple
+import math, os
+import numpy as np
+import pandas as pd
+
+from . import indicator_engine as eng, metrics
+from .coalesce import TTLCache
+
+# SMA/EMA/RSI/MACD/Bollinger als pd.Series plus de modelfeatures (Screener, ML-forecast).
+# De indicatoren rekenen via de array-kernels van `indicator_engine`, dezelfde als de signalen,
+# sweep en backtest: dezelfde grootheid heeft overal dezelfde definitie. Zoals daar lopen vensters
+# over de geldige waarden van een reeks; bars zonder waarde blijven NaN. RSI kent twee varianten:
+# - "sma": gemiddelde winst/verlies over een rolling venster (signalen, ML-features)
+# - "wilder": exponentieel met alpha 1/n (grafieken)
+# Met `ticker` (en een DatetimeIndex) wordt het resultaat gememoriseerd op (ticker, eerste/laatste bar, lengte, laatste
+# waarde, spec); een tweede aanroep met dezelfde reeks binnen FEATURE_CACHE_TTL_S is een lookup.
+# Resultaten worden gedeeld: niet muteren.
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+_MEMO = TTLCache(maxsize=_env_int("FEATURE_CACHE_SIZE", 4096), ttl=float(_env_int("FEATURE_CACHE_TTL_S", 900)))
+_MISS = object()
+
+def _numeric(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(s, errors="coerce")
+
+def _kernel(s: pd.Series, fn: Callable[[np.ndarray], np.ndarray]) -> pd.Series:
+    """`fn` (kernel op een (bars, 1)-array) over de geldige waarden van `s`, terug op de index van `s`."""
+    x = _numeric(s).to_numpy(dtype=np.float64)
+    ok = np.isfinite(x)
+    out = np.full(len(x), np.nan)
+    if ok.any():
+        out[ok] = fn(x[ok][:, None])[:, 0]
+    return pd.Series(out, index=s.index, name=s.name)
+
+def _key(ticker: str | None, obj: pd.Series | pd.DataFrame, spec: Tuple) -> Hashable | None:
+    if not ticker or obj is None or not len(obj) or not isinstance(obj.index, pd.DatetimeIndex):
+        return None
+    s = obj["Close"] if isinstance(obj, pd.DataFrame) else obj
+    try:
+        last = float(s.iloc[-1])
+    except (TypeError, ValueError):
+        return None
+    # naam erbij: sma(High) en sma(Close) van dezelfde ticker zijn verschillende features
+    name = None if isinstance(obj, pd.DataFrame) else obj.name
+    return (ticker, name, obj.index[0], obj.index[-1], len(obj), None if math.isnan(last) else last, spec)
+
+def _memo(ticker: str | None, obj: pd.Series | pd.DataFrame, spec: Tuple, fn: Callable[[], Any]) -> Any:
+    key = _key(ticker, obj, spec)
+    if key is None:
+        return fn()
+    hit = _MEMO.get(key, _MISS)
+    if hit is not _MISS:
+        metrics.inc("aiva_cache_total", cache="features", result="hit")
+        return hit
+    metrics.inc("aiva_cache_total", cache="features", result="miss")
+    out = fn()
+    _MEMO.set(key, out)
+    return out
+
+def clear() -> None:
+    _MEMO.clear()
+
+# ---------- indicatoren ----------
+def sma(s: pd.Series, n: int, min_periods: int | None = None, ticker: str | None = None) -> pd.Series:
+    """Rolling gemiddelde; `min_periods` standaard het hele venster."""
+    mp = n if min_periods is None else min_periods
+    return _memo(ticker, s, ("sma", n, mp), lambda: _kernel(s, lambda x: eng.rolling_mean(x, n, mp)))
+
+def ema(s: pd.Series, span: int, ticker: str | None = None) -> pd.Series:
+    return _memo(ticker, s, ("ema", span), lambda: _kernel(s, lambda x: eng.ema(x, span)))
+
+def rolling_std(s: pd.Series, n: int, ticker: str | None = None) -> pd.Series:
+    return _memo(ticker, s, ("std", n), lambda: _kernel(s, lambda x: eng.rolling_std(x, n)))
+
+def rsi(s: pd.Series, n: int = 14, method: str = "sma", ticker: str | None = None) -> pd.Series:
+    """RSI met rolling gemiddelden (`method="sma"`) of Wilder-smoothing (`"wilder"`); NaN zonder verliezen."""
+    return _memo(ticker, s, ("rsi", n, method), lambda: _kernel(s, lambda x: eng.rsi(x, n, method)))
+
+def macd(s: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9,
+         ticker: str | None = None) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """(MACD-lijn, signaallijn, histogram); de EMA's komen uit dezelfde cache als `ema`."""
+    def calc():
+        line = ema(s, fast, ticker) - ema(s, slow, ticker)
+        sig = _kernel(line, lambda x: eng.ema(x, signal))
+        return line, sig, line - sig
+    return _memo(ticker, s, ("macd", fast, slow, signal), calc)
+
+def bbands(s: pd.Series, n: int = 20, k: float = 2.0, min_periods: int | None = None,
+           ticker: str | None = None) -> Tuple[pd.Series, pd.Series]:
+    """(onderband, bovenband) rond `sma(s, n, min_periods)`."""
+    def calc():
+        m, sd = sma(s, n, min_periods, ticker), rolling_std(s, n, ticker)
+        return m - k * sd, m + k * sd
+    return _memo(ticker, s, ("bb", n, k, min_periods), calc)
+
+# ---------- modelfeatures ----------
+def screener_features(df: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    """ret1/ret5/vol20/mom20/bbw op de geldige Closes, verschoven naar info van t-1 (Screener)."""
+    def calc() -> pd.DataFrame:
+        c = _numeric(df["Close"]).dropna()
+        r = c.pct_change().fillna(0.0)
+        hl = _numeric(df["High"]) - _numeric(df["Low"])
+        bbw = hl.rolling(20).mean().shift(1) / (c.shift(1) + 1e-9)
+        return pd.DataFrame({
+            "ret1": r.shift(1),
+            "ret5": c.pct_change(5).shift(1),
+            "vol20": r.rolling(20).std().shift(1),
+            "mom20": r.rolling(20).mean().shift(1),
+            "bbw": bbw.reindex(c.index),
+        }, index=c.index)
+    return _memo(ticker, df, ("screener",), calc)
+
+def ml_features(df: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    """Features voor `ml_forecast` (rendementen, volatiliteit, MA-afstanden, RSI 14), zonder NaN-rijen."""
+    def calc() -> pd.DataFrame:
+        px = df["Close"].astype(float)
+        r = px.pct_change()
+        feats = pd.DataFrame({
+            "r1": r.shift(1),
+            "r5": px.pct_change(5).shift(1),
+            "r20": px.pct_change(20).shift(1),
+            "vol20": r.rolling(20).std().shift(1),
+            "ma20_gap": (px / sma(px, 20, ticker=ticker) - 1).shift(1),
+            "ma50_gap": (px / sma(px, 50, ticker=ticker) - 1).shift(1),
+            "rsi14": rsi(px, 14, ticker=ticker).shift(1),
+        }, index=df.index)
+        return feats.dropna()
+    return _memo(ticker, df, ("ml",), calc)
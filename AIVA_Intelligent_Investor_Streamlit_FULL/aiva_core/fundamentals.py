@@ -1,9 +1,11 @@
 from __future__ import annotations
 from typing import Dict, List, Any
-import os, requests
+import asyncio, os
 import pandas as pd
 import yfinance as yf
 
+from . import aio_client, quota, rate_limit
+
 def _yf_one(ticker: str) -> Dict[str, Any]:
     try:
         t = yf.Ticker(ticker)
@@ -36,67 +38,106 @@ def _yf_one(ticker: str) -> Dict[str, Any]:
     except Exception:
         return {}
 
-def _fmp_many(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+FMP_BASE_URL = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com/api/v3/")
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+
+async def _fmp_json(path: str, params: Dict[str, Any], priority: int) -> list:
+    try:
+        if not await quota.admit("fmp", priority):
+            return []
+        r = await aio_client.get(FMP_BASE_URL + path, params=params, timeout=20)
+        j = r.json() if r.status_code < 400 else []
+        # FMP meldt fouten als object met status 200 ({"Error Message": ...})
+        return j if isinstance(j, list) else []
+    except Exception:
+        return []
+
+async def _fmp_many(tickers: List[str], priority: int = quota.NORMAL) -> Dict[str, Dict[str, Any]]:
     key = os.getenv("FMP_API_KEY")
     if not key:
         return {}
-    base = "https://financialmodelingprep.com/api/v3/"
     res: Dict[str, Dict[str, Any]] = {}
+    joined = ",".join(tickers)
+    profile, metrics_ = await asyncio.gather(
+        _fmp_json("profile/" + joined, {"apikey": key}, priority),
+        _fmp_json("key-metrics/" + joined, {"apikey": key, "period": "annual", "limit": 1}, priority),
+    )
     try:
-        r = requests.get(base + "profile/" + ",".join(tickers), params={"apikey": key}, timeout=20)
-        if r.ok:
-            for it in r.json():
-                t = it.get("symbol")
-                res.setdefault(t, {}).update({
-                    "price": it.get("price"), "marketCap": it.get("mktCap"),
-                    "longName": it.get("companyName"), "currency": it.get("currency"),
-                    "link": it.get("website")
-                })
+        for it in profile:
+            if not isinstance(it, dict):
+                continue
+            t = it.get("symbol")
+            res.setdefault(t, {}).update({
+                "price": it.get("price"), "marketCap": it.get("mktCap"),
+                "longName": it.get("companyName"), "currency": it.get("currency"),
+                "link": it.get("website")
+            })
     except Exception:
         pass
     try:
-        r = requests.get(base + "key-metrics/" + ",".join(tickers), params={"apikey": key, "period":"annual","limit":1}, timeout=20)
-        if r.ok:
-            for it in r.json():
-                t = it.get("symbol")
-                res.setdefault(t, {}).update({
-                    "trailingPE": it.get("peRatio"),
-                    "priceToBook": it.get("pbRatio"),
-                    "enterpriseToEbitda": it.get("enterpriseValueOverEBITDA"),
-                    "freeCashflow": it.get("freeCashFlowPerShare"),
-                })
+        for it in metrics_:
+            if not isinstance(it, dict):
+                continue
+            t = it.get("symbol")
+            res.setdefault(t, {}).update({
+                "trailingPE": it.get("peRatio"),
+                "priceToBook": it.get("pbRatio"),
+                "enterpriseToEbitda": it.get("enterpriseValueOverEBITDA"),
+                "freeCashflow": it.get("freeCashFlowPerShare"),
+            })
     except Exception:
         pass
     return res
 
-def _finnhub_many(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+async def _finnhub_one(t: str, key: str, priority: int) -> Dict[str, Any] | None:
+    try:
+        if not await quota.admit("finnhub", priority):
+            return None
+        r = await aio_client.get(f"{FINNHUB_BASE_URL}/stock/metric",
+                                 params={"symbol": t, "metric": "all", "token": key}, timeout=15)
+        if r.status_code < 400:
+            m = r.json().get("metric", {})
+            return {
+                "trailingPE": m.get("peInclExtraTTM") or m.get("peExclExtraTTM"),
+                "priceToBook": m.get("pbAnnual") or m.get("pbQuarterly"),
+                "enterpriseToEbitda": m.get("enterpriseValueEBITDAAnnual"),
+                "freeCashflow": m.get("freeCashFlowPerShareTTM"),
+                "marketCap": m.get("marketCapitalization"),
+            }
+    except Exception:
+        pass
+    return None
+
+async def _finnhub_many(tickers: List[str], prio: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
     key = os.getenv("FINNHUB_KEY")
     if not key:
         return {}
-    out: Dict[str, Dict[str, Any]] = {}
-    for t in tickers:
-        try:
-            r = requests.get("https://finnhub.io/api/v1/stock/metric",
-                             params={"symbol": t, "metric": "all", "token": key}, timeout=15)
-            if r.ok:
-                m = r.json().get("metric", {})
-                out[t] = {
-                    "trailingPE": m.get("peInclExtraTTM") or m.get("peExclExtraTTM"),
-                    "priceToBook": m.get("pbAnnual") or m.get("pbQuarterly"),
-                    "enterpriseToEbitda": m.get("enterpriseValueEBITDAAnnual"),
-                    "freeCashflow": m.get("freeCashFlowPerShareTTM"),
-                    "marketCap": m.get("marketCapitalization"),
-                }
-        except Exception:
-            pass
-    return out
+    res = await asyncio.gather(*(_finnhub_one(t, key, prio[t]) for t in tickers))
+    return {t: d for t, d in zip(tickers, res) if d is not None}
 
-def get_fundamentals(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
-    base = {t: _yf_one(t) for t in tickers}
-    fmp = _fmp_many(tickers)
+async def _yf_many(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    # yfinance blokkeert: per ticker een thread, begrensd zoals de koers-fetches
+    sem = asyncio.Semaphore(rate_limit.workers("yfinance"))
+
+    async def one(t: str) -> Dict[str, Any]:
+        async with sem:
+            return await asyncio.to_thread(_yf_one, t)
+
+    return dict(zip(tickers, await asyncio.gather(*(one(t) for t in tickers))))
+
+async def get_fundamentals_async(tickers: List[str], priority: int | Dict[str, int] = quota.NORMAL) -> Dict[str, Dict[str, Any]]:
+    """
+    yfinance, FMP en Finnhub gelijktijdig; latere bronnen vullen/overschrijven niet-lege velden.
+    FMP haalt alle tickers in één call op, dus telt de hoogste prioriteit (laagste waarde).
+    """
+    prio = quota.priorities(tickers, priority)
+    base, fmp, fin = await asyncio.gather(_yf_many(tickers), _fmp_many(tickers, min(prio.values(), default=quota.NORMAL)),
+                                          _finnhub_many(tickers, prio))
     for t, d in fmp.items():
         base.setdefault(t, {}).update({k:v for k,v in d.items() if v is not None})
-    fin = _finnhub_many(tickers)
     for t, d in fin.items():
         base.setdefault(t, {}).update({k:v for k,v in d.items() if v is not None})
-    return base
\ No newline at end of file
+    return base
+
+def get_fundamentals(tickers: List[str], priority: int | Dict[str, int] = quota.NORMAL) -> Dict[str, Dict[str, Any]]:
+    return aio_client.run(get_fundamentals_async(tickers, priority))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Any, Dict
+import os, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+USER_AGENT = "Mozilla/5.0 (AIVA-Intelligent-Investor; +local)"
+DEFAULT_TIMEOUT = 15.0
+
+# keep-alive pool per host: ruwweg het aantal gelijktijdige workers dat er naartoe gaat
+_HOST_POOLS: Dict[str, int] = {
+    "https://finnhub.io": 8,
+    "https://www.alphavantage.co": 2,
+    "https://financialmodelingprep.com": 4,
+    "https://newsapi.org": 4,
+}
+_DEFAULT_POOL = 4
+
+class _TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter met een standaard-timeout voor calls die er zelf geen meegeven."""
+
+    def __init__(self, *args, timeout: float = DEFAULT_TIMEOUT, **kwargs):
+        self._timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self._timeout
+        return super().send(request, **kwargs)
+
+def _retry() -> Retry:
+    try:
+        total = int(os.getenv("HTTP_RETRIES", "2"))
+    except ValueError:
+        total = 2
+    return Retry(
+        total=total, connect=total, read=total, status=total,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def _adapter(pool: int) -> _TimeoutAdapter:
+    return _TimeoutAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=_retry())
+
+def build_session() -> requests.Session:
+    """Nieuwe sessie met keep-alive pools per host, retry/backoff en standaard-timeout."""
+    s = requests.Session()
+    s.headers.update({"User-Agent": USER_AGENT})
+    s.mount("https://", _adapter(_DEFAULT_POOL))
+    s.mount("http://", _adapter(_DEFAULT_POOL))
+    for prefix, pool in _HOST_POOLS.items():
+        s.mount(prefix, _adapter(pool))
+    return s
+
+_SESSION: requests.Session | None = None
+_LOCK = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Proces-brede gedeelde sessie (urllib3-pools zijn thread-safe)."""
+    global _SESSION
+    if _SESSION is None:
+        with _LOCK:
+            if _SESSION is None:
+                _SESSION = build_session()
+    return _SESSION
+
+def get(url: str, params: Dict[str, Any] | None = None, timeout: float | None = None, **kwargs) -> requests.Response:
+    host = urlsplit(url).netloc
+    t0 = time.perf_counter()
+    try:
+        r = get_session().get(url, params=params, timeout=timeout, **kwargs)
+    except Exception as e:
+        metrics.inc("aiva_http_total", host=host, status="error")
+        metrics.event(f"http {host}: {type(e).__name__}", level="error", source="http")
+        raise
+    finally:
+        metrics.observe("aiva_http_seconds", time.perf_counter() - t0, host=host)
+    metrics.inc("aiva_http_total", host=host, status=r.status_code)
+    metrics.inc("aiva_http_bytes_total", len(r.content or b""), host=host)
+    retries = getattr(getattr(r.raw, "retries", None), "history", None) or ()
+    if retries:
+        metrics.inc("aiva_http_retries_total", len(retries), host=host)
+    return r
+
+def reset_session() -> None:
+    """Sluit de gedeelde sessie (bv. na fork of bij tests)."""
+    global _SESSION
+    with _LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+        _SESSION = None
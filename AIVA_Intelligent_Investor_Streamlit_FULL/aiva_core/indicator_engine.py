@@ -0,0 +1,225 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+import math, os
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from .panel import PricePanel
+
+# De indicatorkernel van het project: SMA (met min_periods), EMA/ewm (adjust=False), RSI (rolling
+# means of Wilder), MACD 12/26/9 en Bollinger 20/2 op 2-D arrays (bars x tickers). `features`
+# (pd.Series, grafieken en modelfeatures), `signals`, `sweep` en `backtest_engine` rekenen via deze
+# functies; `indicator_state` is de incrementele (O(1) per bar) vorm van dezelfde definities.
+# Voor `compute` wordt elke kolom eerst rechts uitgelijnd (geldige Closes onderaan), zodat rij -1
+# voor elke ticker zijn laatste bar is en vensters over de eigen bars van een ticker lopen.
+
+NAMES = ["Close", "SMA_S", "SMA_L", "SMA_200", "EMA_20", "RSI", "MACD", "MACD_SIG", "BB_L", "BB_H"]
+
+def _ema_rows(span: int, tol: float) -> int:
+    """Bars waarna de beginwaarde van een EMA minder dan `tol` weegt."""
+    return int(math.ceil(math.log(tol) / math.log(1.0 - 2.0 / (span + 1.0))))
+
+def tail_tol() -> float:
+    try:
+        return min(0.1, max(1e-12, float(os.getenv("SIGNAL_TAIL_TOL", "1e-6"))))
+    except ValueError:
+        return 1e-6
+
+def warmup(params: Dict[str, Any], hysteresis_days: int = 1, tol: float | None = None) -> int:
+    """
+    Minimaal aantal laatste bars waarop `compute` dezelfde laatste rij(en) geeft als op de hele historie:
+    SMA's en Bollinger exact (venster + hysteresis), RSI exact (n + 1), EMA/MACD tot op `tol`
+    (gewicht van de beginwaarde, SIGNAL_TAIL_TOL, standaard 1e-6).
+    """
+    tol = tail_tol() if tol is None else tol
+    ma = max(int(params.get("ma_short", 20)), int(params.get("ma_long", 50)))
+    rows = [ma + max(1, int(hysteresis_days)) - 1, 200, 20, int(params.get("rsi_period", 14)) + 1,
+            _ema_rows(20, tol), _ema_rows(26, tol) + _ema_rows(9, tol)]
+    return max(rows)
+
+def _ref(x: np.ndarray) -> np.ndarray:
+    """Eerste geldige waarde per kolom (0 als er geen is); centreren beperkt afrondfouten in cumsums."""
+    ok = np.isfinite(x)
+    first = np.argmax(ok, axis=0)
+    ref = x[first, np.arange(x.shape[1])]
+    return np.where(ok.any(axis=0), ref, 0.0)
+
+def _window(a: np.ndarray, n: int) -> np.ndarray:
+    """Som over de laatste `n` rijen van een cumsum."""
+    out = a.copy()
+    if n < len(a):
+        out[n:] -= a[:-n]
+    return out
+
+class Windows:
+    """Rolling gemiddelden over vensters naar keuze uit één cumsum (NaN's tellen niet mee)."""
+
+    def __init__(self, x: np.ndarray):
+        ok = np.isfinite(x)
+        self.ref = _ref(x)
+        self.cs = np.cumsum(np.where(ok, x - self.ref, 0.0), axis=0)
+        self.k = np.cumsum(ok, axis=0)
+        self._memo: Dict[tuple, np.ndarray] = {}
+
+    def mean(self, n: int, min_periods: int) -> np.ndarray:
+        key = (n, min_periods)
+        if key not in self._memo:
+            k = _window(self.k, n)
+            with np.errstate(all="ignore"):
+                out = _window(self.cs, n) / k + self.ref
+            out[k < max(1, min_periods)] = np.nan
+            self._memo[key] = out
+        return self._memo[key]
+
+def rolling_mean(x: np.ndarray, n: int, min_periods: int | None = None) -> np.ndarray:
+    return Windows(x).mean(n, n if min_periods is None else min_periods)
+
+def rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    """Steekproef-std (ddof=1) over `n` rijen, minimaal `n` waarden (zoals pandas `.rolling(n).std()`)."""
+    ok = np.isfinite(x)
+    y = np.where(ok, x - _ref(x), 0.0)
+    s1 = _window(np.cumsum(y, axis=0), n)
+    s2 = _window(np.cumsum(y * y, axis=0), n)
+    k = _window(np.cumsum(ok, axis=0), n)
+    with np.errstate(all="ignore"):
+        var = np.maximum((s2 - s1 * s1 / k) / (k - 1), 0.0)
+    out = np.sqrt(var)
+    out[k < n] = np.nan
+    return out
+
+def ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    """`ewm(alpha, adjust=False).mean()` per kolom; alleen voorloop-NaN's (rechts uitgelijnde kolommen)."""
+    a = float(alpha)
+    ok = np.isfinite(x)
+    if not len(x):
+        return x.copy()
+    x0 = _ref(x)
+    filled = np.where(ok, x, x0)
+    y = lfilter([a], [1.0, a - 1.0], filled, axis=0, zi=((1.0 - a) * x0)[None, :])[0]
+    y[~ok] = np.nan
+    return y
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    return ewm(x, 2.0 / (span + 1.0))
+
+def moves(x: np.ndarray) -> tuple:
+    """(winst, verlies) per bar t.o.v. de vorige rij; NaN waar geen verschil bestaat."""
+    d = np.full(x.shape, np.nan)
+    d[1:] = x[1:] - x[:-1]
+    nan = np.isnan(d)
+    return np.where(nan, np.nan, np.maximum(d, 0.0)), np.where(nan, np.nan, np.maximum(-d, 0.0))
+
+def rsi_from(up: np.ndarray, down: np.ndarray) -> np.ndarray:
+    """RSI uit gemiddelde winst/verlies; NaN zonder verliezen."""
+    with np.errstate(all="ignore"):
+        return 100.0 - 100.0 / (1.0 + up / np.where(down == 0, np.nan, down))
+
+def rsi(x: np.ndarray, n: int = 14, method: str = "sma") -> np.ndarray:
+    """RSI met rolling gemiddelden (`"sma"`, signalen) of Wilder-smoothing (`"wilder"`, alpha 1/n)."""
+    up, down = moves(x)
+    if method == "wilder":
+        return rsi_from(ewm(up, 1.0 / n), ewm(down, 1.0 / n))
+    return rsi_from(rolling_mean(up, n), rolling_mean(down, n))
+
+def right_align(c: np.ndarray) -> tuple:
+    """(gealigneerde array, permutatie, bars per kolom): NaN's naar boven, volgorde van geldige waarden blijft."""
+    valid = np.isfinite(c)
+    order = np.argsort(valid, axis=0, kind="stable")
+    return np.take_along_axis(c, order, axis=0), order, valid.sum(axis=0)
+
+class IndicatorPanel:
+    """
+    Indicatorwaarden per naam als (bars, tickers)-array, rechts uitgelijnd: rij -1 is de laatste bar
+    van elke ticker; een ticker met k bars heeft NaN in de bovenste rijen.
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, tickers: List[str], arrays: Dict[str, np.ndarray],
+                 order: np.ndarray, bars: np.ndarray):
+        self.index = index
+        self.tickers = list(tickers)
+        self.arrays = arrays
+        self.order = order
+        self.bars = bars
+        self._pos = {t: i for i, t in enumerate(self.tickers)}
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._pos
+
+    def last(self, name: str) -> np.ndarray:
+        a = self.arrays[name]
+        return a[-1] if len(a) else np.full(len(self.tickers), np.nan)
+
+    def tail(self, name: str, k: int) -> np.ndarray:
+        """Laatste `k` bars per ticker (k, tickers); rijen vóór de eerste bar van een ticker zijn NaN."""
+        return self.arrays[name][-k:]
+
+    def hysteresis_ok(self, days: int, kind: np.ndarray) -> np.ndarray:
+        """Per ticker: SMA_S bleef de laatste `days` bars boven (BUY) of onder (SELL) SMA_L."""
+        if days <= 1:
+            return np.ones(len(self.tickers), dtype=bool)
+        s, l = self.tail("SMA_S", days), self.tail("SMA_L", days)
+        # rijen vóór de eerste bar tellen niet mee (zoals `tail` op een korter frame)
+        pad = np.arange(len(s))[:, None] < (len(s) - np.minimum(self.bars, days))[None, :]
+        with np.errstate(invalid="ignore"):
+            up = ((s > l) | pad).all(axis=0)
+            down = ((s < l) | pad).all(axis=0)
+        return np.where(kind == "BUY", up, np.where(kind == "SELL", down, True))
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        """Indicatorframe van één ticker over zijn eigen bars (bij `tail` alleen de laatste bars)."""
+        j = self._pos[ticker]
+        k = int(self.bars[j])
+        rows = self.order[len(self.order) - k:, j]
+        return pd.DataFrame({n: a[len(a) - k:, j] for n, a in self.arrays.items()}, index=self.index[rows])
+
+def _last_bars(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    if df is None or df.empty or "Close" not in df.columns:
+        return df
+    return df.loc[pd.to_numeric(df["Close"], errors="coerce").notna()].iloc[-n:]
+
+def _tail_panel(frames: Dict[str, pd.DataFrame], n: int) -> PricePanel:
+    """Panel met (minstens) de laatste `n` geldige Closes per ticker; `iloc` met marge, exact als fallback."""
+    cut = {t: df.iloc[-2 * n:] if df is not None else df for t, df in frames.items()}
+    panel = PricePanel.from_frames(cut, ["Close"], dtype=np.float64)
+    valid = np.isfinite(panel.field("Close")).sum(axis=0)
+    short = [t for j, t in enumerate(panel.tickers) if valid[j] < n and len(frames[t]) > 2 * n]
+    if short:
+        cut.update({t: _last_bars(frames[t], n) for t in short})
+        panel = PricePanel.from_frames(cut, ["Close"], dtype=np.float64)
+    return panel
+
+def compute(prices: Dict[str, pd.DataFrame] | PricePanel, params: Dict[str, Any],
+            tail: int | None = None) -> IndicatorPanel:
+    """
+    Alle indicatoren (NAMES) voor alle tickers in één keer. Met `tail` (zie `warmup`)
+    alleen over de laatste `tail` geldige bars per ticker. Frames worden in float64 uitgelijnd
+    (zelfde uitkomst als per ticker); een PricePanel rekent op zijn eigen (float32-)closes.
+    """
+    if tail and not isinstance(prices, PricePanel):
+        panel = _tail_panel(prices or {}, int(tail))
+    else:
+        panel = prices if isinstance(prices, PricePanel) else PricePanel.from_frames(prices or {}, ["Close"], dtype=np.float64)
+    if not panel.tickers or not len(panel):
+        return IndicatorPanel(panel.index, panel.tickers, {n: np.empty((0, len(panel.tickers))) for n in NAMES},
+                              np.empty((0, len(panel.tickers)), dtype=np.int64), np.zeros(len(panel.tickers), dtype=np.int64))
+    c, order, bars = right_align(np.asarray(panel.field("Close"), dtype=np.float64))
+    if tail and tail < len(c):
+        # rechts uitgelijnd: de onderste `tail` rijen zijn per ticker de laatste bars
+        c, order, bars = c[-int(tail):], order[-int(tail):], np.minimum(bars, int(tail))
+    return IndicatorPanel(panel.index, panel.tickers, arrays(c, params), order, bars)
+
+def arrays(c: np.ndarray, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Indicatoren per naam voor een rechts uitgelijnde float64-array closes (bars, tickers)."""
+    ma_s = int(params.get("ma_short", 20))
+    ma_l = int(params.get("ma_long", 50))
+    rsi_n = int(params.get("rsi_period", 14))
+    sma = lambda n: rolling_mean(c, n, max(5, n // 3))
+    mid = sma(20)
+    sd = rolling_std(c, 20)
+    macd = ema(c, 12) - ema(c, 26)
+    return {
+        "Close": c, "SMA_S": sma(ma_s), "SMA_L": sma(ma_l), "SMA_200": sma(200), "EMA_20": ema(c, 20),
+        "RSI": rsi(c, rsi_n), "MACD": macd, "MACD_SIG": ema(macd, 9),
+        "BB_L": mid - 2.0 * sd, "BB_H": mid + 2.0 * sd,
+    }
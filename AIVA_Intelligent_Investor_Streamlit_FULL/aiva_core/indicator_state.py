@@ -0,0 +1,286 @@
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+import copy, json, math, os, threading
+import numpy as np
+import pandas as pd
+
+from . import price_store
+from .panel import PricePanel
+
+# Incrementele indicatoren per ticker: lopende sommen (SMA's, Bollinger, RSI), EMA-, MACD- en
+# Wilder-state plus een ringbuffer met de laatste closes. Eén nieuwe bar kost O(1), ongeacht de
+# lookback; dezelfde bar opnieuw (intraday bijgewerkte dagbar) herziet de laatste stap.
+# Incrementele vorm van de kernel in `indicator_engine` (zelfde definities); sommen zijn gecentreerd
+# op de eerste close en worden elke ringlengte exact herberekend, zodat afrondfouten niet oplopen.
+# De state wordt als JSON naast de prijsopslag bewaard (`<PRICE_STORE_DIR>/_indicators/`).
+
+_SCALARS = ("n", "ref", "sum_s", "sum_l", "sum_200", "sum_20", "sq_20", "up", "down",
+            "ema12", "ema26", "ema20", "sig", "w_up", "w_down", "run_up", "run_down", "last_ts", "prev_ts")
+
+def enabled() -> bool:
+    return (os.getenv("INDICATOR_STATE") or "off").lower().strip() in ("1", "on", "true", "yes")
+
+def _key(params: Dict[str, Any]) -> Tuple[int, int, int]:
+    return (int(params.get("ma_short", 20)), int(params.get("ma_long", 50)), int(params.get("rsi_period", 14)))
+
+class IndicatorState:
+    """Indicatorstate van één ticker voor vaste (ma_short, ma_long, rsi_period)."""
+
+    def __init__(self, ma_short: int = 20, ma_long: int = 50, rsi_period: int = 14):
+        self.ma_short, self.ma_long, self.rsi_period = int(ma_short), int(ma_long), int(rsi_period)
+        self.size = max(self.ma_short, self.ma_long, 200, 20, self.rsi_period) + 2
+        self.buf = np.zeros(self.size)
+        for k in _SCALARS:
+            setattr(self, k, 0.0)
+        self.n = 0
+        self.run_up = self.run_down = 0
+        self.last_ts = self.prev_ts = None
+        self._prev: Dict[str, Any] | None = None
+
+    @classmethod
+    def for_params(cls, params: Dict[str, Any]) -> "IndicatorState":
+        return cls(*_key(params))
+
+    def copy(self) -> "IndicatorState":
+        """Onafhankelijke kopie (`_prev` wordt bij elke bar vervangen, niet gemuteerd)."""
+        st = copy.copy(self)
+        st.buf = self.buf.copy()
+        return st
+
+    def _close(self, k: int) -> float:
+        """Close van bar `k` (0 = eerste); alleen de laatste `size` bars staan in de buffer."""
+        return float(self.buf[k % self.size])
+
+    def _sma(self, total: float, w: int, min_periods: int) -> float:
+        k = min(self.n, w)
+        return total / k + self.ref if k >= max(1, min_periods) else math.nan
+
+    def _resync(self) -> None:
+        y = np.array([self._close(k) for k in range(self.n - self.size + 1, self.n)]) - self.ref
+        self.sum_s, self.sum_l = float(y[-self.ma_short:].sum()), float(y[-self.ma_long:].sum())
+        self.sum_200, self.sum_20, self.sq_20 = float(y[-200:].sum()), float(y[-20:].sum()), float((y[-20:] ** 2).sum())
+        d = np.diff(y)[-self.rsi_period:]
+        self.up, self.down = float(np.maximum(d, 0).sum()), float(np.maximum(-d, 0).sum())
+
+    def _append(self, ts: pd.Timestamp, c: float) -> None:
+        self._prev = {k: getattr(self, k) for k in _SCALARS}
+        n = self.n
+        if n == 0:
+            self.ref = c
+        y = c - self.ref
+        # waarde die uit elk venster valt staat nog in de buffer (size > grootste venster + 1)
+        for attr, w in (("sum_s", self.ma_short), ("sum_l", self.ma_long), ("sum_200", 200), ("sum_20", 20)):
+            out = self._close(n - w) - self.ref if n >= w else 0.0
+            setattr(self, attr, getattr(self, attr) + y - out)
+        out = self._close(n - 20) - self.ref if n >= 20 else 0.0
+        self.sq_20 += y * y - out * out
+        if n >= 1:
+            d = c - self._close(n - 1)
+            self.up += max(d, 0.0)
+            self.down += max(-d, 0.0)
+            j = n - self.rsi_period  # delta van bar j valt uit het RSI-venster
+            if j >= 1:
+                dj = self._close(j) - self._close(j - 1)
+                self.up -= max(dj, 0.0)
+                self.down -= max(-dj, 0.0)
+            a = 1.0 / self.rsi_period
+            if n == 1:
+                self.w_up, self.w_down = max(d, 0.0), max(-d, 0.0)
+            else:
+                self.w_up = a * max(d, 0.0) + (1 - a) * self.w_up
+                self.w_down = a * max(-d, 0.0) + (1 - a) * self.w_down
+        for attr, span in (("ema12", 12), ("ema26", 26), ("ema20", 20)):
+            a = 2.0 / (span + 1.0)
+            setattr(self, attr, c if n == 0 else a * c + (1 - a) * getattr(self, attr))
+        macd = self.ema12 - self.ema26
+        self.sig = macd if n == 0 else (2.0 / 10.0) * macd + 0.8 * self.sig
+        self.buf[n % self.size] = c
+        self.n = n + 1
+        self.prev_ts, self.last_ts = self.last_ts, ts
+        if self.n % self.size == 0:
+            self._resync()
+        s = self._sma(self.sum_s, self.ma_short, max(5, self.ma_short // 3))
+        l = self._sma(self.sum_l, self.ma_long, max(5, self.ma_long // 3))
+        self.run_up = self.run_up + 1 if s > l else 0
+        self.run_down = self.run_down + 1 if s < l else 0
+
+    def update(self, ts: Any, close: float) -> bool:
+        """
+        Verwerk één bar in O(1). Een bar met het tijdstip van de laatste bar vervangt die (herziening);
+        oudere bars en NaN's worden genegeerd. True als de state veranderd is.
+        """
+        c = float(close)
+        ts = pd.Timestamp(ts)
+        if not math.isfinite(c):
+            return False
+        if self.last_ts is not None and ts == self.last_ts:
+            if c == self._close(self.n - 1) or self._prev is None:
+                return False
+            # terug naar de state vóór de laatste bar; de buffer-slot wordt door _append overschreven
+            for k, v in self._prev.items():
+                setattr(self, k, v)
+        elif self.last_ts is not None and ts < self.last_ts:
+            return False
+        self._append(ts, c)
+        return True
+
+    def row(self) -> Dict[str, float]:
+        """Laatste rij van `indicator_engine.compute` (plus Wilder-RSI `RSI_W`)."""
+        nan = math.nan
+        if self.n == 0:
+            return {}
+        k20 = min(self.n, 20)
+        mid = self._sma(self.sum_20, 20, 6)
+        sd = math.sqrt(max((self.sq_20 - self.sum_20 ** 2 / k20) / (k20 - 1), 0.0)) if k20 >= 20 else nan
+        rsi = nan
+        if self.n - 1 >= self.rsi_period and self.down > 0:
+            rsi = 100.0 - 100.0 / (1.0 + self.up / self.down)
+        rsi_w = 100.0 - 100.0 / (1.0 + self.w_up / self.w_down) if self.n >= 2 and self.w_down > 0 else nan
+        return {
+            "Close": self._close(self.n - 1),
+            "SMA_S": self._sma(self.sum_s, self.ma_short, max(5, self.ma_short // 3)),
+            "SMA_L": self._sma(self.sum_l, self.ma_long, max(5, self.ma_long // 3)),
+            "SMA_200": self._sma(self.sum_200, 200, 66),
+            "EMA_20": self.ema20, "RSI": rsi, "RSI_W": rsi_w,
+            "MACD": self.ema12 - self.ema26, "MACD_SIG": self.sig,
+            "BB_L": mid - 2.0 * sd, "BB_H": mid + 2.0 * sd,
+        }
+
+    def hysteresis_ok(self, days: int, kind: str) -> bool:
+        """SMA_S bleef de laatste `days` bars boven (BUY) of onder (SELL) SMA_L."""
+        need = min(int(days), self.n)
+        if days <= 1 or kind == "HOLD":
+            return True
+        return (self.run_up if kind == "BUY" else self.run_down) >= need
+
+    def to_dict(self) -> Dict[str, Any]:
+        def enc(v):
+            return str(v) if isinstance(v, pd.Timestamp) else v
+        k0 = max(0, self.n - self.size)
+        return {
+            "params": [self.ma_short, self.ma_long, self.rsi_period],
+            "closes": [self._close(k) for k in range(k0, self.n)],
+            **{k: enc(getattr(self, k)) for k in _SCALARS},
+            "prev": {k: enc(v) for k, v in self._prev.items()} if self._prev else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "IndicatorState":
+        def dec(k, v):
+            return pd.Timestamp(v) if k in ("last_ts", "prev_ts") and v is not None else v
+        st = cls(*d["params"])
+        for k in _SCALARS:
+            setattr(st, k, dec(k, d[k]))
+        st.n = int(st.n)
+        closes = d.get("closes") or []
+        for i, c in enumerate(closes, start=st.n - len(closes)):
+            st.buf[i % st.size] = c
+        st._prev = {k: dec(k, v) for k, v in d["prev"].items()} if d.get("prev") else None
+        return st
+
+def sync(state: IndicatorState, df: pd.DataFrame) -> Tuple[IndicatorState, bool]:
+    """
+    Breng `state` bij met de bars van `df` na de laatste verwerkte bar (O(nieuwe bars)).
+    Wijkt de voorlaatste close af (nieuwe aanpassing voor dividend/split, andere bron), of ontbreekt
+    de laatste bar, dan wordt de state opnieuw opgebouwd uit `df`. Geeft (state, veranderd).
+    """
+    close = pd.to_numeric(df["Close"], errors="coerce") if df is not None and "Close" in df.columns else pd.Series(dtype=float)
+    idx = pd.DatetimeIndex(close.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    if state.n and len(idx):
+        pos = idx.searchsorted(state.last_ts)
+        ok = pos < len(idx) and idx[pos] == state.last_ts
+        if ok and state.n >= 2 and state.prev_ts is not None:
+            p = idx.searchsorted(state.prev_ts)
+            ok = p == pos - 1 and idx[p] == state.prev_ts and \
+                math.isclose(float(close.iloc[p]), state._close(state.n - 2), rel_tol=1e-9)
+        if ok:
+            changed = False
+            vals = close.to_numpy()[pos:]
+            for ts, c in zip(idx[pos:], vals):
+                changed |= state.update(ts, c)
+            return state, changed
+    state = IndicatorState(state.ma_short, state.ma_long, state.rsi_period)
+    for ts, c in zip(idx, close.to_numpy()):
+        state.update(ts, c)
+    return state, True
+
+# ---------- opslag naast de prijsopslag ----------
+def state_dir() -> str:
+    return os.path.join(price_store.store_dir(), "_indicators")
+
+def _path(ticker: str, key: Tuple[int, int, int]) -> str:
+    safe = ticker.replace("/", "_").replace("\\", "_")
+    return os.path.join(state_dir(), "-".join(map(str, key)), f"{safe}.json")
+
+def load(ticker: str, params: Dict[str, Any]) -> IndicatorState | None:
+    try:
+        with open(_path(ticker, _key(params)), encoding="utf-8") as f:
+            return IndicatorState.from_dict(json.load(f))
+    except Exception:
+        return None
+
+def save(ticker: str, state: IndicatorState) -> None:
+    """Atomair wegschrijven (tmp + replace), zoals `price_store.write`."""
+    if not price_store.store_enabled():
+        return
+    path = _path(ticker, (state.ma_short, state.ma_long, state.rsi_period))
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+_STATES: Dict[Tuple[str, Tuple[int, int, int]], IndicatorState] = {}
+_KEY_LOCKS: Dict[Tuple[str, Tuple[int, int, int]], threading.Lock] = {}
+_LOCK = threading.Lock()
+
+def _key_lock(k: Tuple[str, Tuple[int, int, int]]) -> threading.Lock:
+    with _LOCK:
+        lock = _KEY_LOCKS.get(k)
+        if lock is None:
+            lock = _KEY_LOCKS[k] = threading.Lock()
+        return lock
+
+def refresh(prices: Dict[str, pd.DataFrame] | PricePanel, params: Dict[str, Any],
+            persist: bool = True) -> Dict[str, IndicatorState]:
+    """
+    Bijgewerkte state per ticker: uit het geheugen, anders van schijf, anders opgebouwd uit de
+    historie. Alleen bars na de laatst verwerkte bar worden doorgerekend.
+    Thread-safe: per (ticker, params) één sync tegelijk, op een kopie die daarna de gedeelde state
+    vervangt; teruggegeven states worden dus nooit meer gemuteerd (veilig over Streamlit-sessies).
+    """
+    key = _key(params)
+    frames = dict(prices.items()) if isinstance(prices, PricePanel) else (prices or {})
+    out: Dict[str, IndicatorState] = {}
+    for t, df in frames.items():
+        with _key_lock((t, key)):
+            with _LOCK:
+                shared = _STATES.get((t, key))
+            base = shared or (load(t, params) if persist else None) or IndicatorState(*key)
+            st, changed = sync(base.copy(), df)
+            if not changed and shared is not None:
+                st = shared
+            else:
+                with _LOCK:
+                    _STATES[(t, key)] = st
+                if changed and persist:
+                    save(t, st)
+        out[t] = st
+    return out
+
+def rows(states: Dict[str, IndicatorState]) -> pd.DataFrame:
+    """Laatste indicatorwaarden per ticker (tickers x indicatoren)."""
+    return pd.DataFrame({t: st.row() for t, st in states.items()}).T
+
+def clear() -> None:
+    with _LOCK:
+        _STATES.clear()
+        _KEY_LOCKS.clear()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from typing import Dict, Tuple
+import os, re, threading
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from . import metrics, rate_limit
+from .coalesce import SingleFlight, TTLCache
+from .panel import OHLCV
+
+# Proces-brede cache voor intraday- en dagbars van yfinance:
+# - per ticker wordt de fijnste opgehaalde granulariteit bewaard (TTL, INTRADAY_TTL_S)
+# - grovere intervallen (15m, 60m, 1d, 1wk, 1mo) worden lokaal geresampled uit een fijnere basis
+#   die de gevraagde periode dekt, dus één download bedient home, Screener en execution
+# - ontbreekt een geschikte basis, dan wordt INTRADAY_BASE (standaard 5m) opgehaald als die het
+#   gevraagde interval en de periode kan leveren, anders het interval zelf
+# Intraday-bins worden per sessie vanaf de eerste bar geteld (zoals yfinance: 09:30, 10:30, ...).
+
+_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+_DAILY = ("1d", "1wk", "1mo")
+# maximale terugkijkperiode per intraday-interval bij yfinance
+_MAX_DAYS = {"1m": 7, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "60m": 730, "90m": 60, "1h": 730}
+# yfinance-periodes, oplopend
+_PERIODS = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max"]
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def base_interval() -> str:
+    b = (os.getenv("INTRADAY_BASE") or "5m").strip()
+    return b if b in _MINUTES else "5m"
+
+_BARS = TTLCache(maxsize=512, ttl=_env_float("INTRADAY_TTL_S", 60.0))
+_FLIGHTS = SingleFlight(timeout=120.0)
+# per ticker de intervallen die (mogelijk) in _BARS staan
+_BASES: Dict[str, set] = {}
+_BASES_LOCK = threading.Lock()
+
+def _days(period: str) -> float:
+    """Periode in kalenderdagen (ruim), voor het vergelijken met de yfinance-limieten."""
+    if period == "max":
+        return float("inf")
+    if period == "ytd":
+        return float(pd.Timestamp.today().dayofyear)
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not m:
+        return 365.0
+    n, unit = int(m.group(1)), m.group(2)
+    return n * {"d": 1.4, "wk": 7, "mo": 31, "y": 366}[unit]
+
+def _covers(have: str, want: str) -> bool:
+    return _days(have) >= _days(want)
+
+def _download_period(interval: str, period: str) -> str:
+    """Kleinste yfinance-periode >= `period` (min. 5d intraday, 1y dag), begrensd door de limiet van `interval`."""
+    limit = _MAX_DAYS.get(interval, float("inf"))
+    floor = "5d" if interval in _MINUTES else "1y"
+    want = max(_days(period), _days(floor))
+    best = _PERIODS[0]
+    for p in _PERIODS:
+        if _days(p) > limit:
+            break
+        best = p
+        if _days(p) >= want:
+            break
+    return best
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+        df = df.loc[:, ~pd.Index(df.columns).duplicated()]
+    out = pd.DataFrame({c: pd.to_numeric(df[c], errors="coerce") for c in OHLCV if c in df.columns})
+    if "Close" not in out.columns:
+        return pd.DataFrame(columns=OHLCV)
+    out = out[out["Close"].notna()]
+    return out[~out.index.duplicated(keep="last")].sort_index()
+
+def _download(ticker: str, interval: str, period: str) -> pd.DataFrame:
+    rate_limit.acquire("yfinance")
+    with metrics.timer("aiva_fetch_seconds", provider="yfinance", site=f"bars_{interval}"):
+        raw = yf.download(ticker, period=period, interval=interval, auto_adjust=True,
+                          progress=False, threads=False)
+    return _normalize(raw)
+
+def _resample(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    if df.empty:
+        return df
+    idx = pd.DatetimeIndex(df.index)
+    local = idx.tz_localize(None) if idx.tz is not None else idx
+    if interval in _MINUTES:
+        freq = np.timedelta64(_MINUTES[interval], "m")
+        v = local.to_numpy()
+        first = pd.Series(v).groupby(local.normalize().to_numpy()).transform("min").to_numpy()
+        key = pd.DatetimeIndex(first + ((v - first) // freq) * freq)
+        if idx.tz is not None:
+            key = key.tz_localize(idx.tz)
+        name = "Datetime"
+    else:
+        if interval == "1wk":
+            key = local.normalize().to_period("W-SUN").start_time
+        elif interval == "1mo":
+            key = local.normalize().to_period("M").start_time
+        else:
+            key = local.normalize()
+        name = "Date"
+    agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    out = df.groupby(key, sort=True).agg({c: f for c, f in agg.items() if c in df.columns})
+    out.index = pd.DatetimeIndex(out.index, name=name)
+    return out
+
+def _slice(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    if df.empty or period == "max":
+        return df
+    idx = pd.DatetimeIndex(df.index)
+    last = idx[-1]
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if period == "ytd":
+        start = last.normalize().replace(month=1, day=1)
+    elif m and m.group(2) == "d":
+        # "Nd" = laatste N handelsdagen, zoals yfinance
+        days = idx.normalize().unique()
+        start = days[max(0, len(days) - int(m.group(1)))]
+    elif m:
+        n, unit = int(m.group(1)), m.group(2)
+        start = last - {"wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+    else:
+        return df
+    return df[idx >= start]
+
+def _divides(base: str, interval: str) -> bool:
+    if base == interval:
+        return True
+    if base in _MINUTES:
+        return interval in _DAILY or (interval in _MINUTES and _MINUTES[interval] % _MINUTES[base] == 0)
+    return base == "1d" and interval in ("1wk", "1mo")
+
+def _cached_base(ticker: str, interval: str, period: str) -> Tuple[str, pd.DataFrame] | None:
+    """Grofste gecachte basis die `interval` kan leveren en `period` dekt."""
+    with _BASES_LOCK:
+        bases = list(_BASES.get(ticker, ()))
+    best = None
+    for b in bases:
+        hit = _BARS.get((ticker, b))
+        if hit is None or not _divides(b, interval) or not _covers(hit[0], period):
+            continue
+        rank = _MINUTES.get(b, 24 * 60)
+        if best is None or rank > best[0]:
+            best = (rank, b, hit[1])
+    return (best[1], best[2]) if best else None
+
+def _plan(interval: str, period: str) -> Tuple[str, str]:
+    """(interval, periode) om op te halen bij een cache-miss."""
+    base = base_interval()
+    if interval in _MINUTES:
+        if _MINUTES[base] <= _MINUTES[interval] and _divides(base, interval) and _days(period) <= _MAX_DAYS[base]:
+            return base, _download_period(base, period)
+        return interval, _download_period(interval, period)
+    if interval in ("1d", "1wk", "1mo"):
+        return "1d", _download_period("1d", period)
+    return interval, period
+
+def _fetch(ticker: str, interval: str, period: str) -> pd.DataFrame:
+    got = _cached_base(ticker, interval, period)
+    if got is not None:
+        metrics.inc("aiva_cache_total", cache="bars", result="hit")
+        base, df = got
+    else:
+        metrics.inc("aiva_cache_total", cache="bars", result="miss")
+        base, dl_period = _plan(interval, period)
+        df = _FLIGHTS.do((ticker, base, dl_period), lambda: _download(ticker, base, dl_period))
+        if not df.empty:
+            ttl = None if base in _MINUTES else _env_float("INTRADAY_DAILY_TTL_S", 900.0)
+            _BARS.set((ticker, base), (dl_period, df), ttl=ttl)
+            with _BASES_LOCK:
+                _BASES.setdefault(ticker, set()).add(base)
+    if base != interval:
+        df = _resample(df, interval)
+    return _slice(df, period)
+
+def bars(ticker: str, interval: str = "5m", period: str = "5d") -> pd.DataFrame:
+    """
+    OHLCV-bars van `ticker` (yfinance-symbool) op `interval` over `period`, uit de cache of
+    geresampled uit een fijnere gecachte basis. Leeg frame bij fouten. Niet muteren: gedeeld.
+    """
+    t = (ticker or "").strip().upper()
+    if not t:
+        return pd.DataFrame(columns=OHLCV)
+    try:
+        return _fetch(t, interval, period)
+    except Exception as e:
+        metrics.event(f"bars {t} {interval}/{period}: {e}", level="error", source="data")
+        return pd.DataFrame(columns=OHLCV)
+
+def clear(ticker: str | None = None) -> None:
+    """Vergeet gecachte bars (van één ticker); entries verlopen daarna vanzelf uit de LRU."""
+    with _BASES_LOCK:
+        if ticker is None:
+            _BARS.clear()
+            _BASES.clear()
+        else:
+            _BASES.pop(ticker.strip().upper(), None)
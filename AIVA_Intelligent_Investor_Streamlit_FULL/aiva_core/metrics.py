@@ -0,0 +1,147 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+from collections import deque
+from contextlib import contextmanager
+import json, threading, time
+
+# latency-buckets in seconden (Prometheus-stijl, cumulatief bij export)
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def _key(name: str, labels: Dict[str, Any]) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # laatste = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and v > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Bovengrens van de bucket waarin het q-kwantiel valt (grof, maar goedkoop)."""
+        if not self.count:
+            return float("nan")
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Registry:
+    """
+    Counters, latency-histogrammen en een ring met recente events voor de datalaag.
+    Labels zijn vrije key/values, typisch provider en site (fetch, retry, fallback, cache).
+    """
+
+    def __init__(self, max_events: int = 200):
+        self._counters: Dict[_Key, float] = {}
+        self._hists: Dict[_Key, _Histogram] = {}
+        self._events: deque = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        k = _key(name, labels)
+        with self._lock:
+            self._counters[k] = self._counters.get(k, 0.0) + float(value)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        k = _key(name, labels)
+        with self._lock:
+            h = self._hists.get(k)
+            if h is None:
+                h = self._hists[k] = _Histogram()
+            h.observe(float(seconds))
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def event(self, msg: str, level: str = "info", **labels) -> None:
+        with self._lock:
+            self._events.append({"ts": time.time(), "level": level, "msg": msg, **{k: str(v) for k, v in labels.items()}})
+
+    def events(self, level: str | None = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            ev = list(self._events)
+        return [e for e in ev if level is None or e["level"] == level]
+
+    def counter(self, name: str, **labels) -> float:
+        """Som van een counter over alle label-combinaties die `labels` bevatten."""
+        want = {(k, str(v)) for k, v in labels.items()}
+        with self._lock:
+            return sum(v for (n, lk), v in self._counters.items() if n == name and want.issubset(lk))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [{"name": n, **dict(lk), "value": v} for (n, lk), v in self._counters.items()]
+            hists = [{
+                "name": n, **dict(lk), "count": h.count, "sum": round(h.sum, 6),
+                "avg": round(h.sum / h.count, 6) if h.count else None,
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts)),
+            } for (n, lk), h in self._hists.items()]
+        return {"counters": counters, "histograms": hists, "events": self.events()}
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent, default=str)
+
+    def to_prometheus(self) -> str:
+        def lbl(lk, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            items = list(lk) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted({n for n, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, lk), v in self._counters.items():
+                    if n == name:
+                        lines.append(f"{n}{lbl(lk)} {v:g}")
+            for name in sorted({n for n, _ in self._hists}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, lk), h in self._hists.items():
+                    if n != name:
+                        continue
+                    acc = 0
+                    for b, c in zip([f"{b:g}" for b in BUCKETS] + ["+Inf"], h.counts):
+                        acc += c
+                        lines.append(f"{n}_bucket{lbl(lk, (('le', b),))} {acc}")
+                    lines.append(f"{n}_sum{lbl(lk)} {h.sum:.6f}")
+                    lines.append(f"{n}_count{lbl(lk)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._hists.clear()
+            self._events.clear()
+
+# proces-breed register voor de datalaag
+REGISTRY = Registry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+event = REGISTRY.event
+snapshot = REGISTRY.snapshot
+to_json = REGISTRY.to_json
+to_prometheus = REGISTRY.to_prometheus
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import List, Dict, Optional
-import os, requests, datetime as dt
+import asyncio, os, datetime as dt
+
+from . import aio_client, quota
 
 # Helpers
 def _now_iso() -> str:
@@ -15,14 +17,19 @@ def _norm_item(ticker: str, title: str, publisher: str, url: str, published: str
         "publishedAt": published or _now_iso(),
     }
 
-def _get_newsapi(ticker: str, limit: int) -> List[Dict]:
+NEWSAPI_URL = os.getenv("NEWSAPI_URL", "https://newsapi.org/v2/everything")
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+
+async def _get_newsapi(ticker: str, limit: int, priority: int = quota.NORMAL) -> List[Dict]:
     key = os.getenv("NEWSAPI_KEY")
     if not key:
         return []
     q = ticker.replace(".AS","")
-    url = f"https://newsapi.org/v2/everything?q={q}&language=en&pageSize={limit}&sortBy=publishedAt&apiKey={key}"
+    params = {"q": q, "language": "en", "pageSize": limit, "sortBy": "publishedAt", "apiKey": key}
     try:
-        r = requests.get(url, timeout=10)
+        if not await quota.admit("newsapi", priority):
+            return []
+        r = await aio_client.get(NEWSAPI_URL, params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         if data.get("status") != "ok":
@@ -40,16 +47,18 @@ def _get_newsapi(ticker: str, limit: int) -> List[Dict]:
     except Exception:
         return []
 
-def _get_finnhub(ticker: str, limit: int) -> List[Dict]:
+async def _get_finnhub(ticker: str, limit: int, priority: int = quota.NORMAL) -> List[Dict]:
     key = os.getenv("FINNHUB_KEY")
     if not key:
         return []
     # Laatste ~3 weken
     to = dt.date.today()
     frm = to - dt.timedelta(days=21)
-    url = f"https://finnhub.io/api/v1/company-news?symbol={ticker}&from={frm}&to={to}&token={key}"
+    params = {"symbol": ticker, "from": str(frm), "to": str(to), "token": key}
     try:
-        r = requests.get(url, timeout=10)
+        if not await quota.admit("finnhub", priority):
+            return []
+        r = await aio_client.get(f"{FINNHUB_BASE_URL}/company-news", params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         out = []
@@ -65,20 +74,24 @@ def _get_finnhub(ticker: str, limit: int) -> List[Dict]:
     except Exception:
         return []
 
-def get_news(tickers: Optional[List[str]]=None, limit_per: int = 6, provider: str = "auto") -> List[Dict]:
-    """Return a flat list of news dicts across tickers."""
-    out: List[Dict] = []
+async def _get_one(ticker: str, limit_per: int, provider: str, priority: int) -> List[Dict]:
+    if provider == "newsapi":
+        return await _get_newsapi(ticker, limit_per, priority)
+    if provider == "finnhub":
+        return await _get_finnhub(ticker, limit_per, priority)
+    data = await _get_newsapi(ticker, limit_per, priority)
+    if not data:
+        data = await _get_finnhub(ticker, limit_per, priority)
+    return data
+
+async def get_news_async(tickers: Optional[List[str]]=None, limit_per: int = 6, provider: str = "auto",
+                         priority: int | Dict[str, int] = quota.NORMAL) -> List[Dict]:
+    """Return a flat list of news dicts across tickers (alle tickers gelijktijdig opgevraagd)."""
     tickers = tickers or []
-    for t in tickers:
-        if provider == "newsapi":
-            out.extend(_get_newsapi(t, limit_per))
-        elif provider == "finnhub":
-            out.extend(_get_finnhub(t, limit_per))
-        else:
-            data = _get_newsapi(t, limit_per)
-            if not data:
-                data = _get_finnhub(t, limit_per)
-            out.extend(data)
+    prio = quota.priorities(tickers, priority)
+    out: List[Dict] = []
+    for data in await asyncio.gather(*(_get_one(t, limit_per, provider, prio[t]) for t in tickers)):
+        out.extend(data)
     # de-dupe op (title, publisher)
     seen = set()
     uniq = []
@@ -89,3 +102,8 @@ def get_news(tickers: Optional[List[str]]=None, limit_per: int = 6, provider: st
         seen.add(key)
         uniq.append(it)
     return uniq[: (limit_per * max(1, len(tickers)) )]
+
+def get_news(tickers: Optional[List[str]]=None, limit_per: int = 6, provider: str = "auto",
+             priority: int | Dict[str, int] = quota.NORMAL) -> List[Dict]:
+    """Return a flat list of news dicts across tickers."""
+    return aio_client.run(get_news_async(tickers, limit_per, provider, priority))
@@ -0,0 +1,238 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Tuple
+import glob, json, os, sys, threading, time
+import numpy as np
+import pandas as pd
+
+from .panel import OHLCV, PricePanel
+
+# Binaire kolomopslag voor offline/sample-koersen naast de CSV's in een map:
+#   <map>/_bin/index.json          {"tickers": {ticker: [segment, start, stop, csv_mtime]}}
+#   <map>/_bin/<segment>.dates.npy int64 dagnummers (datetime64[D])
+#   <map>/_bin/<segment>.values.npy float32 (rijen, 5) = OHLCV
+# Segmenten zijn onveranderlijk en worden gememory-mapt; elke schrijfactie voegt één segment
+# toe en verplaatst alleen index-verwijzingen. `compact` herschrijft alles naar één segment.
+# CSV's blijven de bron: een CSV die nieuwer is dan de index wordt opnieuw ingelezen.
+
+_BIN = "_bin"
+# herintreedbaar: `_write_segment` leest de index (en vult de cache) terwijl het de lock al heeft
+_LOCK = threading.RLock()
+_INDEX_CACHE: Dict[str, Tuple[int, dict]] = {}
+_SEG_CACHE: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+def _bin_dir(folder: str) -> str:
+    return os.path.join(folder, _BIN)
+
+def _index_path(folder: str) -> str:
+    return os.path.join(_bin_dir(folder), "index.json")
+
+def _csv_path(folder: str, ticker: str) -> str:
+    return os.path.join(folder, f"{ticker}.csv")
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+def _read_index(folder: str) -> dict:
+    path = _index_path(folder)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return {"tickers": {}}
+    hit = _INDEX_CACHE.get(path)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            idx = json.load(fh)
+    except Exception:
+        return {"tickers": {}}
+    with _LOCK:
+        _INDEX_CACHE[path] = (stamp, idx)
+    return idx
+
+def _write_index(folder: str, idx: dict) -> None:
+    path = _index_path(folder)
+    # _LOCK geldt alleen binnen dit proces: tmp-naam uniek per proces én thread
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(idx, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def _segment(folder: str, seg: str) -> Tuple[np.ndarray, np.ndarray]:
+    base = os.path.join(_bin_dir(folder), seg)
+    hit = _SEG_CACHE.get(base)
+    if hit is None:
+        hit = (np.load(f"{base}.dates.npy", mmap_mode="r"), np.load(f"{base}.values.npy", mmap_mode="r"))
+        with _LOCK:
+            hit = _SEG_CACHE.setdefault(base, hit)
+    return hit
+
+def read_csv(path: str) -> pd.DataFrame:
+    """CSV (Date + OHLCV, eventueel Adj Close) naar een OHLCV-frame; leeg frame bij fouten."""
+    try:
+        df = pd.read_csv(path)
+        idx = pd.to_datetime(df.pop("Date"), format="ISO8601")
+    except Exception:
+        return pd.DataFrame()
+    if "Close" not in df.columns and "Adj Close" in df.columns:
+        df["Close"] = df["Adj Close"]
+    if "Close" not in df.columns:
+        return pd.DataFrame()
+    out = pd.DataFrame({c: pd.to_numeric(df[c], errors="coerce") for c in OHLCV if c in df.columns})
+    out.index = pd.DatetimeIndex(idx.values, name="Date")
+    out = out[out["Close"].notna()]
+    return out[~out.index.duplicated(keep="last")].sort_index()
+
+def _write_segment(folder: str, dates: np.ndarray, values: np.ndarray,
+                   spans: Dict[str, Tuple[int, int]], csv_mtimes: Dict[str, float]) -> None:
+    os.makedirs(_bin_dir(folder), exist_ok=True)
+    seg = f"{time.time_ns():x}{os.getpid():x}{threading.get_ident():x}"
+    base = os.path.join(_bin_dir(folder), seg)
+    np.save(f"{base}.dates.npy", dates.astype(np.int64, copy=False))
+    np.save(f"{base}.values.npy", values.astype(np.float32, copy=False))
+    with _LOCK:
+        idx = _read_index(folder)
+        tick = dict(idx.get("tickers", {}))
+        for t, (a, b) in spans.items():
+            tick[t] = [seg, int(a), int(b), csv_mtimes.get(t, 0.0)]
+        _write_index(folder, {"tickers": tick})
+
+def save(folder: str, frames: Dict[str, pd.DataFrame], csv_mtimes: Dict[str, float] | None = None) -> None:
+    """Schrijf `frames` als één nieuw segment en laat de index ernaar wijzen."""
+    frames = {t: df for t, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return
+    dates, values, spans = [], [], {}
+    row = 0
+    for t, df in frames.items():
+        d = pd.DatetimeIndex(df.index)
+        if d.tz is not None:
+            d = d.tz_localize(None)
+        dates.append(d.values.astype("datetime64[D]").astype(np.int64))
+        values.append(df.reindex(columns=OHLCV).to_numpy(dtype=np.float32))
+        spans[t] = (row, row + len(df))
+        row += len(df)
+    _write_segment(folder, np.concatenate(dates), np.concatenate(values), spans, csv_mtimes or {})
+
+def save_panel(folder: str, panel: PricePanel) -> None:
+    """Als `save`, maar rechtstreeks vanuit een `PricePanel` (zonder frames per ticker)."""
+    if not panel.tickers:
+        return
+    n, m = panel.shape
+    cube = np.stack([panel.fields[f] if f in panel.fields else np.full((n, m), np.nan, np.float32) for f in OHLCV], axis=-1)
+    ok = np.isfinite(cube[:, :, OHLCV.index("Close")]).T          # (tickers, datums)
+    days = panel.index.values.astype("datetime64[D]").astype(np.int64)
+    values = cube.transpose(1, 0, 2)[ok]                            # ticker-major
+    dates = np.broadcast_to(days, (m, n))[ok]
+    ends = np.cumsum(ok.sum(axis=1))
+    spans = {t: (int(e - c), int(e)) for t, e, c in zip(panel.tickers, ends, ok.sum(axis=1))}
+    _write_segment(folder, dates, values, spans, {})
+
+def _from_bin(folder: str, entry: list) -> Tuple[np.ndarray, np.ndarray]:
+    seg, a, b = entry[0], int(entry[1]), int(entry[2])
+    dates, values = _segment(folder, seg)
+    return dates[a:b], values[a:b]
+
+def _frame(dates: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    # één float32-blok; kolommen zonder data (bv. CSV met alleen Close) weglaten
+    index = pd.DatetimeIndex(dates.astype("datetime64[D]").astype("datetime64[ns]"), name="Date")
+    keep = ~np.isnan(values).all(axis=0)
+    return pd.DataFrame(np.array(values[:, keep]), index=index, columns=[f for f, k in zip(OHLCV, keep) if k])
+
+def _resolve(folder: str, tickers: Iterable[str], sync_csv: bool) -> Dict[str, list]:
+    """Index-entries voor `tickers`; CSV's die ontbreken in of nieuwer zijn dan de index worden eerst opgenomen."""
+    tickers = list(dict.fromkeys(tickers))
+    entries = _read_index(folder).get("tickers", {})
+    if sync_csv:
+        fresh: Dict[str, pd.DataFrame] = {}
+        mtimes: Dict[str, float] = {}
+        for t in tickers:
+            m = _mtime(_csv_path(folder, t))
+            e = entries.get(t)
+            if m and (e is None or m > float(e[3] or 0.0)):
+                df = read_csv(_csv_path(folder, t))
+                if not df.empty:
+                    fresh[t], mtimes[t] = df, m
+        if fresh:
+            try:
+                save(folder, fresh, mtimes)
+                entries = _read_index(folder).get("tickers", {})
+            except Exception:
+                # alleen-lezen map: dan gewoon de CSV-data gebruiken
+                return {**{t: entries[t] for t in tickers if t in entries}, **{t: df for t, df in fresh.items()}}
+    return {t: entries[t] for t in tickers if t in entries}
+
+def load(folder: str, tickers: Iterable[str], tail: int | None = None, sync_csv: bool = True) -> Dict[str, pd.DataFrame]:
+    """{ticker: OHLCV-frame} uit de binaire opslag (laatste `tail` rijen); tickers zonder data ontbreken."""
+    out: Dict[str, pd.DataFrame] = {}
+    for t, e in _resolve(folder, tickers, sync_csv).items():
+        if isinstance(e, pd.DataFrame):
+            out[t] = e if tail is None else e.tail(tail)
+            continue
+        try:
+            d, v = _from_bin(folder, e)
+            if tail is not None:
+                d, v = d[-tail:], v[-tail:]
+            out[t] = _frame(d, v)
+        except Exception:
+            continue
+    return out
+
+def load_panel(folder: str, tickers: Iterable[str], sync_csv: bool = True) -> PricePanel:
+    """Zelfde data als `load`, maar direct als uitgelijnd float32 `PricePanel` (geen frames per ticker)."""
+    parts: List[Tuple[str, np.ndarray, np.ndarray]] = []
+    for t, e in _resolve(folder, tickers, sync_csv).items():
+        try:
+            if isinstance(e, pd.DataFrame):
+                d = e.index.values.astype("datetime64[D]").astype(np.int64)
+                v = e.reindex(columns=OHLCV).to_numpy(dtype=np.float32)
+            else:
+                d, v = _from_bin(folder, e)
+            parts.append((t, np.asarray(d), v))
+        except Exception:
+            continue
+    if not parts:
+        return PricePanel.from_frames({})
+    days = np.unique(np.concatenate([d for _, d, _ in parts]))
+    arrays = {f: np.full((len(days), len(parts)), np.nan, dtype=np.float32) for f in OHLCV}
+    for j, (_, d, v) in enumerate(parts):
+        rows = np.searchsorted(days, d)
+        for k, f in enumerate(OHLCV):
+            arrays[f][rows, j] = v[:, k]
+    index = pd.DatetimeIndex(days.astype("datetime64[D]").astype("datetime64[ns]"), name="Date")
+    return PricePanel(index, [t for t, _, _ in parts], arrays)
+
+def compact(folder: str) -> int:
+    """Herschrijf alle actuele entries naar één segment en verwijder oude segmenten."""
+    entries = dict(_read_index(folder).get("tickers", {}))
+    if not entries:
+        return 0
+    frames = {t: _frame(*_from_bin(folder, e)) for t, e in entries.items()}
+    save(folder, frames, {t: float(e[3] or 0.0) for t, e in entries.items()})
+    live = {e[0] for e in _read_index(folder)["tickers"].values()}
+    for path in glob.glob(os.path.join(_bin_dir(folder), "*.npy")):
+        seg = os.path.basename(path).split(".")[0]
+        if seg not in live:
+            with _LOCK:
+                _SEG_CACHE.pop(os.path.join(_bin_dir(folder), seg), None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return len(entries)
+
+def convert(folder: str) -> int:
+    """Eenmalige conversie: alle CSV's in `folder` naar de binaire opslag (en compacteren)."""
+    tickers = [os.path.basename(p)[:-4] for p in sorted(glob.glob(os.path.join(folder, "*.csv")))]
+    _resolve(folder, tickers, sync_csv=True)
+    return compact(folder)
+
+if __name__ == "__main__":
+    # python -m aiva_core.offline_store sample_data beleggings_ai_agent_ultra_news/data/quotes
+    for d in sys.argv[1:] or ["sample_data"]:
+        t0 = time.perf_counter()
+        n = convert(d)
+        print(f"{d}: {n} tickers in {time.perf_counter() - t0:.2f}s")
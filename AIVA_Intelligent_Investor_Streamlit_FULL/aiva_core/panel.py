@@ -0,0 +1,152 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Tuple
+import json, os
+import numpy as np
+import pandas as pd
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+class PricePanel:
+    """
+    Compact, uitgelijnd OHLCV-panel: één gedeelde DatetimeIndex, tickers als kolommen en
+    per veld een float32-array van vorm (datums, tickers). Ontbrekende bars zijn NaN.
+    `from_frames(..., dtype=np.float64)` bewaart de volle precisie (indicatoren/signalen op frames).
+    Eén keer ophalen, door alle consumenten hergebruiken (zie `data_sources.fetch_panel`).
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, tickers: List[str], fields: Dict[str, np.ndarray]):
+        self.index = index
+        self.tickers = list(tickers)
+        self.fields = fields
+        self._pos = {t: i for i, t in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], fields: Iterable[str] = OHLCV,
+                    dtype: type = np.float32, tail: Dict[str, int] | None = None) -> "PricePanel":
+        """Uitlijnen op de unie van de datums; met `tail` alleen de laatste `tail[t]` rijen van ticker `t`."""
+        frames = {t: df for t, df in (frames or {}).items() if df is not None and not df.empty}
+        tickers = list(frames.keys())
+        fields = list(fields)
+        if not tickers:
+            return cls(pd.DatetimeIndex([]), [], {f: np.empty((0, 0), dtype=dtype) for f in fields})
+        # unie van de datums via NumPy (pandas' herhaalde `union` schaalt slecht met duizenden tickers)
+        for t in tickers:
+            if frames[t].index.has_duplicates:
+                frames[t] = frames[t][~frames[t].index.duplicated(keep="last")]
+        tz = getattr(frames[tickers[0]].index, "tz", None)
+        # rijen per ticker: de laatste `keep[j]` (zonder iloc-slices per frame)
+        keep = [len(frames[t]) if tail is None else max(0, min(len(frames[t]), int(tail.get(t, len(frames[t])))))
+                for t in tickers]
+        values = [np.asarray(frames[t].index.values, dtype="datetime64[ns]")[len(frames[t]) - k:]
+                  for t, k in zip(tickers, keep)]
+        days = np.unique(np.concatenate(values))
+        index = pd.DatetimeIndex(days, name=frames[tickers[0]].index.name)
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        arrays = {f: np.full((len(index), len(tickers)), np.nan, dtype=dtype) for f in fields}
+        layouts: Dict[tuple, List[Tuple[str, int]]] = {}
+        for j, t in enumerate(tickers):
+            df = frames[t]
+            rows = np.searchsorted(days, values[j])
+            cols = tuple(df.columns)
+            pos = layouts.get(cols)
+            if pos is None:
+                at = {c: i for i, c in enumerate(cols)}
+                pos = layouts[cols] = [(f, at[f]) for f in fields if f in at]
+            try:
+                # één conversie per frame i.p.v. per kolom (per-kolom indexering domineert bij duizenden tickers)
+                block = df.to_numpy(dtype=dtype, na_value=np.nan)
+            except (TypeError, ValueError):
+                block = None
+            r0 = len(df) - keep[j]
+            for f, p in pos:
+                if block is not None:
+                    arrays[f][rows, j] = block[r0:, p]
+                else:
+                    arrays[f][rows, j] = pd.to_numeric(df.iloc[r0:, p], errors="coerce").to_numpy(dtype=dtype)
+        return cls(index, tickers, arrays)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._pos
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self.index), len(self.tickers))
+
+    def field(self, name: str) -> np.ndarray:
+        """(datums, tickers) float32-array; geen kopie."""
+        return self.fields[name]
+
+    def column(self, ticker: str, name: str = "Close") -> np.ndarray:
+        return self.fields[name][:, self._pos[ticker]]
+
+    def to_frame(self, name: str = "Close") -> pd.DataFrame:
+        """Datums x tickers DataFrame voor één veld."""
+        return pd.DataFrame(self.fields[name], index=self.index, columns=self.tickers, copy=False)
+
+    def frame(self, ticker: str, dropna: bool = True) -> pd.DataFrame:
+        """OHLCV-frame van één ticker, zoals `fetch_prices` die per ticker teruggeeft."""
+        j = self._pos[ticker]
+        names = list(self.fields)
+        block = np.column_stack([self.fields[f][:, j] for f in names]) if names else np.empty((len(self.index), 0), np.float32)
+        index = self.index
+        if dropna and "Close" in self.fields:
+            ok = np.isfinite(block[:, names.index("Close")])
+            block, index = block[ok], index[ok]
+        return pd.DataFrame(block, index=index, columns=names)
+
+    def to_dict(self) -> Dict[str, pd.DataFrame]:
+        return {t: self.frame(t) for t in self.tickers}
+
+    def items(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """(ticker, frame) één voor één; handig voor code die per ticker werkt zonder alles te materialiseren."""
+        for t in self.tickers:
+            yield t, self.frame(t)
+
+    def save(self, path: str) -> None:
+        """Schrijf het panel als map met `<veld>.npy` (datums x tickers), `dates.npy` en `meta.json`."""
+        os.makedirs(path, exist_ok=True)
+        for f, a in self.fields.items():
+            np.save(os.path.join(path, f"{f}.npy"), np.asarray(a, dtype=np.float32))
+        write_meta(path, self.index, self.tickers, list(self.fields))
+
+    @classmethod
+    def open(cls, path: str, fields: Iterable[str] | None = None, mode: str = "r") -> "PricePanel":
+        """
+        Open een opgeslagen panel memory-mapped: de data blijft op schijf en wordt via de page cache
+        gedeeld tussen processen. `mode="r+"` staat schrijven toe.
+        """
+        path = resolve(path)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        names = list(fields) if fields is not None else meta["fields"]
+        dates = np.load(os.path.join(path, "dates.npy"))
+        index = pd.DatetimeIndex(dates.astype("datetime64[ns]"), name="Date")
+        arrays = {f: np.load(os.path.join(path, f"{f}.npy"), mmap_mode=mode) for f in names}
+        return cls(index, meta["tickers"], arrays)
+
+    def nbytes(self) -> int:
+        return int(sum(a.nbytes for a in self.fields.values()))
+
+# pointer naar de actuele versie-map van een panel dat in place vervangen wordt (zie `price_store.build_matrix`)
+CURRENT = "CURRENT"
+
+def resolve(path: str) -> str:
+    """Map met de panelbestanden: de versie waar `<path>/CURRENT` naar wijst, anders `path` zelf."""
+    try:
+        with open(os.path.join(path, CURRENT), "r", encoding="utf-8") as fh:
+            name = fh.read().strip()
+    except OSError:
+        return path
+    return os.path.join(path, name) if name else path
+
+def write_meta(path: str, index: pd.DatetimeIndex, tickers: List[str], fields: List[str]) -> None:
+    """Datums en metadata naast reeds geschreven `<veld>.npy`-bestanden (zie `PricePanel.open`)."""
+    np.save(os.path.join(path, "dates.npy"), pd.DatetimeIndex(index).values.astype("datetime64[ns]").astype(np.int64))
+    tmp = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"tickers": list(tickers), "fields": list(fields)}, fh)
+    os.replace(tmp, os.path.join(path, "meta.json"))
@@ -0,0 +1,275 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional
+import os, shutil, threading, time
+import numpy as np
+import pandas as pd
+
+from .panel import CURRENT, PricePanel, write_meta
+
+# Parquet als pyarrow aanwezig is, anders pickle (geen extra dependency nodig)
+try:
+    import pyarrow  # noqa: F401
+    _EXT = "parquet"
+except Exception:
+    _EXT = "pkl"
+
+def store_dir() -> str:
+    return os.getenv("PRICE_STORE_DIR", "data/price_store")
+
+def store_enabled() -> bool:
+    return (os.getenv("PRICE_STORE") or "on").lower().strip() not in ("0", "off", "false", "no")
+
+def default_max_age_hours() -> float:
+    try:
+        return float(os.getenv("PRICE_STORE_MAX_AGE_H", "6"))
+    except ValueError:
+        return 6.0
+
+def _path(provider: str, ticker: str) -> str:
+    safe = ticker.replace("/", "_").replace("\\", "_")
+    return os.path.join(store_dir(), provider, f"{safe}.{_EXT}")
+
+def _read_file(path: str) -> pd.DataFrame:
+    if _EXT == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def age_seconds(provider: str, ticker: str) -> float:
+    """Seconden sinds laatste schrijfactie; inf als er niets is opgeslagen."""
+    try:
+        return time.time() - os.path.getmtime(_path(provider, ticker))
+    except OSError:
+        return float("inf")
+
+def read(provider: str, ticker: str) -> pd.DataFrame:
+    """Volledige opgeslagen historie (leeg frame als er niets is)."""
+    path = _path(provider, ticker)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    try:
+        df = _read_file(path)
+    except Exception:
+        return pd.DataFrame()
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return df.sort_index()
+
+def write(provider: str, ticker: str, df: pd.DataFrame, start: str | None = None) -> None:
+    """
+    Schrijf een frame weg (atomair via tmp-bestand).
+    `start` is de aangevraagde startdatum; die bepaalt later of de opslag een lookback dekt.
+    Een kwaliteitsrapport in `df.attrs["quality"]` wordt mee opgeslagen.
+    """
+    if not store_enabled() or df is None or df.empty:
+        return
+    path = _path(provider, ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    prev = read(provider, ticker)
+    starts = [s for s in (start, prev.attrs.get("start") if not prev.empty else None) if s]
+    attrs = {"start": min(starts) if starts else str(df.index[0].date())}
+    if "quality" in df.attrs:
+        attrs["quality"] = df.attrs["quality"]
+    df.attrs = attrs
+    # uniek per thread: _pool_map/_fetch_concurrent schrijven vanuit meerdere threads
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if _EXT == "parquet":
+            df.to_parquet(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def since(df: pd.DataFrame, start: str) -> pd.DataFrame:
+    """Rijen vanaf `start`, ook als de index tijdzone-bewust is (yfinance)."""
+    ts = pd.Timestamp(start)
+    tz = getattr(df.index, "tz", None)
+    if tz is not None:
+        ts = ts.tz_localize(tz)
+    return df[df.index >= ts]
+
+def covers(df: pd.DataFrame, start: str) -> bool:
+    """Dekt de opgeslagen historie de gevraagde startdatum?"""
+    if df is None or df.empty:
+        return False
+    stored_start = df.attrs.get("start") or str(df.index[0].date())
+    return pd.Timestamp(stored_start) <= pd.Timestamp(start)
+
+def load_fresh(tickers: List[str], providers: List[str], start: str,
+               max_age_hours: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Tickers die vers genoeg in de opslag staan en de lookback dekken, in provider-volgorde.
+    Geeft frames terug vanaf `start`.
+    """
+    if not store_enabled():
+        return {}
+    max_age = (default_max_age_hours() if max_age_hours is None else float(max_age_hours)) * 3600.0
+    if max_age <= 0:
+        return {}
+    out: Dict[str, pd.DataFrame] = {}
+    for t in tickers:
+        for p in providers:
+            if age_seconds(p, t) > max_age:
+                continue
+            df = read(p, t)
+            if covers(df, start):
+                out[t] = since(df, start)
+                break
+    return out
+
+def load_stale(tickers: List[str], provider: str, start: str) -> Dict[str, pd.DataFrame]:
+    """Opgeslagen historie (ongeacht leeftijd) die de lookback dekt: kandidaat voor een delta-fetch."""
+    if not store_enabled():
+        return {}
+    out: Dict[str, pd.DataFrame] = {}
+    for t in tickers:
+        df = read(provider, t)
+        if covers(df, start):
+            out[t] = df
+    return out
+
+def next_start(df: pd.DataFrame) -> str:
+    """
+    Startdatum voor een delta: de laatste opgeslagen bar zelf. Die kan midden in de sessie
+    bewaard zijn (voorlopige slotkoers); `append` vervangt hem door de opnieuw opgehaalde bar.
+    """
+    return str(df.index[-1].date())
+
+def merge(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Opgeslagen historie plus nieuwe bars; bij dezelfde datum wint de nieuwe bar."""
+    if old is None or old.empty:
+        return new
+    # het oude kwaliteitsrapport geldt niet meer voor het samengevoegde frame
+    attrs = {k: v for k, v in old.attrs.items() if k != "quality"}
+    # oudere opslag kan nog een tijdzone-index hebben
+    if getattr(old.index, "tz", None) is not None:
+        old = old.tz_localize(None)
+    if getattr(new.index, "tz", None) is not None:
+        new = new.tz_localize(None)
+    merged = pd.concat([old, new])
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    merged.attrs = attrs
+    return merged
+
+def append(provider: str, ticker: str, new: pd.DataFrame) -> pd.DataFrame:
+    """Voeg nieuwe bars toe aan de opgeslagen historie en geef het samengevoegde frame terug."""
+    merged = merge(read(provider, ticker), new)
+    write(provider, ticker, merged, start=merged.attrs.get("start"))
+    return merged
+
+def touch(provider: str, ticker: str) -> None:
+    """Markeer opgeslagen historie als vers zonder te herschrijven."""
+    try:
+        os.utime(_path(provider, ticker), None)
+    except OSError:
+        pass
+
+# ---------- universe-matrix (memory-mapped) ----------
+def matrix_dir() -> str:
+    return os.getenv("PRICE_MATRIX_DIR", "data/price_matrix")
+
+def _providers() -> List[str]:
+    try:
+        # mappen met "_" (bv. _indicators) zijn geen providers
+        return sorted(d for d in os.listdir(store_dir())
+                      if not d.startswith("_") and os.path.isdir(os.path.join(store_dir(), d)))
+    except OSError:
+        return []
+
+def _stored_tickers(providers: List[str]) -> List[str]:
+    out: List[str] = []
+    for p in providers:
+        try:
+            out += [f.rsplit(".", 1)[0] for f in os.listdir(os.path.join(store_dir(), p)) if f.endswith(f".{_EXT}")]
+        except OSError:
+            pass
+    return sorted(set(out))
+
+def _freshest(ticker: str, providers: List[str]) -> Optional[str]:
+    ages = [(age_seconds(p, ticker), p) for p in providers]
+    ages = [a for a in ages if a[0] != float("inf")]
+    return min(ages)[1] if ages else None
+
+def build_matrix(tickers: Iterable[str] | None = None, path: str | None = None,
+                 fields: Iterable[str] = ("Close",), providers: List[str] | None = None,
+                 start: str | None = None) -> PricePanel:
+    """
+    Bouw uit de opslag een datums x tickers float32-matrix per veld op schijf en open die memory-mapped.
+    Per ticker wordt de meest recent bijgewerkte provider gebruikt. Twee passes (eerst datums, dan
+    waarden), zodat nooit alle frames tegelijk in het geheugen staan. Elke build schrijft een eigen
+    versie-map `<path>/v<stempel>` en zet daarna atomair de pointer `<path>/CURRENT` om, zodat
+    `PricePanel.open(path)` altijd een complete matrix ziet; processen die de oude nog open hebben
+    houden hun mapping. Alleen de vorige versie blijft daarnaast staan.
+    """
+    path = path or matrix_dir()
+    fields = list(fields)
+    providers = providers or _providers()
+    tickers = list(dict.fromkeys(tickers)) if tickers is not None else _stored_tickers(providers)
+
+    def load(t: str, p: str) -> pd.DataFrame:
+        df = read(p, t)
+        return since(df, start) if start and not df.empty else df
+
+    src: Dict[str, str] = {}
+    days: List[np.ndarray] = []
+    for t in tickers:
+        p = _freshest(t, providers)
+        df = load(t, p) if p else pd.DataFrame()
+        if df.empty or "Close" not in df.columns:
+            continue
+        src[t] = p
+        days.append(pd.DatetimeIndex(df.index).values.astype("datetime64[ns]"))
+    index = np.unique(np.concatenate(days)) if days else np.array([], dtype="datetime64[ns]")
+    cols = list(src)
+
+    version = f"v{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}"
+    tmp = os.path.join(path, version)
+    os.makedirs(tmp)
+    arrays = {f: np.lib.format.open_memmap(os.path.join(tmp, f"{f}.npy"), mode="w+", dtype=np.float32,
+                                           shape=(len(index), len(cols))) for f in fields}
+    for a in arrays.values():
+        a[:] = np.nan
+    for j, t in enumerate(cols):
+        df = load(t, src[t])
+        df = df[~df.index.duplicated(keep="last")]
+        rows = np.searchsorted(index, pd.DatetimeIndex(df.index).values.astype("datetime64[ns]"))
+        for f in fields:
+            if f in df.columns:
+                arrays[f][rows, j] = pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=np.float32)
+    for a in arrays.values():
+        a.flush()
+    del arrays
+    write_meta(tmp, pd.DatetimeIndex(index), cols, fields)
+    legacy = not os.path.exists(os.path.join(path, CURRENT))
+    pointer = os.path.join(path, f"{CURRENT}.{version}.tmp")
+    with open(pointer, "w", encoding="utf-8") as fh:
+        fh.write(version)
+    os.replace(pointer, os.path.join(path, CURRENT))
+    _prune_versions(path, version, legacy)
+    return PricePanel.open(tmp)
+
+def _prune_versions(path: str, current: str, legacy: bool) -> None:
+    """Oude versies opruimen: de vorige complete blijft (lezers die de pointer net lazen), nieuwere of
+    nog niet afgeronde (zonder meta.json; een parallelle build) blijven staan. `legacy`: er was nog geen
+    pointer, dus de vorige versie is de matrix uit de indeling van vóór de versie-mappen."""
+    try:
+        names = sorted(d for d in os.listdir(path) if d.startswith("v") and os.path.isdir(os.path.join(path, d)))
+    except OSError:
+        return
+    done = [d for d in names if d < current and os.path.exists(os.path.join(path, d, "meta.json"))]
+    for d in done[:-1]:
+        shutil.rmtree(os.path.join(path, d), ignore_errors=True)
+    if legacy:
+        return
+    # matrix uit de indeling van vóór de versie-mappen: de pointer heeft voorrang
+    for f in os.listdir(path):
+        if f == "meta.json" or f.endswith(".npy"):
+            try:
+                os.remove(os.path.join(path, f))
+            except OSError:
+                pass
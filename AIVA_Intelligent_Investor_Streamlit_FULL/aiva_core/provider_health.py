@@ -0,0 +1,161 @@
+from __future__ import annotations
+from typing import Dict, List
+from collections import deque
+import os, threading, time
+
+from . import metrics
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+class ProviderHealth:
+    """
+    Houdt recente uitkomsten (succes, latency) van één provider bij en fungeert als circuit breaker.
+    - closed: alles mag
+    - open: provider wordt overgeslagen tot de cooldown verstreken is
+    - half_open: één proef-request; succes sluit de breaker, falen opent hem opnieuw
+    Elke toegestane call eindigt in `record` of, zonder uitkomst (leeg delta-antwoord, quotum), `release`.
+    """
+
+    def __init__(self, name: str, window: int = 50, min_samples: int = 8,
+                 min_success: float = 0.25, max_consecutive: int = 8, cooldown_s: float = 120.0):
+        self.name = name
+        self.window = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.min_success = min_success
+        self.max_consecutive = max_consecutive
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def success_rate(self) -> float:
+        n = len(self.window)
+        ok = sum(1 for s, _ in self.window if s)
+        return (ok + 1.0) / (n + 2.0)  # Laplace: onbekende provider ~0.5
+
+    def avg_latency(self) -> float:
+        lat = [l for _, l in self.window]
+        return sum(lat) / len(lat) if lat else 0.0
+
+    def score(self) -> float:
+        """Hoger is beter: slagingskans gedeeld door (1 + gemiddelde latency in s)."""
+        return self.success_rate() / (1.0 + self.avg_latency())
+
+    def degraded(self) -> bool:
+        n = len(self.window)
+        return n >= self.min_samples and self.success_rate() < 0.5
+
+    def available(self) -> bool:
+        """Mag de provider nu gebruikt worden? (verbruikt, anders dan `allow`, geen proef-request)"""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.cooldown_s
+            return not (self.state == "half_open" and self._probe)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state = "half_open"
+                self._probe = False
+            if self.state == "half_open" and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency_s: float) -> None:
+        with self._lock:
+            self.window.append((bool(ok), float(latency_s)))
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != "closed":
+                    self.state = "closed"
+                    self.window.clear()
+                    self.window.append((True, float(latency_s)))
+                return
+            self.consecutive_failures += 1
+            if self.state == "half_open":
+                self._trip()
+                return
+            n = len(self.window)
+            ok_rate = sum(1 for s, _ in self.window if s) / n if n else 1.0
+            if self.consecutive_failures >= self.max_consecutive or (n >= self.min_samples and ok_rate < self.min_success):
+                self._trip()
+
+    def release(self) -> None:
+        """Toegestane call zonder uitkomst: geef de proef vrij zodat een volgende call kan proberen."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probe = False
+
+    def _trip(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self._probe = False
+        self.trips += 1
+        metrics.inc("aiva_breaker_trips_total", provider=self.name)
+        metrics.event(f"{self.name} circuit breaker open", level="warning", source="health")
+
+    def snapshot(self) -> Dict[str, float | int | str]:
+        return {
+            "provider": self.name,
+            "state": self.state,
+            "samples": len(self.window),
+            "success_rate": round(self.success_rate(), 3),
+            "avg_latency_s": round(self.avg_latency(), 3),
+            "score": round(self.score(), 3),
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+        }
+
+_REGISTRY: Dict[str, ProviderHealth] = {}
+_LOCK = threading.Lock()
+
+def health(provider: str) -> ProviderHealth:
+    with _LOCK:
+        h = _REGISTRY.get(provider)
+        if h is None:
+            h = ProviderHealth(provider, cooldown_s=_env_float("BREAKER_COOLDOWN_S", 120.0))
+            _REGISTRY[provider] = h
+        return h
+
+def allow(provider: str) -> bool:
+    return health(provider).allow()
+
+def record(provider: str, ok: bool, latency_s: float) -> None:
+    health(provider).record(ok, latency_s)
+
+def release(provider: str) -> None:
+    health(provider).release()
+
+def available(provider: str) -> bool:
+    return health(provider).available()
+
+def ranked(providers: List[str]) -> List[str]:
+    """
+    Gezonde providers houden de opgegeven volgorde; gedegradeerde (lage slagingskans)
+    en daarna open providers schuiven achteraan, onderling op score.
+    """
+    def key(p: str):
+        h = health(p)
+        is_open = not h.available()
+        bad = is_open or h.degraded()
+        return (is_open, bad, -h.score() if bad else 0.0)
+    return sorted(providers, key=key)
+
+def snapshot() -> List[Dict[str, float | int | str]]:
+    with _LOCK:
+        items = list(_REGISTRY.values())
+    return [h.snapshot() for h in items]
+
+def reset() -> None:
+    with _LOCK:
+        _REGISTRY.clear()
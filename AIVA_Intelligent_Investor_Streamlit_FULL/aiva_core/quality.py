@@ -0,0 +1,260 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+import os, threading
+import numpy as np
+import pandas as pd
+
+from . import metrics, trading_calendar
+from .panel import OHLCV, PricePanel
+
+# Datakwaliteit van opgehaalde koersen, in één gevectoriseerde pass over een (datums, tickers)-panel:
+# - nonpositive: Close/Open/High/Low <= 0
+# - ohlc: High/Low niet om Open/Close heen
+# - spike: uitschieter die de volgende bar terugvalt (foute tick)
+# - split: sprong die precies een splitsverhouding is en blijft staan (onaangepaste historie)
+# - stale: dezelfde Close QUALITY_STALE_RUN keer of vaker achter elkaar
+# - gap: ontbrekende handelsdagen (kalender van de beurs, zie `trading_calendar`)
+# PRICE_QUALITY=flag (standaard) rapporteert alleen, =repair herstelt ook, =off slaat alles over.
+# Het rapport per ticker gaat mee in `df.attrs["quality"]`, dus ook in de prijscache.
+# `fetch_prices` controleert alleen wat net van een provider kwam: de nieuwe bars plus QUALITY_CONTEXT
+# (standaard 60) bars ervoor als context (schaal, stale-reeksen, een spike op de vorige laatste bar).
+# Dat gebeurt vóór het opslaan: het rapport (en bij repair de herstelde bars) staat ook in de opslag.
+
+CHECKS = ("nonpositive", "ohlc", "spike", "split", "stale")
+
+_SPLITS = np.array([1 / 20, 1 / 10, 1 / 5, 1 / 4, 1 / 3, 1 / 2, 2.0, 3.0, 4.0, 5.0, 10.0, 20.0])
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def mode() -> str:
+    m = (os.getenv("PRICE_QUALITY") or "flag").lower().strip()
+    return m if m in ("off", "flag", "repair") else "flag"
+
+def _prev_next(valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per cel de rij van de vorige/volgende geldige waarde in dezelfde kolom (-1 / n als die er niet is)."""
+    n = valid.shape[0]
+    ar = np.arange(n)[:, None]
+    last = np.maximum.accumulate(np.where(valid, ar, -1), axis=0)
+    first = np.minimum.accumulate(np.where(valid, ar, n)[::-1], axis=0)[::-1]
+    prev = np.vstack([np.full((1, valid.shape[1]), -1), last[:-1]])
+    nxt = np.vstack([first[1:], np.full((1, valid.shape[1]), n)])
+    return prev, nxt
+
+def _gaps(index: pd.DatetimeIndex, tickers: List[str], valid: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    """Aantal ontbrekende handelsdagen vóór elke geldige bar (sinds de vorige geldige bar)."""
+    days = index.values.astype("datetime64[D]")
+    out = np.zeros(valid.shape, dtype=np.int64)
+    if not len(days):
+        return out
+    cur = np.broadcast_to(days[:, None], valid.shape)
+    before = days[np.maximum(prev, 0)]
+    has = valid & (prev >= 0)
+    y0, y1 = pd.Timestamp(days[0]).year, pd.Timestamp(days[-1]).year
+    exch = np.array([trading_calendar.exchange_of(t) for t in tickers])
+    for ex in np.unique(exch):
+        cols = np.flatnonzero(exch == ex)
+        sub = has[:, cols]
+        if not sub.any():
+            continue
+        a, b = before[:, cols][sub], cur[:, cols][sub]
+        if ex == trading_calendar.CRYPTO:
+            n = (b - a).astype(np.int64) - 1
+        else:
+            n = np.busday_count(a, b, holidays=trading_calendar._holidays(ex, y0, y1)) - 1
+        block = np.zeros(sub.shape, dtype=np.int64)
+        block[sub] = np.maximum(n, 0)
+        out[:, cols] = block
+    return out
+
+def _stale(c: np.ndarray, valid: np.ndarray, prev: np.ndarray, run: int) -> np.ndarray:
+    """Cellen die een herhaling zijn binnen een reeks van >= `run` gelijke Closes."""
+    n, m = c.shape
+    same = valid & (prev >= 0) & (c == np.take_along_axis(c, np.maximum(prev, 0), axis=0))
+    start = valid & ~same
+    # reeks-id per cel (globaal uniek); NaN-cellen horen bij de lopende reeks
+    rid = np.cumsum(start, axis=0) + (np.arange(m) * (n + 1))[None, :]
+    counts = np.bincount(rid[same], minlength=int(rid.max()) + 1)
+    return same & (counts[rid] >= run - 1)
+
+def validate(panel: PricePanel, repair: bool = False) -> Tuple[PricePanel, pd.DataFrame]:
+    """
+    Controleer een heel panel tegelijk. Geeft (panel, rapport): het rapport heeft één rij per ticker
+    met tellingen per controle, `gaps`/`max_gap` en `ok`. Met `repair=True` is het panel een
+    gecorrigeerde kopie (foute ticks/stale herhalingen NaN, splits terug-aangepast, High/Low rechtgezet).
+    """
+    cols = ["bars", *CHECKS, "gaps", "max_gap", "repaired", "ok"]
+    if not panel.tickers or not len(panel) or "Close" not in panel.fields:
+        return panel, pd.DataFrame(columns=cols, index=pd.Index(panel.tickers, name="ticker"))
+    k = _env_float("QUALITY_SPIKE_SIGMA", 8.0)
+    floor = _env_float("QUALITY_SPIKE_MIN", 0.15)
+    run = int(_env_float("QUALITY_STALE_RUN", 5))
+    max_gap = int(_env_float("QUALITY_MAX_GAP", 3))
+
+    c = np.asarray(panel.field("Close"), dtype=np.float64)
+    valid = np.isfinite(c)
+    prev, nxt = _prev_next(valid)
+    n = c.shape[0]
+    flags: Dict[str, np.ndarray] = {}
+    with np.errstate(all="ignore"):
+        bad = valid & (c <= 0)
+        for f in ("Open", "High", "Low"):
+            if f in panel.fields:
+                bad |= np.asarray(panel.fields[f]) <= 0
+        flags["nonpositive"] = bad
+        ok = valid & ~bad
+        if {"Open", "High", "Low"} <= set(panel.fields):
+            o, h, l = (np.asarray(panel.fields[f], dtype=np.float64) for f in ("Open", "High", "Low"))
+            tol = 1e-4 * c
+            flags["ohlc"] = ok & ((h < np.fmax(o, c) - tol) | (l > np.fmin(o, c) + tol))
+        else:
+            flags["ohlc"] = np.zeros_like(valid)
+
+        # log-rendement t.o.v. de vorige geldige bar; schaal = robuuste MAD per ticker
+        cp = np.take_along_axis(c, np.maximum(prev, 0), axis=0)
+        r = np.where(ok & (prev >= 0) & (cp > 0), np.log(c / cp), np.nan)
+        r_next = np.take_along_axis(r, np.minimum(nxt, n - 1), axis=0)
+        r_next[nxt >= n] = np.nan
+        med = np.nanmedian(r, axis=0)
+        scale = np.fmax(1.4826 * np.nanmedian(np.abs(r - med), axis=0), 0.005)
+        thr = np.fmax(k * scale, floor)[None, :]
+        big, big_next = np.abs(r) > thr, np.abs(r_next) > thr
+        flags["spike"] = big & big_next & (np.sign(r) != np.sign(r_next)) & (np.abs(r + r_next) < 0.5 * np.abs(r))
+        # split-kandidaten zijn zeldzaam: verhouding alleen voor die cellen tegen de bekende splits houden
+        flags["split"] = np.zeros_like(valid)
+        ratios = np.ones(c.shape)
+        cand = np.nonzero(big & ~flags["spike"] & (np.abs(r) > np.log(1.8)))
+        if len(cand[0]):
+            q = np.exp(r[cand])
+            near = np.abs(q[:, None] / _SPLITS[None, :] - 1.0)
+            hit = near.min(axis=1) < 0.02
+            flags["split"][cand[0][hit], cand[1][hit]] = True
+            ratios[cand[0][hit], cand[1][hit]] = _SPLITS[near.argmin(axis=1)][hit]
+    flags["stale"] = _stale(c, valid, prev, run)
+    gaps = _gaps(panel.index, panel.tickers, valid, prev)
+
+    bars = valid.sum(axis=0)
+    report = pd.DataFrame({"bars": bars, **{ch: flags[ch].sum(axis=0) for ch in CHECKS},
+                           "gaps": (gaps > 0).sum(axis=0), "max_gap": gaps.max(axis=0)},
+                          index=pd.Index(panel.tickers, name="ticker"))
+    report["ok"] = ((report[list(CHECKS)].sum(axis=1) == 0) & (report["max_gap"] <= max_gap)).to_numpy()
+    report["repaired"] = 0
+    if repair:
+        panel, report["repaired"] = _repair(panel, flags, ratios)
+    return panel, report[cols]
+
+def _repair(panel: PricePanel, flags: Dict[str, np.ndarray], split_ratio: np.ndarray) -> Tuple[PricePanel, np.ndarray]:
+    drop = flags["nonpositive"] | flags["spike"] | flags["stale"]
+    split = flags["split"]
+    touched = drop | split | flags["ohlc"]
+    cols = np.flatnonzero(touched.any(axis=0))
+    fields = dict(panel.fields)
+    if not len(cols):
+        return panel, np.zeros(len(panel.tickers), dtype=np.int64)
+    # alleen kolommen met bevindingen kopiëren
+    sub = {f: np.array(a[:, cols], dtype=np.float64) for f, a in panel.fields.items()}
+    d, s = drop[:, cols], split[:, cols]
+    # splits: alles vóór de sprong met de verhouding vermenigvuldigen (Volume delen)
+    q = np.where(s, split_ratio[:, cols], 1.0)
+    adj = np.vstack([np.cumprod(q[::-1], axis=0)[::-1][1:], np.ones((1, len(cols)))])
+    for f in sub:
+        if f == "Volume":
+            sub[f] = sub[f] / adj
+        elif f in OHLCV:
+            sub[f] = sub[f] * adj
+        sub[f][d] = np.nan
+    if {"Open", "High", "Low", "Close"} <= set(sub):
+        sub["High"] = np.fmax(sub["High"], np.fmax(sub["Open"], sub["Close"]))
+        sub["Low"] = np.fmin(sub["Low"], np.fmin(sub["Open"], sub["Close"]))
+    for f, a in sub.items():
+        full = np.array(fields[f])
+        full[:, cols] = a
+        fields[f] = full
+    repaired = np.zeros(len(panel.tickers), dtype=np.int64)
+    repaired[cols] = touched[:, cols].sum(axis=0)
+    return PricePanel(panel.index, panel.tickers, fields), repaired
+
+# laatste rapport per ticker (voor de diagnostiekpagina)
+_RECENT: "OrderedDict[str, dict]" = OrderedDict()
+_RECENT_LOCK = threading.Lock()
+
+def _remember(report: pd.DataFrame) -> None:
+    with _RECENT_LOCK:
+        for t, row in zip(report.index, report.to_dict("records")):
+            _RECENT[t] = row
+            _RECENT.move_to_end(t)
+        while len(_RECENT) > 5000:
+            _RECENT.popitem(last=False)
+
+def recent() -> pd.DataFrame:
+    """Laatste kwaliteitsrapport per ticker, probleemtickers bovenaan."""
+    with _RECENT_LOCK:
+        df = pd.DataFrame.from_dict(dict(_RECENT), orient="index")
+    if df.empty:
+        return df
+    df.index.name = "ticker"
+    return df.sort_values(["ok", "max_gap"], ascending=[True, False])
+
+def _validate_frames(frames: Dict[str, pd.DataFrame], repair: bool,
+                     tail: Dict[str, int] | None = None) -> Tuple[PricePanel, pd.DataFrame]:
+    fields = [f for f in OHLCV if any(f in df.columns for df in frames.values())]
+    # float64: herstelde frames vervangen de opgehaalde (en opgeslagen) frames
+    return validate(PricePanel.from_frames(frames, fields, dtype=np.float64, tail=tail), repair=repair)
+
+def check_frames(frames: Dict[str, pd.DataFrame], repair: bool | None = None,
+                 new_bars: Dict[str, int] | None = None, copy: bool = True) -> Dict[str, pd.DataFrame]:
+    """
+    `validate` voor {ticker: frame} zoals `fetch_prices` die teruggeeft. Elk gecontroleerd frame krijgt
+    `attrs["quality"]`; bij herstel worden alleen de frames met bevindingen vervangen.
+    Met `new_bars` ({ticker: aantal nieuwe bars}) alleen die tickers, over hun laatste bars plus
+    QUALITY_CONTEXT bars context; tellingen gaan dan over dat venster. Herstel draait voor tickers
+    met bevindingen over de hele historie (een split past alles ervóór aan).
+    `copy=False` zet het rapport direct op de meegegeven frames (alleen voor frames die niemand deelt).
+    """
+    if not frames:
+        return frames
+    repair = mode() == "repair" if repair is None else repair
+    tail = None
+    if new_bars is None:
+        todo = frames
+    else:
+        ctx = max(2, int(_env_float("QUALITY_CONTEXT", 60)))
+        tail = {t: k + ctx for t, k in new_bars.items() if k > 0 and t in frames}
+        todo = {t: frames[t] for t in tail}
+        if not todo:
+            return frames
+    fixed, report = _validate_frames(todo, repair and new_bars is None, tail)
+    if repair and new_bars is not None:
+        redo = report.index[report[list(CHECKS)].sum(axis=1) > 0].tolist()
+        if redo:
+            fixed, full = _validate_frames({t: frames[t] for t in redo}, True)
+            report = pd.concat([report.drop(index=redo), full])
+    _remember(report)
+    for ch in CHECKS:
+        hits = int(report[ch].sum())
+        if hits:
+            metrics.inc("aiva_quality_total", hits, check=ch)
+    bad = report.index[~report["ok"].astype(bool)].tolist()
+    if bad:
+        metrics.event(f"datakwaliteit: {len(bad)} tickers met bevindingen ({', '.join(bad[:5])}{'…' if len(bad) > 5 else ''})",
+                      level="warning", source="quality")
+    out = dict(frames)
+    rows = report.to_dict("index")
+    for t, df in frames.items():
+        if t not in rows:
+            continue
+        if repair and rows[t]["repaired"]:
+            cols = [c for c in df.columns if c in fixed.fields]
+            # zelfde dtypes als de invoer (float-kolommen; Volume kan int zijn en na herstel NaN bevatten)
+            attrs = dict(df.attrs)
+            df = fixed.frame(t)[cols].astype({c: df[c].dtype for c in cols if df[c].dtype.kind == "f"})
+            df.attrs = attrs
+        elif copy:
+            df = df.copy(deep=False)
+        df.attrs["quality"] = {k: (bool(v) if k == "ok" else int(v)) for k, v in rows[t].items()}
+        out[t] = df
+    return out
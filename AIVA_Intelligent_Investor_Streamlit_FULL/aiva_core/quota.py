@@ -0,0 +1,191 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import asyncio, heapq, itertools, os, sqlite3, threading, weakref
+
+from . import metrics, rate_limit
+
+# Centrale planner voor providers met een API-key en een hard dagquotum.
+# - verbruik per (provider, UTC-dag) staat in SQLite, dus gedeeld tussen processen
+# - per provider één wachtrij op prioriteit vóór de token bucket (holdings eerst)
+# - lage prioriteit mag een deel van het dagbudget niet aanspreken (QUOTA_RESERVE),
+#   zodat een grote screen het quotum voor de portefeuille niet opmaakt
+# Een request zonder budget wordt niet verstuurd; de aanroeper valt terug (volgende provider / leeg).
+
+HOLDING, WATCHLIST, NORMAL, SCREEN = 0, 1, 2, 3
+
+class QuotaExceeded(Exception):
+    """Geen dagbudget meer voor deze provider/prioriteit; telt niet als providerfout."""
+
+# requests per dag (gratis tiers); 0 = geen dagquotum
+_DAILY: Dict[str, int] = {
+    "alpha_vantage": 25,
+    "finnhub": 0,
+    "fmp": 250,
+    "newsapi": 100,
+}
+
+def daily_limit(provider: str) -> int:
+    default = _DAILY.get(provider, 0)
+    try:
+        return int(os.getenv(f"{provider.upper()}_DAILY_QUOTA", default))
+    except ValueError:
+        return default
+
+def reserve_share() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv("QUOTA_RESERVE", "0.2"))))
+    except ValueError:
+        return 0.2
+
+def db_path() -> str:
+    return os.getenv("QUOTA_DB", "data/quota.sqlite")
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def _cap(provider: str, priority: int) -> int:
+    limit = daily_limit(provider)
+    if priority <= WATCHLIST:
+        return limit
+    return int(limit * (1.0 - reserve_share()))
+
+_CONN: sqlite3.Connection | None = None
+_CONN_KEY: tuple = ()
+_DB_LOCK = threading.Lock()
+
+def _conn() -> sqlite3.Connection:
+    global _CONN, _CONN_KEY
+    key = (os.getpid(), db_path())
+    if _CONN is None or _CONN_KEY != key:
+        folder = os.path.dirname(key[1])
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        c = sqlite3.connect(key[1], timeout=10, isolation_level=None, check_same_thread=False)
+        c.execute("CREATE TABLE IF NOT EXISTS usage (provider TEXT, day TEXT, used INTEGER, PRIMARY KEY (provider, day))")
+        _CONN, _CONN_KEY = c, key
+    return _CONN
+
+def used(provider: str) -> int:
+    with _DB_LOCK:
+        row = _conn().execute("SELECT used FROM usage WHERE provider=? AND day=?", (provider, _today())).fetchone()
+    return int(row[0]) if row else 0
+
+def available(provider: str, priority: int = NORMAL, n: int = 1) -> bool:
+    """Is er (nog) budget voor `n` requests op deze prioriteit? Boekt niets."""
+    if daily_limit(provider) <= 0:
+        return True
+    return used(provider) + n <= _cap(provider, priority)
+
+async def available_async(provider: str, priority: int = NORMAL, n: int = 1) -> bool:
+    """`available` voor coroutines: de SQLite-read draait in een thread, niet op de event loop."""
+    if daily_limit(provider) <= 0:
+        return True
+    return await asyncio.to_thread(available, provider, priority, n)
+
+def reserve(provider: str, n: int = 1, priority: int = NORMAL) -> bool:
+    """Boek `n` requests atomair (ook tussen processen); False als dat het budget overschrijdt."""
+    limit = daily_limit(provider)
+    if limit <= 0:
+        return True
+    day = _today()
+    with _DB_LOCK:
+        c = _conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute("SELECT used FROM usage WHERE provider=? AND day=?", (provider, day)).fetchone()
+            cur = int(row[0]) if row else 0
+            ok = cur + n <= _cap(provider, priority)
+            if ok:
+                c.execute("INSERT INTO usage (provider, day, used) VALUES (?, ?, ?) "
+                          "ON CONFLICT(provider, day) DO UPDATE SET used = used + excluded.used", (provider, day, n))
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    metrics.inc("aiva_quota_total", n, provider=provider, outcome="granted" if ok else "denied", priority=priority)
+    if not ok:
+        metrics.event(f"{provider} dagquotum: request prio {priority} niet verstuurd ({cur}/{limit})",
+                      level="warning", source="quota")
+    return ok
+
+def snapshot() -> List[Dict[str, Any]]:
+    """Verbruik vandaag per provider met een dagquotum (voor de diagnostiekpagina)."""
+    out = []
+    for p in sorted(set(_DAILY) | {k[:-len("_DAILY_QUOTA")].lower() for k in os.environ if k.endswith("_DAILY_QUOTA")}):
+        limit = daily_limit(p)
+        if limit > 0:
+            u = used(p)
+            out.append({"provider": p, "used": u, "limit": limit, "remaining": max(0, limit - u),
+                        "reserved_for_holdings": limit - _cap(p, SCREEN)})
+    return out
+
+def reset(provider: str | None = None) -> None:
+    with _DB_LOCK:
+        if provider:
+            _conn().execute("DELETE FROM usage WHERE provider=?", (provider,))
+        else:
+            _conn().execute("DELETE FROM usage")
+
+def priorities(tickers: List[str], priority: int | Dict[str, int] = NORMAL) -> Dict[str, int]:
+    """Prioriteit per ticker uit één waarde of een dict (ontbrekende tickers: NORMAL)."""
+    if isinstance(priority, dict):
+        return {t: int(priority.get(t, NORMAL)) for t in tickers}
+    return {t: int(priority) for t in tickers}
+
+class _Gate:
+    """Mutex per provider die wachtenden op prioriteit (en daarbinnen op volgorde) doorlaat."""
+
+    def __init__(self):
+        self._held = False
+        self._waiters: list = []
+        self._seq = itertools.count()
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)  # direct doorgeven; _held blijft True
+                return
+        self._held = False
+
+    @asynccontextmanager
+    async def hold(self, priority: int):
+        if self._held:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()
+                raise
+        else:
+            self._held = True
+        try:
+            yield
+        finally:
+            self._release()
+
+_GATES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Gate]]" = weakref.WeakKeyDictionary()
+
+def _gate(provider: str) -> _Gate:
+    gates = _GATES.setdefault(asyncio.get_running_loop(), {})
+    g = gates.get(provider)
+    if g is None:
+        g = gates[provider] = _Gate()
+    return g
+
+async def admit(provider: str, priority: int = NORMAL) -> bool:
+    """
+    Wacht in prioriteitsvolgorde op een token van de provider en boek het dagquotum.
+    False = geen budget meer voor deze prioriteit; de request moet dan niet verstuurd worden.
+    De boeking (BEGIN IMMEDIATE, kan op een ander proces wachten) draait in een thread, zodat
+    andere requests op de gedeelde event loop doorlopen.
+    """
+    async with _gate(provider).hold(priority):
+        if daily_limit(provider) > 0 and not await asyncio.to_thread(reserve, provider, 1, priority):
+            return False
+        await rate_limit.acquire_async(provider)
+    return True
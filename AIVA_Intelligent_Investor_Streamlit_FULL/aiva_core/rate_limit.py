@@ -0,0 +1,103 @@
+from __future__ import annotations
+from typing import Dict, Tuple
+import asyncio, os, threading, time
+
+# provider -> (requests per minuut, burst, workers)
+_DEFAULTS: Dict[str, Tuple[float, float, int]] = {
+    "yfinance": (600.0, 10.0, 8),
+    "finnhub": (60.0, 5.0, 4),
+    "alpha_vantage": (5.0, 1.0, 1),
+    "fmp": (300.0, 5.0, 4),
+    "newsapi": (60.0, 2.0, 4),
+}
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per seconde, maximaal `capacity` op voorraad."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(1e-9, float(rate))
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Blokkeer tot er `tokens` beschikbaar zijn."""
+        while True:
+            wait = self._take_or_wait(tokens)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def _take_or_wait(self, tokens: float) -> float:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """Als `acquire`, maar wacht met asyncio.sleep zodat de event loop doorloopt."""
+        while True:
+            wait = self._take_or_wait(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+_LOCK = threading.Lock()
+
+def _env_key(provider: str) -> str:
+    return provider.upper().replace("-", "_")
+
+def rate_per_min(provider: str) -> float:
+    default = _DEFAULTS.get(provider, (60.0, 1.0, 1))[0]
+    try:
+        return float(os.getenv(f"{_env_key(provider)}_RATE_PER_MIN", default))
+    except ValueError:
+        return default
+
+def workers(provider: str) -> int:
+    """Aantal gelijktijdige requests voor een provider; FETCH_WORKERS is een globale bovengrens."""
+    n = _DEFAULTS.get(provider, (60.0, 1.0, 1))[2]
+    cap = os.getenv("FETCH_WORKERS")
+    if cap:
+        try:
+            n = min(n, int(cap))
+        except ValueError:
+            pass
+    return max(1, n)
+
+def limiter(provider: str) -> TokenBucket:
+    with _LOCK:
+        b = _BUCKETS.get(provider)
+        if b is None:
+            burst = _DEFAULTS.get(provider, (60.0, 1.0, 1))[1]
+            b = TokenBucket(rate_per_min(provider) / 60.0, burst)
+            _BUCKETS[provider] = b
+        return b
+
+def acquire(provider: str) -> None:
+    limiter(provider).acquire()
+
+async def acquire_async(provider: str) -> None:
+    await limiter(provider).acquire_async()
+
+def reset() -> None:
+    """Vergeet alle buckets (bv. na het aanpassen van env-limieten)."""
+    with _LOCK:
+        _BUCKETS.clear()
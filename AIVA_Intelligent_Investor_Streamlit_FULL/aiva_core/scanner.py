@@ -5,7 +5,9 @@ import math
 import numpy as np
 import pandas as pd
 
+from . import quota
 from .data_sources import fetch_prices
+from .panel import PricePanel
 
 # =============== Helpers ===============
 
@@ -81,12 +83,59 @@ def _factors(s: pd.Series) -> Dict[str, float]:
         "score": score,
     }
 
+def _factors_panel(panel: PricePanel) -> Dict[str, Dict[str, float]]:
+    """
+    `_factors` voor alle tickers van een panel tegelijk. Elke kolom wordt eerst 'rechts uitgelijnd'
+    (geldige waarden onderaan, NaN erboven), wat per kolom gelijk is aan `dropna()`.
+    """
+    if not panel.tickers or not len(panel):
+        return {}
+    c = np.asarray(panel.field("Close"), dtype=np.float64)
+    valid = np.isfinite(c)
+    n_ok = valid.sum(axis=0)
+    c = np.take_along_axis(c, np.argsort(valid, axis=0, kind="stable"), axis=0)
+    n = c.shape[0]
+
+    look = min(252, n)
+    window = c[-look:]
+    with np.errstate(all="ignore"):
+        last = c[-1]
+        hi = np.nanmax(window, axis=0)
+        lo = np.nanmin(window, axis=0)
+
+        def mom(k: int) -> np.ndarray:
+            if n <= k:
+                return np.full(c.shape[1], np.nan)
+            return np.where(n_ok > k, last / c[-k-1] - 1.0, np.nan)
+
+        m20, m60, m120 = mom(20), mom(60), mom(120)
+        dist_h = last / hi - 1.0
+        dist_l = last / lo - 1.0
+        rets = window[1:] / window[:-1] - 1.0
+        vol = np.nanstd(rets, axis=0, ddof=1)
+        score = np.nanmean(np.vstack([m20, m60, m120, dist_l, -dist_h]), axis=0)
+        score = np.where(np.isfinite(vol) & (vol > 0), score / (1.0 + 3.0 * vol), score)
+
+    out: Dict[str, Dict[str, float]] = {}
+    for j, t in enumerate(panel.tickers):
+        if n_ok[j] < 60:  # zelfde minimum als _to_close_series
+            continue
+        out[t] = {"last": float(last[j]), "high_52": float(hi[j]), "low_52": float(lo[j]),
+                  "mom20": float(m20[j]), "mom60": float(m60[j]), "mom120": float(m120[j]),
+                  "dist_high": float(dist_h[j]), "dist_low": float(dist_l[j]),
+                  "vol": float(vol[j]), "score": float(score[j])}
+    return out
+
 # =============== Public API ===============
 
-def screen_universe(sectors: Dict[str, List[str]], lookback_days: int = 400, top_k: int = 5) -> Dict[str, List[Tuple[str, float]]]:
+def screen_universe(sectors: Dict[str, List[str]], lookback_days: int = 400, top_k: int = 5,
+                    prices: Dict[str, pd.DataFrame] | PricePanel | None = None) -> Dict[str, List[Tuple[str, float]]]:
     """
     Maakt per sector een lijst met (ticker, score), gesorteerd aflopend.
     - gebruikt fetch_prices (Finnhub -> Stooq) i.p.v. yfinance
+    - `prices`: al opgehaalde frames worden hergebruikt, alleen de rest wordt opgehaald
+    - `prices` mag ook een `PricePanel` zijn (bv. `price_store.build_matrix`); dan gaat de
+      factorberekening gevectoriseerd over het hele panel
     - faalt nooit hard: lege sectoren geven []
     """
     res: Dict[str, List[Tuple[str, float]]] = {}
@@ -105,15 +154,25 @@ def screen_universe(sectors: Dict[str, List[str]], lookback_days: int = 400, top
         return {sec: [] for sec in sectors.keys()}
 
     # 1) Haal prijzen (deelsucces oké)
-    px = fetch_prices(universe, lookback_days=lookback_days)
+    fac_map: Dict[str, Dict[str, float]] = {}
+    if isinstance(prices, PricePanel):
+        fac_map.update(_factors_panel(prices))
+        px = {}
+        todo = [t for t in universe if t not in prices]
+    else:
+        px = {t: df for t, df in (prices or {}).items() if t in universe}
+        todo = [t for t in universe if t not in px]
+    if todo:
+        # screen-kandidaten: laagste prioriteit voor het dagquotum van key-providers
+        px.update(fetch_prices(todo, lookback_days=lookback_days, priority=quota.SCREEN))
     closes = _to_close_series(px)
 
     # 2) Factors per ticker
-    fac_map: Dict[str, Dict[str, float]] = {}
     for t, s in closes.items():
         f = _factors(s)
-        if f and not math.isnan(f.get("score", float("nan"))):
+        if f:
             fac_map[t] = f
+    fac_map = {t: f for t, f in fac_map.items() if not math.isnan(f.get("score", float("nan")))}
 
     # 3) Per sector: sorteer op score en pak top_k
     for sec, ticks in sectors.items():
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context, shared_memory
+import os
+import numpy as np
+import pandas as pd
+
+from .panel import PricePanel
+
+# Zero-copy delen van een PricePanel met procesworkers:
+# - panel dat al memory-mapped van schijf komt (price_store.build_matrix): workers openen hetzelfde pad
+# - anders: één shared_memory-blok per veld (dtype van het panel); workers koppelen op naam en lezen NumPy-views
+# Naar de workers gaat alleen een klein handle (namen, vorm, tickers, datums) en per taak een ticker.
+
+def workers_default() -> int:
+    try:
+        return max(1, int(os.getenv("PROCESS_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+def _mmap_dir(panel: PricePanel) -> str | None:
+    """Map van een met `PricePanel.open` geopend panel, als alle velden daar als .npy staan."""
+    dirs = set()
+    for f, a in panel.fields.items():
+        name = getattr(a, "filename", None)
+        if not name or os.path.basename(name) != f"{f}.npy":
+            return None
+        dirs.add(os.path.dirname(name))
+    return dirs.pop() if len(dirs) == 1 and os.path.exists(os.path.join(next(iter(dirs)), "meta.json")) else None
+
+class SharedPanel:
+    """
+    Context manager die een panel deelbaar maakt. `handle` is picklebaar en gaat naar `attach`.
+    Bij afsluiten worden eigen shared_memory-blokken vrijgegeven.
+    """
+
+    def __init__(self, panel: PricePanel):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        path = _mmap_dir(panel)
+        if path:
+            self.handle: Dict[str, Any] = {"kind": "mmap", "path": path, "fields": list(panel.fields)}
+            return
+        blocks = {}
+        for f, a in panel.fields.items():
+            a = np.ascontiguousarray(a)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+            self._blocks.append(shm)
+            blocks[f] = (shm.name, a.shape, a.dtype.str)
+        self.handle = {
+            "kind": "shm", "blocks": blocks, "tickers": list(panel.tickers),
+            "dates": panel.index.values.astype("datetime64[ns]").astype(np.int64),
+        }
+
+    def close(self) -> None:
+        for shm in self._blocks:
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
+        self._blocks = []
+
+    def __enter__(self) -> "SharedPanel":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+# per worker-proces: gekoppelde blokken openhouden zolang het panel gebruikt wordt
+_ATTACHED: Dict[str, Any] = {}
+
+def attach(handle: Dict[str, Any]) -> PricePanel:
+    """Panel op basis van een `SharedPanel.handle`, zonder de data te kopiëren."""
+    if handle["kind"] == "mmap":
+        return PricePanel.open(handle["path"], fields=handle["fields"])
+    fields = {}
+    for f, (name, shape, dtype) in handle["blocks"].items():
+        shm = _ATTACHED.get(name)
+        if shm is None:
+            shm = _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        fields[f] = arr
+    index = pd.DatetimeIndex(np.asarray(handle["dates"]).astype("datetime64[ns]"), name="Date")
+    return PricePanel(index, handle["tickers"], fields)
+
+_PANEL: PricePanel | None = None
+
+def _init(handle: Dict[str, Any]) -> None:
+    global _PANEL
+    _PANEL = attach(handle)
+
+def _run(fn: Callable, tickers: List[str]) -> Dict[str, Any]:
+    out = {}
+    for t in tickers:
+        res = fn(_PANEL, t)
+        if res is not None:
+            out[t] = res
+    return out
+
+def map_tickers(fn: Callable[[PricePanel, str], Any], panel: PricePanel, tickers: List[str] | None = None,
+                workers: int | None = None, **kwargs) -> Dict[str, Any]:
+    """
+    Voer `fn(panel, ticker, **kwargs)` uit voor elke ticker, verdeeld over een process pool.
+    `fn` moet op moduleniveau staan (picklebaar); resultaten `None` worden overgeslagen.
+    Met `workers=1` (standaard via PROCESS_WORKERS) draait alles in het eigen proces.
+    """
+    tickers = [t for t in (tickers if tickers is not None else panel.tickers) if t in panel]
+    fn = partial(fn, **kwargs) if kwargs else fn
+    workers = min(workers or workers_default(), len(tickers) or 1)
+    if workers <= 1:
+        out = {}
+        for t in tickers:
+            res = fn(panel, t)
+            if res is not None:
+                out[t] = res
+        return out
+    # een paar chunks per worker: evenwicht tussen load-balancing en overhead per taak
+    n_chunks = workers * 4
+    chunks = [tickers[i::n_chunks] for i in range(n_chunks) if tickers[i::n_chunks]]
+    out: Dict[str, Any] = {}
+    with SharedPanel(panel) as sp, ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn"), initializer=_init, initargs=(sp.handle,)) as ex:
+        for part in ex.map(partial(_run, fn), chunks):
+            out.update(part)
+    return {t: out[t] for t in tickers if t in out}
@@ -0,0 +1,114 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List
+import itertools, os
+import numpy as np
+import pandas as pd
+
+from . import backtest_engine, indicator_engine as eng
+from .panel import PricePanel
+
+# Parameter-sweep voor de signaalregels (`signal_from_row` + `backtest_ticker`) over een universum.
+# Gedeelde tussenresultaten worden één keer berekend: de closes worden rechts uitgelijnd, SMA's
+# voor alle vensters komen uit één cumsum, RSI voor alle periodes uit één cumsum van winst/verlies
+# (`indicator_engine.Windows`, dezelfde kernel als de signalen).
+# Per (ma_short, ma_long, rsi_period) worden alle (rsi_buy, rsi_sell)-drempels tegelijk geëvalueerd
+# als gebroadcaste vergelijkingen (buy x sell x tickers x bars), in blokken tickers van hoogstens
+# SWEEP_MAX_CELLS cellen.
+# Backtest-semantiek per ticker als `backtest_ticker`: alleen bars waarop alle indicatoren bestaan,
+# positie = signaal van de vorige bar (BUY 1, SELL -1), kosten `cost_bps` per eenheid omzet.
+
+DEFAULTS = {"ma_short": 20, "ma_long": 50, "rsi_period": 14, "rsi_buy": 35, "rsi_sell": 65}
+COLUMNS = ["ma_short", "ma_long", "rsi_period", "rsi_buy", "rsi_sell", "buys", "sells", "trades",
+           "buy_now", "sell_now", "cagr", "sharpe", "max_drawdown", "hit_ratio", "tickers"]
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def _values(grid: Dict[str, Any], name: str) -> List[float]:
+    v = grid.get(name, DEFAULTS[name])
+    if isinstance(v, (str, bytes)) or not isinstance(v, Iterable):
+        v = [v]
+    cast = float if name in ("rsi_buy", "rsi_sell") else int
+    return sorted(set(cast(x) for x in v))
+
+def _compact(valid: np.ndarray, *arrays: np.ndarray) -> List[np.ndarray]:
+    """Geldige rijen per kolom naar onderen (volgorde behouden), zoals `dropna` per ticker."""
+    order = np.argsort(valid, axis=0, kind="stable")
+    return [np.take_along_axis(a, order, axis=0) for a in (valid,) + arrays]
+
+def _evaluate(buy: np.ndarray, sell: np.ndarray, ret: np.ndarray, valid: np.ndarray, cost: float) -> Dict[str, np.ndarray]:
+    """
+    Backtest per drempelcombinatie en ticker. `buy` (B, N, T), `sell` (S, N, T), `ret`/`valid` (N, T),
+    gecompacteerd (geldige bars achteraan); tijd als laatste as zodat cumsums aaneengesloten lopen.
+    Geeft metrics met vorm (B, S, N).
+    """
+    sig = buy[:, None].view(np.int8) - sell[None, :].view(np.int8)  # (B, S, N, T)
+    pos = np.zeros(sig.shape, dtype=np.int8)
+    pos[..., 1:] = sig[..., :-1]  # positie = signaal van de vorige bar
+    turn = np.zeros(sig.shape, dtype=np.int8)
+    np.abs(pos[..., 1:] - pos[..., :-1], out=turn[..., 1:])
+    net = pos * ret - turn * cost
+    return {
+        "buys": np.count_nonzero(sig > 0, axis=-1), "sells": np.count_nonzero(sig < 0, axis=-1),
+        "trades": np.count_nonzero(turn, axis=-1), "buy_now": sig[..., -1] > 0, "sell_now": sig[..., -1] < 0,
+        **backtest_engine.metrics(net, valid),
+    }
+
+def sweep(prices: Dict[str, pd.DataFrame] | PricePanel, grid: Dict[str, Any], cost_bps: int = 5) -> pd.DataFrame:
+    """
+    Alle combinaties van `grid` (ma_short, ma_long, rsi_period, rsi_buy, rsi_sell; lijst of één waarde,
+    ontbrekend = DEFAULTS) voor alle tickers. Eén rij per combinatie met ma_short < ma_long:
+    signaaltellingen over alle bars (`buys`, `sells`, `trades`), tickers met nu BUY/SELL
+    (`buy_now`, `sell_now`) en backtest-metrics gemiddeld over de tickers.
+    """
+    g = {n: _values(grid, n) for n in DEFAULTS}
+    panel = prices if isinstance(prices, PricePanel) else PricePanel.from_frames(prices or {}, ["Close"], dtype=np.float64)
+    if not panel.tickers or not len(panel):
+        return pd.DataFrame(columns=COLUMNS)
+    c, _, _ = eng.right_align(np.asarray(panel.field("Close"), dtype=np.float64))
+    T, N = c.shape
+    cost = cost_bps / 10000.0
+
+    # gedeelde tussenresultaten
+    sma = eng.Windows(c)
+    gains, losses = (eng.Windows(m) for m in eng.moves(c))
+    base_ok = np.isfinite(c) & np.isfinite(sma.mean(200, 66)) & np.isfinite(eng.rolling_std(c, 20))
+    rsis: Dict[int, np.ndarray] = {}
+    for n in g["rsi_period"]:
+        rsis[n] = eng.rsi_from(gains.mean(n, n), losses.mean(n, n))
+
+    buys_t = np.array(g["rsi_buy"])[:, None, None]
+    sells_t = np.array(g["rsi_sell"])[:, None, None]
+    B, S = len(buys_t), len(sells_t)
+    chunk = max(1, _env_int("SWEEP_MAX_CELLS", 250_000) // max(1, B * S * T))
+    rows: List[Dict[str, Any]] = []
+    for ms, ml, rp in itertools.product(g["ma_short"], g["ma_long"], g["rsi_period"]):
+        if ms >= ml:
+            continue
+        s, l, rsi = sma.mean(ms, max(5, ms // 3)), sma.mean(ml, max(5, ml // 3)), rsis[rp]
+        valid = base_ok & np.isfinite(s) & np.isfinite(l) & np.isfinite(rsi)
+        # per ticker de geldige bars achteraan, tijd als laatste as; warm-up zonder geldige bars valt weg
+        t0 = T - int(valid.sum(axis=0).max())
+        valid, cc, s, l, rsi = (np.ascontiguousarray(a[t0:].T) for a in _compact(valid, c, s, l, rsi))
+        ret = backtest_engine.returns(cc, valid)
+        with np.errstate(invalid="ignore"):
+            up, down = valid & (s > l), valid & (s < l)
+            buy = (rsi[None] <= buys_t) & up[None]
+            sell = (rsi[None] >= sells_t) & down[None]
+        parts = [_evaluate(buy[:, j:j + chunk], sell[:, j:j + chunk], ret[j:j + chunk],
+                           valid[j:j + chunk], cost) for j in range(0, N, chunk)]
+        res = {k: np.concatenate([p[k] for p in parts], axis=-1) for k in parts[0]}
+        has = valid.any(axis=1)
+        for bi, si in itertools.product(range(B), range(S)):
+            row = {"ma_short": ms, "ma_long": ml, "rsi_period": rp,
+                   "rsi_buy": float(buys_t[bi, 0, 0]), "rsi_sell": float(sells_t[si, 0, 0]), "tickers": int(has.sum())}
+            for k in ("buys", "sells", "trades", "buy_now", "sell_now"):
+                row[k] = int(res[k][bi, si][has].sum())
+            for k in ("cagr", "sharpe", "max_drawdown", "hit_ratio"):
+                v = res[k][bi, si][has]
+                row[k] = float(np.nanmean(v)) if np.isfinite(v).any() else float("nan")
+            rows.append(row)
+    return pd.DataFrame(rows, columns=COLUMNS)
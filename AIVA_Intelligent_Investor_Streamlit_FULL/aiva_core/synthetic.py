@@ -0,0 +1,103 @@
+from __future__ import annotations
+from typing import Dict, List
+import zlib
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from .panel import OHLCV, PricePanel
+
+# Synthetische markt voor de offline provider en load-tests:
+# - gedeelde bull/bear-regimes (Markov, geometrische duur)
+# - marktfactor + sectorfactoren met stochastische volatiliteit (clustering)
+# - per ticker deterministische parameters en ruis (seed uit de tickernaam),
+#   dus een ticker heeft hetzelfde pad ongeacht welke andere tickers meegegenereerd worden
+
+_BULL_DRIFT, _BEAR_DRIFT = 0.0004, -0.0010
+_BEAR_VOL_MULT = 1.7
+_SV_PHI, _SV_SIGMA = 0.98, 0.10
+
+def ticker_seed(ticker: str) -> int:
+    return zlib.crc32(str(ticker).upper().encode("utf-8"))
+
+def _regimes(n: int, rng: np.random.Generator, bull_days: float = 250.0, bear_days: float = 60.0) -> np.ndarray:
+    """Boolean-array: True = bear. Loop over regimes (enkele tientallen), niet over dagen."""
+    bear = np.zeros(n, dtype=bool)
+    i, state = 0, False
+    while i < n:
+        d = int(rng.geometric(1.0 / (bear_days if state else bull_days)))
+        bear[i:i + d] = state
+        i += d
+        state = not state
+    return bear
+
+def _sv(eta: np.ndarray) -> np.ndarray:
+    """Stochastische vol-multiplier exp(h) met h_t = phi*h_{t-1} + sigma*eta_t (langs as 0)."""
+    h = lfilter([_SV_SIGMA], [1.0, -_SV_PHI], eta, axis=0)
+    var = _SV_SIGMA ** 2 / (1.0 - _SV_PHI ** 2)
+    return np.exp(h - var / 2.0).astype(np.float32)
+
+def _factors(n: int, n_sectors: int, seed: int):
+    rng = np.random.default_rng([seed, 0])
+    bear = _regimes(n, rng)
+    k = 1 + n_sectors
+    base = np.array([0.010] + [0.007] * n_sectors, dtype=np.float32)
+    z = rng.standard_normal((n, k), dtype=np.float32)
+    sv = _sv(rng.standard_normal((n, k)))
+    mult = np.where(bear, _BEAR_VOL_MULT, 1.0).astype(np.float32)[:, None]
+    f = z * base * sv * mult
+    drift = np.where(bear, _BEAR_DRIFT, _BULL_DRIFT).astype(np.float32)
+    return f, drift, mult[:, 0]
+
+def _chunk(tickers: List[str], n: int, f: np.ndarray, drift: np.ndarray, mult: np.ndarray,
+           n_sectors: int, seed: int) -> Dict[str, np.ndarray]:
+    m = len(tickers)
+    noise = np.empty((n, m, 5), dtype=np.float32)  # eps, eta, gap, hi, lo
+    beta_m = np.empty(m, np.float32); beta_s = np.empty(m, np.float32)
+    sector = np.empty(m, np.int64); ivol = np.empty(m, np.float32)
+    alpha = np.empty(m, np.float32); p0 = np.empty(m, np.float32); vol0 = np.empty(m, np.float32)
+    for j, t in enumerate(tickers):
+        rng = np.random.default_rng([seed, ticker_seed(t)])
+        beta_m[j] = np.clip(rng.normal(1.0, 0.3), 0.2, 2.0)
+        beta_s[j] = rng.uniform(0.5, 1.2)
+        sector[j] = rng.integers(1, n_sectors + 1)
+        ivol[j] = rng.uniform(0.008, 0.025)
+        alpha[j] = rng.normal(0.0, 0.0002)
+        p0[j] = np.exp(rng.normal(np.log(50.0), 0.8))
+        vol0[j] = np.exp(rng.normal(np.log(2e6), 1.0))
+        noise[:, j, :] = rng.standard_normal((n, 5), dtype=np.float32)
+
+    idio_sv = _sv(noise[:, :, 1])
+    sig = ivol[None, :] * idio_sv * mult[:, None]
+    r = (alpha[None, :] + drift[:, None] * beta_m[None, :]
+         + f[:, [0]] * beta_m[None, :] + f[:, sector] * beta_s[None, :]
+         + sig * noise[:, :, 0])
+    close = p0[None, :] * np.exp(np.cumsum(r, axis=0, dtype=np.float64)).astype(np.float32)
+    prev = np.vstack([p0[None, :], close[:-1]])
+    open_ = prev * np.exp(0.25 * sig * noise[:, :, 2])
+    hi = np.maximum(open_, close) * np.exp(0.5 * sig * np.abs(noise[:, :, 3]))
+    lo = np.minimum(open_, close) * np.exp(-0.5 * sig * np.abs(noise[:, :, 4]))
+    volume = vol0[None, :] * (1.0 + 20.0 * np.abs(r)) * np.exp(0.3 * noise[:, :, 4])
+    return {"Open": open_, "High": hi, "Low": lo, "Close": close, "Volume": np.round(volume)}
+
+def generate_panel(tickers: List[str], n_days: int = 260, end: str | pd.Timestamp | None = None,
+                   seed: int = 42, n_sectors: int = 8, chunk: int = 256) -> PricePanel:
+    """
+    Gecorreleerde OHLCV-paden voor `tickers` over `n_days` werkdagen tot `end` (standaard vandaag),
+    als float32 `PricePanel`. Werkt in blokken van `chunk` tickers om geheugen te begrenzen.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    n = max(2, int(n_days))
+    index = pd.bdate_range(end=pd.Timestamp(end or pd.Timestamp.today()).normalize(), periods=n)
+    f, drift, mult = _factors(n, n_sectors, seed)
+    fields = {k: np.empty((n, len(tickers)), dtype=np.float32) for k in OHLCV}
+    for i in range(0, len(tickers), chunk):
+        part = _chunk(tickers[i:i + chunk], n, f, drift, mult, n_sectors, seed)
+        for k in OHLCV:
+            fields[k][:, i:i + chunk] = part[k]
+    return PricePanel(index, tickers, fields)
+
+def generate_prices(tickers: List[str], n_days: int = 260, end: str | pd.Timestamp | None = None,
+                    seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """Zelfde paden als `generate_panel`, als {ticker: OHLCV-frame} zoals `fetch_prices` teruggeeft."""
+    return generate_panel(tickers, n_days=n_days, end=end, seed=seed).to_dict()
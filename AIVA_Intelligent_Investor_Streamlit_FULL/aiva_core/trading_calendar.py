@@ -0,0 +1,254 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Tuple
+from functools import lru_cache
+import os
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (
+    MO, EasterMonday, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay, nearest_workday, next_monday, next_monday_or_tuesday,
+    sunday_to_monday,
+)
+from pandas.tseries.offsets import DateOffset, Day, Easter
+
+from .panel import OHLCV, PricePanel
+
+# Handelskalenders per beurs en uitlijning van universums met tickers van verschillende beurzen:
+# - beurs volgt uit het tickersuffix (ASML.AS -> Euronext, geen suffix -> NYSE, BTC-USD -> 24/7)
+# - sessies = werkdagen min feestdagen (pandas-holidayregels), gecachet per (beurs, jaren)
+# - `align` bouwt één keer de unie-index met per ticker een open-masker; consumenten
+#   (backtest, covariantie in de Screener) rekenen daarna op dezelfde arrays
+# Forward-fill: over dagen dat de eigen beurs dicht is onbeperkt (koers staat stil, rendement 0),
+# over ontbrekende bars op een open dag maximaal ALIGN_FFILL_LIMIT dagen; daarna NaN.
+
+def _on(month: int, day: int, observance=None, start: str | None = None) -> Holiday:
+    return Holiday(f"{month}-{day}", month=month, day=day, observance=observance, start_date=start)
+
+_ASCENSION = Holiday("Ascension", month=1, day=1, offset=[Easter(), Day(39)])
+_WHIT_MONDAY = Holiday("Whit Monday", month=1, day=1, offset=[Easter(), Day(50)])
+
+_RULES: Dict[str, List[Holiday]] = {
+    "XNYS": [
+        _on(1, 1, sunday_to_monday), USMartinLutherKingJr, USPresidentsDay, GoodFriday, USMemorialDay,
+        _on(6, 19, nearest_workday, start="2022-01-01"), _on(7, 4, nearest_workday), USLaborDay,
+        USThanksgivingDay, _on(12, 25, nearest_workday),
+    ],
+    "XAMS": [_on(1, 1), GoodFriday, EasterMonday, _on(5, 1), _on(12, 25), _on(12, 26)],
+    "XETR": [_on(1, 1), GoodFriday, EasterMonday, _on(5, 1), _on(12, 24), _on(12, 25), _on(12, 26), _on(12, 31)],
+    "XLON": [
+        _on(1, 1, next_monday), GoodFriday, EasterMonday,
+        Holiday("Early May", month=5, day=1, offset=DateOffset(weekday=MO(1))),
+        Holiday("Spring", month=5, day=31, offset=DateOffset(weekday=MO(-1))),
+        Holiday("Summer", month=8, day=31, offset=DateOffset(weekday=MO(-1))),
+        _on(12, 25, next_monday), _on(12, 26, next_monday_or_tuesday),
+    ],
+    "XSWX": [_on(1, 1), _on(1, 2), GoodFriday, EasterMonday, _on(5, 1), _ASCENSION, _WHIT_MONDAY,
+             _on(8, 1), _on(12, 24), _on(12, 25), _on(12, 26), _on(12, 31)],
+    "XTSE": [
+        _on(1, 1, next_monday), Holiday("Family Day", month=2, day=1, offset=DateOffset(weekday=MO(3)), start_date="2008-01-01"),
+        GoodFriday, Holiday("Victoria Day", month=5, day=24, offset=DateOffset(weekday=MO(-1))),
+        _on(7, 1, next_monday), Holiday("Civic", month=8, day=1, offset=DateOffset(weekday=MO(1))),
+        USLaborDay, Holiday("Thanksgiving", month=10, day=1, offset=DateOffset(weekday=MO(2))),
+        _on(12, 25, next_monday), _on(12, 26, next_monday_or_tuesday),
+    ],
+}
+
+# losse sluitingen die niet uit een regel volgen (rouwdagen, jubilea)
+_CLOSURES: Dict[str, List[str]] = {
+    "XNYS": ["2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14", "2004-06-11", "2007-01-02",
+             "2012-10-29", "2012-10-30", "2018-12-05", "2025-01-09"],
+    "XLON": ["2011-04-29", "2012-06-04", "2012-06-05", "2022-06-02", "2022-06-03", "2022-09-19", "2023-05-08"],
+}
+
+# tickersuffix -> beurs
+_SUFFIX: Dict[str, str] = {
+    "AS": "XAMS", "PA": "XAMS", "BR": "XAMS", "LS": "XAMS", "IR": "XAMS",
+    "DE": "XETR", "F": "XETR", "L": "XLON", "SW": "XSWX", "TO": "XTSE", "V": "XTSE",
+}
+
+_INDEX: Dict[str, str] = {"^AEX": "XAMS", "^FCHI": "XAMS", "^GDAXI": "XETR", "^FTSE": "XLON", "^SSMI": "XSWX",
+                          "^GSPTSE": "XTSE"}
+
+CRYPTO = "24/7"
+WEEKDAYS = "WEEKDAYS"  # onbekende beurs: alle werkdagen, geen feestdagen
+
+def ffill_limit_default() -> int:
+    try:
+        return max(0, int(os.getenv("ALIGN_FFILL_LIMIT", "3")))
+    except ValueError:
+        return 3
+
+def exchange_of(ticker: str) -> str:
+    """Beurscode voor een ticker op basis van suffix (yfinance-conventie)."""
+    t = str(ticker).upper()
+    if t in _INDEX:
+        return _INDEX[t]
+    if t.startswith("^"):
+        return "XNYS"
+    if t.endswith(("-USD", "-EUR", "-USDT")):
+        return CRYPTO
+    if "." in t:
+        return _SUFFIX.get(t.rsplit(".", 1)[1], WEEKDAYS)
+    return "XNYS"
+
+@lru_cache(maxsize=256)
+def _holidays(exchange: str, y0: int, y1: int) -> np.ndarray:
+    start, end = pd.Timestamp(y0, 1, 1), pd.Timestamp(y1, 12, 31)
+    days = [r.dates(start, end) for r in _RULES.get(exchange, [])]
+    days.append(pd.DatetimeIndex(_CLOSURES.get(exchange, [])))
+    out = pd.DatetimeIndex(np.concatenate([np.asarray(d, dtype="datetime64[ns]") for d in days]))
+    return np.unique(out.values.astype("datetime64[D]"))
+
+def holidays(exchange: str, start, end) -> pd.DatetimeIndex:
+    """Feestdagen en losse sluitingen (op werkdagen) van `exchange` tussen `start` en `end`."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    h = _holidays(exchange, start.year, end.year)
+    h = h[(h >= np.datetime64(start.date())) & (h <= np.datetime64(end.date()))]
+    return pd.DatetimeIndex(h[np.is_busday(h)].astype("datetime64[ns]"))
+
+def sessions(exchange: str, start, end) -> pd.DatetimeIndex:
+    """Handelsdagen van `exchange` in [start, end]."""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    if exchange == CRYPTO:
+        return pd.date_range(start, end, freq="D")
+    days = np.arange(np.datetime64(start.date()), np.datetime64(end.date()) + 1, dtype="datetime64[D]")
+    days = days[np.is_busday(days, holidays=_holidays(exchange, start.year, end.year))]
+    return pd.DatetimeIndex(days.astype("datetime64[ns]"))
+
+def _days(index) -> np.ndarray:
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return idx.values.astype("datetime64[ns]")
+
+class AlignedPanel(PricePanel):
+    """
+    `PricePanel` op de unie van de handelsdagen van alle betrokken beurzen. Velden bevatten alleen
+    echte bars (NaN elders, dus `frame(t)` geeft de eigen sessies); `is_open` zegt per (dag, ticker)
+    of de beurs van die ticker open was. `filled` en `returns` passen de forward-fill-regels toe.
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, tickers: List[str], fields: Dict[str, np.ndarray],
+                 exchanges: List[str], is_open: np.ndarray, ffill_limit: int):
+        super().__init__(index, tickers, fields)
+        self.exchanges = list(exchanges)
+        self.is_open = is_open
+        self.ffill_limit = int(ffill_limit)
+        self._fill_rows: np.ndarray | None = None
+
+    def _source_rows(self) -> np.ndarray:
+        """Per (dag, ticker) de rij van de laatste geldige Close die mag worden doorgetrokken; -1 = geen."""
+        if self._fill_rows is None:
+            valid = np.isfinite(self.fields["Close"])
+            n = valid.shape[0]
+            rows = np.where(valid, np.arange(n)[:, None], -1)
+            last = np.maximum.accumulate(rows, axis=0)
+            # ontbrekende bars op open dagen sinds de laatste geldige bar
+            gaps = np.cumsum(self.is_open & ~valid, axis=0)
+            since = gaps - np.take_along_axis(gaps, np.maximum(last, 0), axis=0)
+            self._fill_rows = np.where((last >= 0) & (since <= self.ffill_limit), last, -1)
+        return self._fill_rows
+
+    def filled(self, name: str = "Close") -> np.ndarray:
+        """
+        Veld met forward-fill volgens de kalenderregels. Een doorgetrokken dag is een vlakke bar:
+        Open/High/Low = vorige Close, Volume = 0.
+        """
+        src = self._source_rows()
+        ok = src >= 0
+        close = np.take_along_axis(self.fields["Close"], np.maximum(src, 0), axis=0)
+        own = self.fields[name]
+        observed = np.isfinite(self.fields["Close"])
+        if name == "Close":
+            out = close
+        elif name == "Volume":
+            out = np.where(observed, own, 0.0)
+        else:
+            out = np.where(observed & np.isfinite(own), own, close)
+        return np.where(ok, out, np.nan).astype(own.dtype, copy=False)
+
+    def returns(self, periods: int = 1) -> np.ndarray:
+        """Enkelvoudige rendementen (datums, tickers) op de unie-index; 0 op dagen dat de beurs dicht is."""
+        c = self.filled("Close").astype(np.float64)
+        out = np.full(c.shape, np.nan)
+        if len(c) > periods:
+            with np.errstate(all="ignore"):
+                out[periods:] = c[periods:] / c[:-periods] - 1.0
+        return out
+
+    def returns_frame(self, periods: int = 1) -> pd.DataFrame:
+        return pd.DataFrame(self.returns(periods), index=self.index, columns=self.tickers)
+
+    def stack(self, series: Dict[str, pd.Series], fill: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Zet per-ticker reeksen (bv. strategierendementen) op de unie-index: (datums, tickers)-array met
+        `fill` waar een ticker geen waarde heeft, plus een masker van rijen met minstens één waarde.
+        """
+        out = np.full(self.shape, fill, dtype=np.float64)
+        covered = np.zeros(len(self.index), dtype=bool)
+        for t, s in series.items():
+            if t not in self or s is None or s.empty:
+                continue
+            rows = self.index.get_indexer(pd.DatetimeIndex(_days(s.index)))
+            keep = rows >= 0
+            out[rows[keep], self._pos[t]] = s.to_numpy(dtype=np.float64)[keep]
+            covered[rows[keep]] = True
+        return out, covered
+
+def align(prices: Dict[str, pd.DataFrame] | PricePanel, fields: Iterable[str] = OHLCV,
+          exchanges: Dict[str, str] | None = None, ffill_limit: int | None = None,
+          dtype: type = np.float32) -> AlignedPanel:
+    """
+    Lijn frames of een `PricePanel` uit op de unie van de handelsdagen van hun beurzen.
+    `exchanges` overschrijft de beurs per ticker; data op dagen die niet in de kalender staan blijft behouden.
+    `dtype` geldt voor frames; een panel houdt zijn eigen dtype.
+    """
+    limit = ffill_limit_default() if ffill_limit is None else int(ffill_limit)
+    if isinstance(prices, PricePanel):
+        tickers = list(prices.tickers)
+        fields = [f for f in fields if f in prices.fields]
+        dates = _days(prices.index)
+        parts = None
+    else:
+        parts = {t: df[~df.index.duplicated(keep="last")] for t, df in (prices or {}).items()
+                 if df is not None and not df.empty and "Close" in df.columns}
+        tickers = list(parts)
+        fields = list(fields)
+        dates = np.unique(np.concatenate([_days(df.index) for df in parts.values()])) if parts else np.array([], "datetime64[ns]")
+    if "Close" not in fields:
+        fields = ["Close"] + fields
+    exch = [(exchanges or {}).get(t) or exchange_of(t) for t in tickers]
+    if not tickers or not len(dates):
+        empty = pd.DatetimeIndex([], name="Date")
+        return AlignedPanel(empty, tickers, {f: np.empty((0, len(tickers)), dtype) for f in fields},
+                            exch, np.zeros((0, len(tickers)), bool), limit)
+
+    first, last = pd.Timestamp(dates.min()), pd.Timestamp(dates.max())
+    cal = {ex: _days(sessions(ex, first, last)) for ex in set(exch)}
+    index = np.unique(np.concatenate([dates] + list(cal.values())))
+    n, m = len(index), len(tickers)
+
+    if parts is None:
+        rows = np.searchsorted(index, dates)
+        arrays = {}
+        for f in fields:
+            src = prices.fields[f]
+            if n == len(dates):
+                arrays[f] = src
+            else:
+                a = np.full((n, m), np.nan, dtype=src.dtype)
+                a[rows] = src
+                arrays[f] = a
+    else:
+        arrays = {f: np.full((n, m), np.nan, dtype=dtype) for f in fields}
+        for j, (t, df) in enumerate(parts.items()):
+            rows = np.searchsorted(index, _days(df.index))
+            for f in fields:
+                if f in df.columns:
+                    arrays[f][rows, j] = pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=dtype)
+
+    is_open = np.isfinite(arrays["Close"])
+    for ex, days in cal.items():
+        cols = [j for j, e in enumerate(exch) if e == ex]
+        is_open[:, cols] |= np.isin(index, days)[:, None]
+    return AlignedPanel(pd.DatetimeIndex(index, name="Date"), tickers, arrays, exch, is_open, limit)
@@ -3,7 +3,7 @@ import os
 from datetime import datetime
 import pandas as pd
 import streamlit as st
-from utils.data import fetch_quote, fetch_history, safe_number, fetch_bulk_quotes
+from utils.data import error_quote, fetch_quotes, fetch_history, safe_number, fetch_bulk_quotes
 from utils.indicators import sma, rsi, macd
 from utils.plotting import price_chart
 
@@ -40,8 +40,9 @@ with col[4]:
 with col[5]:
     show_rsi = st.checkbox("Toon RSI", value=False)
 
-# Quote header
-q = fetch_quote(ticker)
+# Quote header (één batch voor ticker + watchlist; de watchlist-tabel komt daarna uit de cache)
+# lege ticker valt weg in fetch_quotes: dan een lege quote tonen
+q = fetch_quotes([ticker] + tickers).get(ticker) or error_quote(ticker)
 quote_cols = st.columns(5)
 quote_cols[0].metric("Ticker", q["ticker"])
 quote_cols[1].metric("Prijs", f'{safe_number(q["price"])} {q["currency"]}' if q["price"] else "n.v.t.")
@@ -51,8 +52,10 @@ quote_cols[4].metric("Markt", q["market_state"])
 
 df = fetch_history(ticker, period=period, interval=interval)
 if not df.empty:
-    df["SMA_Fast"] = sma(df["Close"], sma_fast)
-    df["SMA_Slow"] = sma(df["Close"], sma_slow)
+    # op datum geïndexeerd, zodat reruns (andere checkbox e.d.) de indicatoren uit de cache halen
+    close = pd.Series(df["Close"].to_numpy(), index=pd.DatetimeIndex(df["Date"]), name="Close")
+    df["SMA_Fast"] = sma(close, sma_fast, ticker=ticker).to_numpy()
+    df["SMA_Slow"] = sma(close, sma_slow, ticker=ticker).to_numpy()
 
     fig = price_chart(df, title=f"Prijs: {q['ticker']}")
     # Overlay SMA's
@@ -67,7 +70,7 @@ if not df.empty:
         fig2.add_trace(go.Candlestick(x=df["Date"], open=df["Open"], high=df["High"], low=df["Low"], close=df["Close"], name="Prijs"), row=1, col=1)
         fig2.add_trace(go.Scatter(x=df["Date"], y=df["SMA_Fast"], name=f"SMA {sma_fast}", mode="lines"), row=1, col=1)
         fig2.add_trace(go.Scatter(x=df["Date"], y=df["SMA_Slow"], name=f"SMA {sma_slow}", mode="lines"), row=1, col=1)
-        df["RSI14"] = rsi(df["Close"], 14)
+        df["RSI14"] = rsi(close, 14, ticker=ticker).to_numpy()
         fig2.add_trace(go.Scatter(x=df["Date"], y=df["RSI14"], name="RSI(14)", mode="lines"), row=2, col=1)
         fig2.update_layout(template="plotly_white", height=560, xaxis_rangeslider_visible=False, title="Prijs + RSI")
         st.plotly_chart(fig2, use_container_width=True)
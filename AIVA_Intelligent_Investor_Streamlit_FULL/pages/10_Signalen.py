@@ -2,7 +2,7 @@
 import streamlit as st
 import pandas as pd
 from aiva_core.data_sources import fetch_prices
-from aiva_core.signals import indicators, generate_signals
+from aiva_core.signals import generate_signals
 
 st.set_page_config(page_title="Signalen – AIVA", page_icon="🚦", layout="wide")
 st.title("🚦 Signalen & Regimes")
@@ -17,10 +17,9 @@ sma_l = st.number_input("SMA lang", 10, 400, 50)
 if st.button("Genereer"):
     ts = [t.strip() for t in tickers.split(",") if t.strip()]
     prices = fetch_prices(ts, lookback_days=lookback)
-    all_rows = []
-    for t, df in prices.items():
-        ind = indicators(df["Close"], sma_s=int(sma_s), sma_l=int(sma_l), rsi_n=14, bb_n=20, macd_fast=12, macd_slow=26, macd_signal=9)
-        sigs = generate_signals(ind, rsi_buy=int(rsi_buy), rsi_sell=int(rsi_sell))
-        sig_last = sigs.iloc[-1] if len(sigs) else None
-        all_rows.append({"ticker": t, "signal": str(sig_last) if sig_last is not None else "NA"})
+    params = {"ma_short": int(sma_s), "ma_long": int(sma_l), "rsi_period": 14,
+              "rsi_buy": int(rsi_buy), "rsi_sell": int(rsi_sell)}
+    # alleen de laatste bar telt: rekenen over de benodigde warm-up i.p.v. de hele lookback
+    sigs = generate_signals(prices, params, {"tail": True})
+    all_rows = [{"ticker": t, "signal": sigs[t]["signal"] if t in sigs else "NA"} for t in ts]
     st.dataframe(pd.DataFrame(all_rows), use_container_width=True)
@@ -0,0 +1,70 @@
+
+import streamlit as st
+import pandas as pd
+from aiva_core import metrics, quality, quota
+from aiva_core.data_sources import get_provider_health
+
+st.set_page_config(page_title="Diagnostiek – AIVA", page_icon="🩺", layout="wide")
+st.title("🩺 Diagnostiek datalaag")
+st.caption("Latency, hit rates en fouten per provider sinds de start van dit proces.")
+
+snap = metrics.snapshot()
+counters = pd.DataFrame(snap["counters"])
+hists = pd.DataFrame(snap["histograms"])
+
+st.subheader("Provider-gezondheid")
+health = pd.DataFrame(get_provider_health())
+if health.empty:
+    st.write("Nog geen provider-calls.")
+else:
+    st.dataframe(health, use_container_width=True)
+
+st.subheader("Dagquota")
+q = pd.DataFrame(quota.snapshot())
+if q.empty:
+    st.write("Geen providers met dagquotum geconfigureerd.")
+else:
+    st.dataframe(q, use_container_width=True)
+
+st.subheader("Datakwaliteit")
+qr = quality.recent()
+if qr.empty:
+    st.write("Nog geen koersen gecontroleerd.")
+else:
+    st.caption(f"{int((~qr['ok'].astype(bool)).sum())} van {len(qr)} tickers met bevindingen (modus: {quality.mode()}).")
+    st.dataframe(qr, use_container_width=True)
+
+st.subheader("Latency")
+if hists.empty:
+    st.write("Nog geen metingen.")
+else:
+    cols = [c for c in ["name", "provider", "site", "host", "count", "avg", "p50", "p95", "sum"] if c in hists.columns]
+    st.dataframe(hists[cols].sort_values("sum", ascending=False), use_container_width=True)
+
+st.subheader("Cache")
+if not counters.empty and "cache" in counters.columns:
+    cache = counters[counters["name"] == "aiva_cache_total"].pivot_table(index="cache", columns="result", values="value", aggfunc="sum").fillna(0.0)
+    if "hit" in cache.columns:
+        cache["hit_rate"] = cache["hit"] / cache.sum(axis=1).replace(0, float("nan"))
+    st.dataframe(cache, use_container_width=True)
+else:
+    st.write("Nog geen cache-verkeer.")
+
+st.subheader("Counters")
+if counters.empty:
+    st.write("Nog geen counters.")
+else:
+    st.dataframe(counters.sort_values(["name", "value"], ascending=[True, False]), use_container_width=True)
+
+st.subheader("Recente meldingen")
+level = st.selectbox("Niveau", ["alle", "error", "warning", "info"], index=0)
+ev = pd.DataFrame(metrics.REGISTRY.events(None if level == "alle" else level))
+if ev.empty:
+    st.write("Geen meldingen.")
+else:
+    ev["ts"] = pd.to_datetime(ev["ts"], unit="s")
+    st.dataframe(ev.iloc[::-1], use_container_width=True)
+
+c1, c2 = st.columns(2)
+c1.download_button("Export JSON", metrics.to_json().encode("utf-8"), "aiva_metrics.json", "application/json")
+c2.download_button("Export Prometheus", metrics.to_prometheus().encode("utf-8"), "aiva_metrics.prom", "text/plain")
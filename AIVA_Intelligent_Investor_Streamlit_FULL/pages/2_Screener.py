@@ -20,6 +20,8 @@ except Exception:
     fetch_prices = None
 
 from aiva_core.news import get_news
+from aiva_core import features, offline_store
+from aiva_core.trading_calendar import align
 try:
     from aiva_core.advanced.conformal import calibrate_tau_precision, coverage, precision_at_mask
     from aiva_core.advanced.news_features import build_news_features
@@ -57,14 +59,14 @@ def _clean_cols(df: pd.DataFrame) -> pd.DataFrame:
         df = df[~df.index.duplicated(keep="last")]
     return df
 
+_SAMPLE_DIR = str(Path(__file__).resolve().parents[1] / "sample_data")
+
 def load_from_sample(ticker: str) -> pd.DataFrame:
-    p = Path(__file__).resolve().parents[1] / "sample_data" / f"{ticker}.csv"
-    if not p.exists():
-        # probeer ticker met vervangingen (punten/strepen)
-        p = Path(__file__).resolve().parents[1] / "sample_data" / f"{ticker.replace('-', '_')}.csv"
-    if p.exists():
-        df = pd.read_csv(p, parse_dates=["Date"], index_col="Date")
-        return _clean_cols(df)
+    # binaire sample-opslag (CSV's worden bij eerste gebruik eenmalig geconverteerd)
+    for name in (ticker, ticker.replace('-', '_')):
+        df = offline_store.load(_SAMPLE_DIR, [name]).get(name)
+        if df is not None and not df.empty:
+            return _clean_cols(df)
     return pd.DataFrame()
 
 def load_prices_robust(tickers, lookback_days: int, use_offline: bool, diag: dict):
@@ -144,13 +146,7 @@ if run:
         if len(c) < (int(horizon)+30):
             diag[t] = diag.get(t,"") + f" | te weinig bars: {len(c)} (min ~{int(horizon)+30})"
             continue
-        r = c.pct_change().fillna(0.0)
-        m = pd.DataFrame(index=c.index)
-        m["ret1"] = r.shift(1)
-        m["ret5"] = c.pct_change(5).shift(1)
-        m["vol20"] = r.rolling(20).std().shift(1)
-        m["mom20"] = r.rolling(20).mean().shift(1)
-        m["bbw"] = (pd.to_numeric(df["High"], errors="coerce") - pd.to_numeric(df["Low"], errors="coerce")).rolling(20).mean().shift(1) / (c.shift(1)+1e-9)
+        m = features.screener_features(df, ticker=t).copy()
         y = c.pct_change(int(horizon)).shift(-int(horizon)).reindex(m.index)
         m["ticker"] = t; m["target"] = y.values; m["y_bin"] = (y>0).astype(int).values
         keep = m.dropna()
@@ -267,7 +263,9 @@ if run:
         if build_portfolio and results["take"].any():
             from aiva_core.advanced.portfolio_opt import optimize_weights
             exp_ret = results.loc[results["take"], "q50"].rename("exp_ret")
-            cov = feats.pivot_table(index="Date", columns="ticker", values="target").dropna().tail(120).cov()
+            # kalender-uitgelijnd i.p.v. pivot + dropna (dat gooit elke dag weg waarop één beurs dicht is)
+            aligned = align({t: prices[t] for t in exp_ret.index if t in prices})
+            cov = aligned.returns_frame(int(horizon)).tail(120).cov()
             w = optimize_weights(exp_ret, cov, prev_w=None, risk_aversion=float(risk_averse), turn_penalty=float(turn_pen), max_w=float(max_w))
             st.subheader("Voorgestelde wegingen"); st.table(w.to_frame("weight"))
         else:
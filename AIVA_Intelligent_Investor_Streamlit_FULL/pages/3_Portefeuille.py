@@ -1,7 +1,7 @@
 
 import streamlit as st
 import pandas as pd
-from utils.data import fetch_quote
+from utils.data import fetch_quotes
 
 st.set_page_config(page_title="Portefeuille – AIVA", page_icon="💼", layout="wide")
 
@@ -25,14 +25,18 @@ if uploaded:
 
 st.data_editor(st.session_state.pf, num_rows="dynamic", use_container_width=True, key="pf_editor")
 
-# Herbereken
+# Herbereken (alle quotes in één batch)
+pf_tickers = [str(t) for t in st.session_state.pf.get("Ticker", pd.Series(dtype=str)) if t and not pd.isna(t)]
+quotes = fetch_quotes(pf_tickers)
 rows = []
 for _, r in st.session_state.pf.iterrows():
     t = r.get("Ticker")
     if not t or pd.isna(t):
         continue
     try:
-        q = fetch_quote(t)
+        q = quotes[str(t)]
+        if q["market_state"] == "error":
+            raise ValueError("geen quote")
         prijs = q["price"]
         aantal = float(r.get("Aantal", 0) or 0)
         kost = float(r.get("Inkoopprijs", 0) or 0)
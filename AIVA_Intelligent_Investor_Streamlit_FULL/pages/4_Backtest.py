@@ -1,3 +1,4 @@
+import re
 
 import streamlit as st
 import pandas as pd
@@ -51,3 +52,57 @@ stats = {
 }
 st.subheader("Statistieken")
 st.json({k: (round(v,4) if isinstance(v, (int,float)) and v is not None else v) for k,v in stats.items()})
+
+# Parameter-sweep over de signaalregels (RSI + SMA) voor een universum
+st.markdown("---")
+st.subheader("🔁 Parameter-sweep (RSI/SMA-signalen)")
+from aiva_core.data_sources import fetch_prices
+from aiva_core.sweep import sweep
+
+_bad: list = []
+
+def _nums(label: str, s: str, kind: type = int, hi: float = None):
+    """
+    Positieve getallen uit een lijst (komma, puntkomma of spatie); ongeldige invoer wordt overgeslagen,
+    ook een niet-geheel getal waar `kind` int is (geen stille afronding) of een waarde >= `hi`.
+    """
+    out = []
+    for x in re.split(r"[,;\s]+", s or ""):
+        if not x:
+            continue
+        try:
+            v = float(x)
+        except ValueError:
+            v = float("nan")
+        if v > 0 and (hi is None or v < hi) and (kind is float or v.is_integer()):
+            out.append(kind(v))
+        else:
+            _bad.append(f"{label}: {x}")
+    return out
+
+sw_tickers = st.text_input("Universum", value="AAPL,MSFT,ASML.AS,AD.AS,PHIA.AS")
+sw_lookback = st.slider("Lookback (dagen)", 365, 2500, 1095)
+c1, c2, c3, c4, c5 = st.columns(5)
+grid = {
+    "ma_short": _nums("SMA kort", c1.text_input("SMA kort", "5,10,20,30")),
+    "ma_long": _nums("SMA lang", c2.text_input("SMA lang", "50,100,150,200")),
+    "rsi_period": _nums("RSI-periode", c3.text_input("RSI-periode", "7,14,21")),
+    # drempels zijn RSI-niveaus (0-100), geen perioden: 27.5 blijft 27.5
+    "rsi_buy": _nums("RSI koop", c4.text_input("RSI koop ≤", "25,30,35,40"), float, 100),
+    "rsi_sell": _nums("RSI verkoop", c5.text_input("RSI verkoop ≥", "60,65,70,75"), float, 100),
+}
+if _bad:
+    st.warning("Overgeslagen (ongeldig: perioden zijn positieve gehele getallen, RSI-drempels liggen tussen 0 en 100): "
+               + ", ".join(_bad))
+empty = [k for k, v in grid.items() if not v]
+if grid["ma_short"] and grid["ma_long"] and min(grid["ma_short"]) >= max(grid["ma_long"]):
+    empty.append("geen SMA kort < SMA lang")
+if st.button("Sweep"):
+    ts = [x.strip() for x in sw_tickers.split(",") if x.strip()]
+    if empty or not ts:
+        st.error("Lege grid: geef voor elke parameter minstens één geldige waarde op"
+                 f" ({', '.join(empty) or 'universum'}).")
+        st.stop()
+    res = sweep(fetch_prices(ts, lookback_days=int(sw_lookback)), grid)
+    st.caption(f"{len(res)} combinaties; metrics gemiddeld over {int(res['tickers'].max()) if len(res) else 0} tickers.")
+    st.dataframe(res.sort_values("sharpe", ascending=False).head(25), use_container_width=True)
@@ -1,13 +1,21 @@
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import pandas as pd
 import numpy as np
 import yfinance as yf
 
+from aiva_core import intraday, metrics, rate_limit
+from aiva_core.coalesce import SingleFlight, TTLCache
+
 DEFAULT_TZ = ZoneInfo("Europe/Amsterdam")
 
+# Proces-brede quote-cache: alle Streamlit-sessies delen dezelfde upstream-calls
+_QUOTE_CACHE = TTLCache(maxsize=1024, ttl=15.0)
+_QUOTE_FLIGHTS = SingleFlight(timeout=60.0)
+
 def _normalize_ticker(ticker: str) -> str:
     t = (ticker or "").strip().upper()
     # Allow shorthand for crypto (e.g., BTC => BTC-USD)
@@ -21,8 +29,12 @@ def fetch_quote(ticker: str) -> dict:
     """
     Fetch a light-weight live quote using yfinance fast_info, with fallbacks.
     Returns a dict with price, change, change_pct, currency, market_state, time.
+    Identical concurrent requests share one upstream call; results are cached for 15s.
     """
     t = _normalize_ticker(ticker)
+    return dict(_QUOTE_FLIGHTS.do(t, lambda: _limited_quote(t), cache=_QUOTE_CACHE))
+
+def _fetch_quote_uncached(t: str) -> dict:
     tk = yf.Ticker(t)
     now = datetime.now(tz=DEFAULT_TZ)
 
@@ -73,23 +85,73 @@ def fetch_quote(ticker: str) -> dict:
 
 def fetch_history(ticker: str, period="1y", interval="1d") -> pd.DataFrame:
     t = _normalize_ticker(ticker)
-    df = yf.download(t, period=period, interval=interval, auto_adjust=True, progress=False)
+    # gedeelde bar-cache: grovere intervallen worden lokaal uit een fijnere download geresampled
+    df = intraday.bars(t, interval=interval, period=period)
     if isinstance(df, pd.DataFrame) and not df.empty:
-        df = df.reset_index().rename(columns=str.title)
+        df = df.reset_index().rename(columns=str.title).rename(columns={"Datetime": "Date"})
         # Ensure datetime with tz for safety
         if "Date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Date"]):
             df["Date"] = pd.to_datetime(df["Date"], utc=True)
         return df
     return pd.DataFrame(columns=["Date","Open","High","Low","Close","Adj Close","Volume"])
 
-def fetch_bulk_quotes(tickers: list[str]) -> pd.DataFrame:
-    rows = []
-    for t in tickers:
+def error_quote(ticker: str) -> dict:
+    return {"ticker": ticker, "price": None, "change": None, "change_pct": None, "currency":"", "market_state":"error", "time": datetime.now(tz=DEFAULT_TZ).isoformat()}
+
+def _limited_quote(t: str) -> dict:
+    """One upstream quote behind the shared yfinance token bucket (same limiter as the batch path)."""
+    rate_limit.acquire("yfinance")
+    with metrics.timer("aiva_fetch_seconds", provider="yfinance", site="quote"):
+        return _fetch_quote_uncached(t)
+
+def _safe_quote(t: str) -> dict:
+    try:
+        return _limited_quote(t)
+    except Exception as e:
+        metrics.event(f"quote {t}: {e}", level="error", source="quote")
+        return error_quote(t)
+
+def fetch_quotes(tickers: list[str]) -> dict:
+    """
+    Batched quote engine: returns {input ticker: quote dict}.
+    Cached quotes (15s TTL) are served from memory, quotes already being fetched by
+    another session are awaited, and the rest is fetched concurrently.
+    """
+    syms = {t: _normalize_ticker(t) for t in tickers if t and str(t).strip()}
+    uniq = list(dict.fromkeys(syms.values()))
+    got: dict = {}
+    for s in uniq:
+        q = _QUOTE_CACHE.get(s)
+        if q is not None:
+            got[s] = q
+    rest = [s for s in uniq if s not in got]
+    metrics.inc("aiva_cache_total", len(got), cache="quote", result="hit")
+    metrics.inc("aiva_cache_total", len(rest), cache="quote", result="miss")
+    if rest:
+        mine, theirs = _QUOTE_FLIGHTS.claim(rest)
+        fresh: dict = {}
         try:
-            q = fetch_quote(t)
-            rows.append(q)
-        except Exception:
-            rows.append({"ticker": t, "price": None, "change": None, "change_pct": None, "currency":"", "market_state":"error", "time": datetime.now(tz=DEFAULT_TZ).isoformat()})
+            if mine:
+                n = min(rate_limit.workers("yfinance"), len(mine))
+                with ThreadPoolExecutor(max_workers=max(1, n), thread_name_prefix="aiva-quotes") as ex:
+                    fresh = dict(zip(mine, ex.map(_safe_quote, mine)))
+        finally:
+            for s in mine:
+                q = fresh.get(s)
+                if q is not None and q.get("market_state") != "error":
+                    _QUOTE_CACHE.set(s, q)
+                _QUOTE_FLIGHTS.resolve(s, q)
+        got.update(fresh)
+        for s, fl in theirs.items():
+            try:
+                got[s] = _QUOTE_FLIGHTS.wait(fl) or error_quote(s)
+            except Exception:
+                got[s] = error_quote(s)
+    return {t: dict(got.get(s) or error_quote(s)) for t, s in syms.items()}
+
+def fetch_bulk_quotes(tickers: list[str]) -> pd.DataFrame:
+    quotes = fetch_quotes(tickers)
+    rows = [quotes.get(t) or error_quote(t) for t in tickers]
     return pd.DataFrame(rows)
 
 def safe_number(x, d=2):
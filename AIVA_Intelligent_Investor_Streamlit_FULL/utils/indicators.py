@@ -1,24 +1,15 @@
 
 import pandas as pd
-import numpy as np
 
-def sma(series: pd.Series, window: int) -> pd.Series:
-    return series.rolling(window=window, min_periods=window).mean()
+from aiva_core import features
 
-def rsi(series: pd.Series, period: int = 14) -> pd.Series:
-    delta = series.diff()
-    up = delta.clip(lower=0)
-    down = -1 * delta.clip(upper=0)
-    roll_up = up.ewm(alpha=1/period, adjust=False).mean()
-    roll_down = down.ewm(alpha=1/period, adjust=False).mean()
-    rs = roll_up / roll_down.replace(0, np.nan)
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+# Dunne laag over aiva_core.features (zelfde definities als signalen/Screener).
 
-def macd(series: pd.Series, fast=12, slow=26, signal=9):
-    ema_fast = series.ewm(span=fast, adjust=False).mean()
-    ema_slow = series.ewm(span=slow, adjust=False).mean()
-    macd_line = ema_fast - ema_slow
-    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
-    hist = macd_line - signal_line
-    return macd_line, signal_line, hist
+def sma(series: pd.Series, window: int, ticker: str | None = None) -> pd.Series:
+    return features.sma(series, window, ticker=ticker)
+
+def rsi(series: pd.Series, period: int = 14, ticker: str | None = None) -> pd.Series:
+    return features.rsi(series, period, method="wilder", ticker=ticker)
+
+def macd(series: pd.Series, fast=12, slow=26, signal=9, ticker: str | None = None):
+    return features.macd(series, fast, slow, signal, ticker=ticker)